@@ -0,0 +1,87 @@
+# ANN INDEX - Inverted-file (IVF) approximate nearest-neighbour search over embeddings
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Positions of the top_k highest scores, best first"""
+    if top_k < len(scores):
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        best = np.arange(len(scores))
+    return best[np.argsort(-scores[best], kind='stable')]
+
+
+class IVFIndex:
+    """Embeddings bucketed into k-means cells; a query scans only the nearest cells
+
+    Rows are stored grouped by cell so each probed cell is one contiguous
+    slice. With quantize, rows are kept as int8 codes with a per-dimension
+    scale, a quarter of the float32 size, and the query is rescaled instead
+    of decoding the rows. Small corpora get a single cell, i.e. exact search.
+    """
+
+    # Below this many rows clustering is not worth it; scan everything
+    MIN_ROWS_FOR_CLUSTERING = 2000
+    N_PROBE = 8
+
+    def __init__(self, vectors: np.ndarray, n_lists: Optional[int] = None, n_probe: int = N_PROBE,
+                 quantize: bool = True, centroids: Optional[np.ndarray] = None):
+        """Cluster (or reuse centroids, e.g. after an append) and bucket the rows"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.n_docs = len(vectors)
+        self.n_probe = n_probe
+        if centroids is None:
+            if n_lists is None:
+                n_lists = int(np.sqrt(self.n_docs)) if self.n_docs >= self.MIN_ROWS_FOR_CLUSTERING else 1
+            centroids = self._kmeans(vectors, max(1, min(n_lists, self.n_docs)))
+        self.centroids = centroids
+
+        assignment = self._assign(vectors)
+        order = np.argsort(assignment, kind='stable')
+        self.doc_ids = order
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(centroids)))])
+
+        rows = vectors[order]
+        if quantize:
+            scale = np.abs(rows).max(axis=0) / 127.0 if len(rows) else np.ones(vectors.shape[1])
+            scale[scale == 0] = 1.0
+            self.scale = scale.astype(np.float32)
+            self.codes = np.round(rows / self.scale).astype(np.int8)
+        else:
+            self.scale = None
+            self.codes = rows
+
+    @staticmethod
+    def _kmeans(vectors: np.ndarray, n_lists: int) -> np.ndarray:
+        if n_lists == 1:
+            return vectors.mean(axis=0, keepdims=True) if len(vectors) else np.zeros((1, vectors.shape[1]),
+                                                                                    dtype=np.float32)
+        from sklearn.cluster import MiniBatchKMeans
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, n_init=1, random_state=0, batch_size=4096)
+        return kmeans.fit(vectors).cluster_centers_.astype(np.float32)
+
+    def _assign(self, vectors: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        """Nearest centroid (by inner product) for every row"""
+        if len(self.centroids) == 1:
+            return np.zeros(len(vectors), dtype=np.intp)
+        return np.concatenate([np.argmax(vectors[start:start + chunk] @ self.centroids.T, axis=1)
+                               for start in range(0, len(vectors), chunk)] or [np.empty(0, dtype=np.intp)])
+
+    def search(self, query: np.ndarray, top_k: int, n_probe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (doc_ids, inner products) among the n_probe nearest cells, best first"""
+        if self.n_docs == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        cells = _top_k(self.centroids @ query, n_probe or self.n_probe)
+        if len(cells) == 1:
+            start, end = self.offsets[cells[0]], self.offsets[cells[0] + 1]
+            positions = np.arange(start, end)
+            rows = self.codes[start:end]
+        else:
+            positions = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells])
+            rows = self.codes[positions]
+        scores = rows @ (query * self.scale if self.scale is not None else query)
+        best = _top_k(scores, top_k)
+        return self.doc_ids[positions[best]], scores[best]
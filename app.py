@@ -6,7 +6,8 @@ Custom built with modular architecture and original functionality
 
 import streamlit as st
 from database_manager import FAQDatabase, AnalyticsManager
-from search_engine import SemanticSearch
+from faq_browser import render_faq_browser
+from theme_manager import FRAGMENTS
 
 # ============= PAGE CONFIGURATION =============
 st.set_page_config(
@@ -21,10 +22,11 @@ with st.sidebar:
     st.divider()
 
 is_light = "☀️" in theme_mode
+theme = "light" if is_light else "dark"
 
 # Apply CSS - FIXED FOR VISIBILITY
-if is_light:
-    st.markdown("""
+THEME_CSS = {
+    "light": """
     <style>
     * { background-color: #ffffff !important; color: #000000 !important; }
     body, .main, .stApp { background-color: #ffffff !important; color: #000000 !important; }
@@ -33,9 +35,8 @@ if is_light:
     .facility-box { background-color: #e7f3ff !important; padding: 2em !important; border-radius: 12px !important; border-left: 6px solid #0066cc !important; color: #000000 !important; }
     h1, h2, h3, h4, h5, h6, p, div, span { color: #000000 !important; background-color: transparent !important; }
     </style>
-    """, unsafe_allow_html=True)
-else:
-    st.markdown("""
+    """,
+    "dark": """
     <style>
     * { color: #ffffff !important; }
     body, .main, .stApp { background-color: #1a1a1a !important; color: #ffffff !important; }
@@ -44,13 +45,60 @@ else:
     .facility-box { background-color: #2d2d2d !important; padding: 2em !important; border-radius: 12px !important; border-left: 6px solid #4da6ff !important; color: #ffffff !important; }
     h1, h2, h3, h4, h5, h6, p, div, span { color: #ffffff !important; }
     </style>
-    """, unsafe_allow_html=True)
+    """,
+}
+st.markdown(FRAGMENTS.get("css", theme, lambda theme: [THEME_CSS[theme]])[0], unsafe_allow_html=True)
+
+# ============= SHARED INDEX =============
+@st.cache_resource
+def load_faq_store():
+    """FAQ store shared by all sessions; cheap to open, so every page can use it"""
+    return FAQDatabase()
+
+
+@st.cache_resource
+def search_engine_slot():
+    """Process-wide holder of the engine, filled in once load_search_engine() has built it"""
+    return {}
+
+
+@st.cache_resource
+def load_search_engine():
+    """Build the search index once per process, on the first page that needs it
+
+    The search stack (search_engine, scikit-learn, SciPy) and PDF ingestion
+    load here, so pages that never search render without them.
+    """
+    engine = load_faq_store().build_search_engine()
+    search_engine_slot()["engine"] = engine
+    return engine
+
+
+def search_faqs(query: str, limit: int, category=None):
+    """Indexed FAQ questions matching query, best first, optionally in one category
+
+    Categories are looked up in the FAQ store, so any scoring model works.
+    With a category the search is widened until limit questions in it are
+    found or the engine has no more matches.
+    """
+    from search_engine import FAQ_DOC
+    engine = load_search_engine()
+    top_k = limit
+    while True:
+        # Zero-score padding and passages are not FAQs
+        matched = [result for result in engine.search(query, top_k=top_k) if result['score'] > 0]
+        questions = [result['question'] for result in matched if result['doc_type'] == FAQ_DOC]
+        if category is not None:
+            questions = load_faq_store().filter_category(questions, category)
+        if len(questions) >= limit or len(matched) < top_k:
+            return questions[:limit]
+        top_k *= 4
+
 
 # ============= SESSION STATE =============
 if 'faq_db' not in st.session_state:
-    st.session_state.faq_db = FAQDatabase()
+    st.session_state.faq_db = load_faq_store()
     st.session_state.analytics = AnalyticsManager.load_analytics()
-    st.session_state.search_engine = SemanticSearch(st.session_state.faq_db.get_questions_list())
 
 # ============= NAVIGATION =============
 with st.sidebar:
@@ -65,9 +113,8 @@ if page == "🏠 Home":
     st.markdown('<h1 class="main-title">🎓 STUDENT INFORMATION PORTAL</h1>', unsafe_allow_html=True)
     st.markdown("---")
     
-    col1, col2 = st.columns(2)
-    with col1:
-        st.markdown("""
+    # Static boxes are rendered once per process (see theme_manager.FragmentCache)
+    college_box, hostel_box = FRAGMENTS.get("home", theme, lambda theme: ("""
         <div class="facility-box">
         <h2 style="color: #0066cc;">🎓 GMU COLLEGE</h2>
         Premier educational institution providing quality education.<br/><br/>
@@ -75,10 +122,7 @@ if page == "🏠 Home":
         📞 Phone: <b>1-800-GMU-HELP</b><br/>
         📧 Email: <b>info@gmucollege.edu</b>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
+        """, """
         <div class="facility-box">
         <h2 style="color: #dc3545;">🏢 GMU HOSTEL</h2>
         Comfortable on-campus living with excellent facilities.<br/><br/>
@@ -86,7 +130,14 @@ if page == "🏠 Home":
         👨‍🎓 Boys: <b>1200 beds</b><br/>
         👩‍🎓 Girls: <b>800 beds</b>
         </div>
-        """, unsafe_allow_html=True)
+        """))
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(college_box, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(hostel_box, unsafe_allow_html=True)
 
 # ============= FAQ BOT PAGE =============
 elif page == "❓ FAQ Bot":
@@ -102,102 +153,115 @@ elif page == "❓ FAQ Bot":
         # Record query
         AnalyticsManager.record_query(st.session_state.analytics, user_query)
         
-        # Search
-        results = st.session_state.search_engine.search(user_query, top_k=3)
-        answers = st.session_state.faq_db.get_answers_list()
+        # Search (the first one in the process builds the index)
+        engine = load_search_engine()
+        from search_engine import PASSAGE_DOC
+        results = engine.search(user_query, top_k=3)
         
         st.markdown("---")
         st.markdown('<h3 style="font-size: 2em; color: #0066cc;">📌 TOP ANSWERS</h3>', unsafe_allow_html=True)
         
         for idx, result in enumerate(results, 1):
-            confidence = result['similarity']
-            color = "#28a745" if confidence >= 0.7 else ("#ffc107" if confidence >= 0.5 else "#dc3545")
-            emoji = "✅" if confidence >= 0.7 else ("⚠️" if confidence >= 0.5 else "❌")
+            confidence = result['confidence']
+            color, emoji = engine.get_confidence_color(confidence)
             
             AnalyticsManager.record_confidence(st.session_state.analytics, confidence)
             
+            if result['doc_type'] == PASSAGE_DOC:
+                answer = result['question']
+                source = st.session_state.faq_db.get_passage_source(answer)
+                related = f"{source[0]} p.{source[1]}" if source else "Handbook"
+            else:
+                answer = st.session_state.faq_db.get_answer(result['question'])
+                related = result['question']
+            
             st.markdown(f"""
             <div class="facility-box" style="border-left: 6px solid {color};">
             <h3 style="color: {color};">{emoji} ANSWER #{idx}</h3>
             <p><b>Confidence: {result['confidence_percent']:.1f}%</b></p>
-            <p>{answers[result['index']]}</p>
+            <p>{answer}</p>
             <hr style="margin: 15px 0;">
-            <p style="font-size: 0.9em;"><b>Related:</b> {result['question']}</p>
+            <p style="font-size: 0.9em;"><b>Related:</b> {related}</p>
             </div>
             """, unsafe_allow_html=True)
         
-        # Feedback
+        # Feedback (logged with the top answer's raw score for calibration)
+        top_score = results[0]['score'] if results else None
+        top_fallback = bool(results) and results[0].get('fallback', False)
         st.markdown("---")
         st.markdown('<h3 style="color: #0066cc;">👍 Helpful?</h3>', unsafe_allow_html=True)
         fb_col1, fb_col2, fb_col3 = st.columns(3)
         
         with fb_col1:
             if st.button("👍 Yes", key="fb1"):
-                AnalyticsManager.record_feedback(st.session_state.analytics, user_query, "helpful")
+                AnalyticsManager.record_feedback(st.session_state.analytics, user_query, "helpful",
+                                                 top_score, engine.scoring, top_fallback)
                 AnalyticsManager.save_analytics(st.session_state.analytics)
                 st.success("✅ Thank you!")
         
         with fb_col2:
             if st.button("🤔 Somewhat", key="fb2"):
-                AnalyticsManager.record_feedback(st.session_state.analytics, user_query, "somewhat")
+                AnalyticsManager.record_feedback(st.session_state.analytics, user_query, "somewhat",
+                                                 top_score, engine.scoring, top_fallback)
                 AnalyticsManager.save_analytics(st.session_state.analytics)
                 st.info("ℹ️ We'll improve!")
         
         with fb_col3:
             if st.button("👎 No", key="fb3"):
-                AnalyticsManager.record_feedback(st.session_state.analytics, user_query, "not_helpful")
+                AnalyticsManager.record_feedback(st.session_state.analytics, user_query, "not_helpful",
+                                                 top_score, engine.scoring, top_fallback)
                 AnalyticsManager.save_analytics(st.session_state.analytics)
                 st.warning("⚠️ Use Learning section")
     
-    # All FAQs
+    # All FAQs, a page at a time; a typed filter searches the index
     with st.expander("📚 View All FAQs"):
-        faqs = st.session_state.faq_db.get_all_faqs()
-        for i, (q, a) in enumerate(faqs.items(), 1):
-            st.markdown(f'**❓ {i}. {q}**')
-            st.markdown(a)
-            st.markdown("---")
+        faq_db = st.session_state.faq_db
+        render_faq_browser("all_faqs", faq_db.get_faq_page, search=search_faqs, answer=faq_db.get_answer,
+                           categories=faq_db.get_categories())
 
 # ============= HOSTEL PAGE =============
 elif page == "🏢 Hostel":
     st.markdown('<h2 class="section-header">🏢 GMU HOSTEL</h2>', unsafe_allow_html=True)
     
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown("""
+    total_box, boys_box, girls_box, rooms_box = FRAGMENTS.get("hostel", theme, lambda theme: ("""
         <div class="facility-box" style="text-align: center;">
         <div style="font-size: 2.5em;">🏗️</div>
         <h3>TOTAL</h3>
         <p style="font-size: 2em; font-weight: bold;">2000</p>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
+        """, """
         <div class="facility-box" style="text-align: center;">
         <div style="font-size: 2.5em;">👨‍🎓</div>
         <h3>BOYS</h3>
         <p style="font-size: 2em; font-weight: bold;">1200</p>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
+        """, """
         <div class="facility-box" style="text-align: center;">
         <div style="font-size: 2.5em;">👩‍🎓</div>
         <h3>GIRLS</h3>
         <p style="font-size: 2em; font-weight: bold;">800</p>
         </div>
-        """, unsafe_allow_html=True)
-    
-    st.markdown("---")
-    st.markdown("""
+        """, """
     <div class="facility-box">
     <h3>Room Types:</h3>
     <b>Single:</b> $3,000/Sem - AC, Bath, WiFi, Wardrobe<br/>
     <b>Double:</b> $2,000/Sem - AC, Bath, WiFi, Wardrobes<br/>
     <b>Triple:</b> $1,500/Sem - AC, Bath, WiFi, Wardrobes
     </div>
-    """, unsafe_allow_html=True)
+    """))
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown(total_box, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(boys_box, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(girls_box, unsafe_allow_html=True)
+    
+    st.markdown("---")
+    st.markdown(rooms_box, unsafe_allow_html=True)
 
 # ============= COLLEGE PAGE =============
 elif page == "🎓 College":
@@ -205,22 +269,23 @@ elif page == "🎓 College":
     
     col1, col2, col3, col4 = st.columns(4)
     metrics = [("25+ Yrs", "🎓", "Experience"), ("5000+", "👥", "Students"), ("50+", "📚", "Programs"), ("98%", "🌍", "Placement")]
-    
-    for metric, col in zip(metrics, [col1, col2, col3, col4]):
-        with col:
-            st.markdown(f"""
+    metric_boxes = FRAGMENTS.get("college", theme, lambda theme: [f"""
             <div class="facility-box" style="text-align: center;">
             <div style="font-size: 2.5em;">{metric[1]}</div>
             <p style="font-size: 1.8em; font-weight: bold;">{metric[0]}</p>
             <p>{metric[2]}</p>
             </div>
-            """, unsafe_allow_html=True)
+            """ for metric in metrics])
+    
+    for metric_box, col in zip(metric_boxes, [col1, col2, col3, col4]):
+        with col:
+            st.markdown(metric_box, unsafe_allow_html=True)
 
 # ============= ACADEMICS PAGE =============
 elif page == "📋 Academics":
     st.markdown('<h2 class="section-header">📋 ACADEMIC CALENDAR</h2>', unsafe_allow_html=True)
     
-    st.markdown("""
+    calendar_box, = FRAGMENTS.get("academics", theme, lambda theme: ("""
     <div class="facility-box">
     <b>Semester Duration:</b> 6 months<br/>
     <b>Total Semesters:</b> 8 (4 years)<br/>
@@ -229,45 +294,49 @@ elif page == "📋 Academics":
     <b>Minimum Pass:</b> 40%<br/>
     <b>Min Attendance:</b> 75%
     </div>
-    """, unsafe_allow_html=True)
+    """,))
+    st.markdown(calendar_box, unsafe_allow_html=True)
 
 # ============= FINANCE PAGE =============
 elif page == "💰 Finance":
     st.markdown('<h2 class="section-header">💰 FEES</h2>', unsafe_allow_html=True)
     
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown("""
+    ug_box, pg_box, intl_box = FRAGMENTS.get("finance", theme, lambda theme: ("""
         <div class="facility-box" style="text-align: center;">
         <h3>UG</h3>
         <p style="font-size: 2em; font-weight: bold;">₹3,000</p>
         <p>Per Semester</p>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
+        """, """
         <div class="facility-box" style="text-align: center;">
         <h3>PG</h3>
         <p style="font-size: 2em; font-weight: bold;">₹4,000</p>
         <p>Per Semester</p>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
+        """, """
         <div class="facility-box" style="text-align: center;">
         <h3>INTL</h3>
         <p style="font-size: 2em; font-weight: bold;">₹6,000+</p>
         <p>Per Semester</p>
         </div>
-        """, unsafe_allow_html=True)
+        """))
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown(ug_box, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(pg_box, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(intl_box, unsafe_allow_html=True)
 
 # ============= ANALYTICS PAGE =============
 elif page == "📊 Analytics":
     st.markdown('<h2 class="section-header">📊 ANALYTICS</h2>', unsafe_allow_html=True)
     
-    analytics = st.session_state.analytics
+    # Snapshot + event log covers every session, not just this one
+    analytics = AnalyticsManager.load_analytics()
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -306,6 +375,74 @@ elif page == "📊 Analytics":
         <p>Learned</p>
         </div>
         """, unsafe_allow_html=True)
+    
+    # Engine stats only once a search has built it; this page never loads the search stack itself
+    engine = search_engine_slot().get("engine")
+    st.markdown("---")
+    if engine is None:
+        st.info("Search engine not loaded yet: cache and fallback stats appear after the first search.")
+    else:
+        # Result cache is shared by every session, so these counts are process-wide
+        cache = engine.cache_stats()
+        cache_col1, cache_col2, cache_col3 = st.columns(3)
+    
+        with cache_col1:
+            st.markdown(f"""
+            <div class="facility-box" style="text-align: center;">
+            <h3>⚡</h3>
+            <p style="font-size: 2em; font-weight: bold;">{cache['hits']}</p>
+            <p>Cache Hits</p>
+            </div>
+            """, unsafe_allow_html=True)
+    
+        with cache_col2:
+            st.markdown(f"""
+            <div class="facility-box" style="text-align: center;">
+            <h3>🔍</h3>
+            <p style="font-size: 2em; font-weight: bold;">{cache['misses']}</p>
+            <p>Cache Misses</p>
+            </div>
+            """, unsafe_allow_html=True)
+    
+        with cache_col3:
+            st.markdown(f"""
+            <div class="facility-box" style="text-align: center;">
+            <h3>📈</h3>
+            <p style="font-size: 2em; font-weight: bold;">{cache['hit_rate']:.0%}</p>
+            <p>Hit Rate</p>
+            </div>
+            """, unsafe_allow_html=True)
+
+        # Short or misspelled queries that fell back to the character n-gram index
+        fallback = engine.fallback_stats()
+        fallback_col1, fallback_col2, fallback_col3 = st.columns(3)
+
+        with fallback_col1:
+            st.markdown(f"""
+            <div class="facility-box" style="text-align: center;">
+            <h3>🔤</h3>
+            <p style="font-size: 2em; font-weight: bold;">{fallback['share']:.0%}</p>
+            <p>N-gram Fallback</p>
+            </div>
+            """, unsafe_allow_html=True)
+
+        with fallback_col2:
+            st.markdown(f"""
+            <div class="facility-box" style="text-align: center;">
+            <h3>⏱️</h3>
+            <p style="font-size: 2em; font-weight: bold;">{fallback['p50_ms']:.1f} ms</p>
+            <p>Fallback p50</p>
+            </div>
+            """, unsafe_allow_html=True)
+
+        with fallback_col3:
+            st.markdown(f"""
+            <div class="facility-box" style="text-align: center;">
+            <h3>🐢</h3>
+            <p style="font-size: 2em; font-weight: bold;">{fallback['p99_ms']:.1f} ms</p>
+            <p>Fallback p99</p>
+            </div>
+            """, unsafe_allow_html=True)
 
 # ============= LEARNING PAGE =============
 elif page == "🎓 Learning":
@@ -328,8 +465,15 @@ elif page == "🎓 Learning":
     with col_s:
         if st.button("📤 SUBMIT"):
             if new_q and new_a:
-                st.session_state.faq_db.add_faq(new_q, new_a)
-                st.session_state.search_engine.retrain(st.session_state.faq_db.get_questions_list())
+                faq_db = st.session_state.faq_db
+                edited = bool(faq_db.get_answer(new_q))
+                faq_db.add_faq(new_q, new_a)
+                engine = load_search_engine()
+                if edited:
+                    # Known questions keep their category; the new answer is re-indexed in place
+                    engine.update_questions([new_q], answers=[new_a])
+                else:
+                    engine.add_questions([new_q], answers=[new_a], categories=["General"])
                 AnalyticsManager.add_learned_answer(st.session_state.analytics)
                 AnalyticsManager.save_analytics(st.session_state.analytics)
                 st.success("✅ Added!")
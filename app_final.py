@@ -6,15 +6,15 @@ Not a template-based or LLM-generated boilerplate solution
 """
 
 import streamlit as st
-import json
 import os
+import threading
 from datetime import datetime
-from pathlib import Path
 
 # CUSTOM MODULES - HAND-BUILT
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
+# (the search stack - search_engine, scikit-learn, SciPy - loads on the first search)
+from event_log import EventLog
+from calibration import feedback_samples
+from faq_browser import list_page, render_faq_browser
 
 
 class UniversityCourseDatabase:
@@ -49,8 +49,10 @@ class CustomFAQEngine:
     def __init__(self):
         self.questions = []
         self.answers = []
-        self.vectorizer = None
-        self.vectors = None
+        self._positions = {}
+        self._index = None
+        self._write_lock = threading.Lock()
+        self._index_lock = threading.Lock()
         self._build_knowledge_base()
     
     def _build_knowledge_base(self):
@@ -88,80 +90,94 @@ class CustomFAQEngine:
         ]
         
         for q, a in qa_pairs:
+            self._positions[q] = len(self.questions)
             self.questions.append(q)
             self.answers.append(a)
-        
-        # Initialize vectorizer with actual questions
-        self.vectorizer = TfidfVectorizer(
-            lowercase=True, 
-            stop_words='english',
-            ngram_range=(1, 2),
-            min_df=1,
-            max_df=0.9
-        )
-        self.vectors = self.vectorizer.fit_transform(self.questions)
-    
+
+    @property
+    def index(self):
+        """Shared TF-IDF index, built on first use; new questions are appended without a refit"""
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    from search_engine import create_engine
+                    from index_store import DEFAULT_INDEX_DIR
+                    with self._write_lock:
+                        questions, answers = list(self.questions), list(self.answers)
+                    index = create_engine(questions, cache_dir=os.path.join(DEFAULT_INDEX_DIR, "faq_engine"),
+                                          answers=answers)
+                    # Confidence calibration is refitted from logged feedback with every build
+                    index.calibrate(AnalyticsTracker.calibration_samples(AnalyticsTracker.load(), index.scoring))
+                    self._index = index
+        return self._index
+
     def search(self, query, top_k=3):
         """Search with proper error handling and confidence scoring"""
         if not query or not isinstance(query, str) or len(query.strip()) == 0:
             return []
-        
+
         try:
-            query_vector = self.vectorizer.transform([query.lower()])
-            similarities = cosine_similarity(query_vector, self.vectors)[0]
-            
-            # Get top matches with threshold
-            top_indices = np.argsort(similarities)[::-1][:top_k]
-            
             results = []
-            for idx in top_indices:
-                confidence = float(similarities[idx])
-                
-                # Only return results above minimum confidence
-                if confidence > 0.1:
+            for match in self.index.search(query.lower(), top_k=top_k):
+                idx = match['index']
+
+                # Only return results above minimum similarity
+                if match['similarity'] > 0.1:
                     results.append({
                         'question': self.questions[idx],
                         'answer': self.answers[idx],
-                        'confidence': confidence,
+                        'confidence': match['confidence'],
+                        'score': match['score'],
+                        'fallback': match.get('fallback', False),
                         'index': idx
                     })
-            
+
             return results
         except Exception as e:
             st.error(f"Search error: {str(e)}")
             return []
-    
+
     def add_question(self, question, answer):
-        """Add new question dynamically and retrain"""
+        """Add new question dynamically without refitting the whole index"""
         if not question or not answer:
             return False
-        
-        self.questions.append(question)
-        self.answers.append(answer)
-        
-        # Retrain vectorizer with new data
-        self.vectorizer = TfidfVectorizer(
-            lowercase=True,
-            stop_words='english',
-            ngram_range=(1, 2),
-            min_df=1
-        )
-        self.vectors = self.vectorizer.fit_transform(self.questions)
-        
+
+        # Engine is shared by every session; keep questions/answers aligned
+        index = self.index
+        with self._write_lock:
+            if question in self._positions:
+                self.answers[self._positions[question]] = answer
+                index.update_questions([question], answers=[answer])
+            else:
+                self._positions[question] = len(self.questions)
+                self.questions.append(question)
+                self.answers.append(answer)
+                index.add_questions([question], answers=[answer])
+
         return True
 
+    def answer_for(self, question):
+        """Current answer to a known question ("" if unknown)"""
+        position = self._positions.get(question)
+        return self.answers[position] if position is not None else ""
+
 
 class AnalyticsTracker:
-    """Custom analytics - tracks user behavior"""
+    """Custom analytics - tracks user behavior
+
+    Searches and feedback are queued as events, appended to EVENTS_FILE by a
+    background writer and folded into the DATA_FILE snapshot periodically,
+    never rewritten whole.
+    """
     
     DATA_FILE = "analytics.json"
+    EVENTS_FILE = "analytics.jsonl"
+    MAX_RECENT_SEARCHES = 100
+    _event_log = None
     
     @staticmethod
-    def load():
-        """Load analytics from file"""
-        if Path(AnalyticsTracker.DATA_FILE).exists():
-            with open(AnalyticsTracker.DATA_FILE, 'r') as f:
-                return json.load(f)
+    def initial():
+        """Empty analytics state"""
         return {
             "searches": [],
             "queries_count": 0,
@@ -169,33 +185,84 @@ class AnalyticsTracker:
             "created_at": datetime.now().isoformat()
         }
     
+    @staticmethod
+    def apply(data, event):
+        """Fold one logged event into the analytics state"""
+        if event["type"] == "search":
+            data["searches"].append({
+                "query": event["query"],
+                "confidence": event["confidence"],
+                "timestamp": event["timestamp"]
+            })
+            # Only recent searches are shown; keep the state bounded
+            del data["searches"][:-AnalyticsTracker.MAX_RECENT_SEARCHES]
+            data["queries_count"] += 1
+        elif event["type"] == "feedback":
+            entry = {"rating": event["rating"], "timestamp": event["timestamp"]}
+            if "score" in event:
+                entry.update(score=event["score"], scoring=event["scoring"])
+            if event.get("fallback"):
+                entry["fallback"] = True
+            data["feedback"].setdefault(event["query"], []).append(entry)
+    
+    @staticmethod
+    def event_log():
+        """Process-wide event log shared by all sessions"""
+        if AnalyticsTracker._event_log is None:
+            AnalyticsTracker._event_log = EventLog(
+                AnalyticsTracker.DATA_FILE,
+                AnalyticsTracker.EVENTS_FILE,
+                AnalyticsTracker.initial,
+                AnalyticsTracker.apply
+            )
+        return AnalyticsTracker._event_log
+    
+    @staticmethod
+    def load():
+        """Load analytics from snapshot plus event log"""
+        return AnalyticsTracker.event_log().load()
+    
     @staticmethod
     def save(data):
-        """Save analytics"""
-        with open(AnalyticsTracker.DATA_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Nudge the background writer (data is already captured event by event)"""
+        AnalyticsTracker.event_log().flush(wait=False)
+    
+    @staticmethod
+    def _record(data, event):
+        AnalyticsTracker.apply(data, event)
+        AnalyticsTracker.event_log().append(event)
+        return data
     
     @staticmethod
     def record_search(data, query, confidence):
         """Record a search query"""
-        data["searches"].append({
+        return AnalyticsTracker._record(data, {
+            "type": "search",
             "query": query,
             "confidence": confidence,
             "timestamp": datetime.now().isoformat()
         })
-        data["queries_count"] += 1
-        return data
     
     @staticmethod
-    def record_feedback(data, query, rating):
-        """Record user feedback"""
-        if query not in data["feedback"]:
-            data["feedback"][query] = []
-        data["feedback"][query].append({
+    def record_feedback(data, query, rating, score=None, scoring=None, fallback=False):
+        """Record user feedback, with the top answer's raw score for calibration (unless it came from the fallback)"""
+        event = {
+            "type": "feedback",
+            "query": query,
             "rating": rating,
             "timestamp": datetime.now().isoformat()
-        })
-        return data
+        }
+        if score is not None:
+            event.update(score=float(score), scoring=scoring)
+        if fallback:
+            event["fallback"] = True
+        return AnalyticsTracker._record(data, event)
+
+    @staticmethod
+    def calibration_samples(data, scoring):
+        """(score, label) pairs from feedback given under a scoring model"""
+        entries = (entry for ratings in data["feedback"].values() for entry in ratings)
+        return feedback_samples(entries, scoring)
 
 
 # =================== PAGE SETUP ===================
@@ -234,9 +301,14 @@ else:
     </style>
     """, unsafe_allow_html=True)
 
+@st.cache_resource
+def load_faq_engine():
+    """One FAQ engine per process, shared by every browser session (its index is built on first search)"""
+    return CustomFAQEngine()
+
 # INITIALIZE SESSION
 if 'faq_engine' not in st.session_state:
-    st.session_state.faq_engine = CustomFAQEngine()
+    st.session_state.faq_engine = load_faq_engine()
     st.session_state.analytics = AnalyticsTracker.load()
     st.session_state.db = UniversityCourseDatabase()
 
@@ -315,16 +387,8 @@ elif page == "🔍 Search FAQ":
             for idx, result in enumerate(results, 1):
                 confidence_pct = result['confidence'] * 100
                 
-                # Color based on confidence
-                if confidence_pct >= 70:
-                    conf_emoji = "✅"
-                    conf_color = "#28a745"
-                elif confidence_pct >= 50:
-                    conf_emoji = "⚠️"
-                    conf_color = "#ffc107"
-                else:
-                    conf_emoji = "❌"
-                    conf_color = "#dc3545"
+                # Color based on calibrated confidence
+                conf_color, conf_emoji = st.session_state.faq_engine.index.get_confidence_color(result['confidence'])
                 
                 st.markdown(f"""
                 <div class="answer-highlight">
@@ -351,7 +415,10 @@ elif page == "🔍 Search FAQ":
                     st.session_state.analytics = AnalyticsTracker.record_feedback(
                         st.session_state.analytics,
                         user_query,
-                        "helpful"
+                        "helpful",
+                        results[0]['score'],
+                        st.session_state.faq_engine.index.scoring,
+                        results[0]['fallback']
                     )
                     AnalyticsTracker.save(st.session_state.analytics)
                     st.success("Thanks for feedback!")
@@ -361,7 +428,10 @@ elif page == "🔍 Search FAQ":
                     st.session_state.analytics = AnalyticsTracker.record_feedback(
                         st.session_state.analytics,
                         user_query,
-                        "partial"
+                        "partial",
+                        results[0]['score'],
+                        st.session_state.faq_engine.index.scoring,
+                        results[0]['fallback']
                     )
                     AnalyticsTracker.save(st.session_state.analytics)
                     st.info("We'll improve!")
@@ -371,21 +441,25 @@ elif page == "🔍 Search FAQ":
                     st.session_state.analytics = AnalyticsTracker.record_feedback(
                         st.session_state.analytics,
                         user_query,
-                        "not_helpful"
+                        "not_helpful",
+                        results[0]['score'],
+                        st.session_state.faq_engine.index.scoring,
+                        results[0]['fallback']
                     )
                     AnalyticsTracker.save(st.session_state.analytics)
                     st.warning("Consider contributing in next section")
         else:
             st.warning("⚠️ No matching answers found. Try different keywords or contribute!")
     
-    # Show all FAQs
+    # Show all FAQs, a page at a time; a typed filter searches the index
     with st.expander("📖 View All Available FAQs"):
-        st.markdown("---")
-        for i, (q, a) in enumerate(zip(st.session_state.faq_engine.questions, 
-                                       st.session_state.faq_engine.answers), 1):
-            st.markdown(f"**{i}. {q}**")
-            st.markdown(f"_{a}_")
-            st.divider()
+        faq_engine = st.session_state.faq_engine
+        render_faq_browser(
+            "all_faqs",
+            lambda after, limit, category: list_page(faq_engine.questions, faq_engine.answers, after, limit),
+            search=lambda query, limit, category: [match['question'] for match in faq_engine.search(query, top_k=limit)],
+            answer=faq_engine.answer_for
+        )
 
 
 elif page == "📊 Statistics":
@@ -4,10 +4,8 @@ Functional Python implementation for university student information
 """
 
 import streamlit as st
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import json
-import os
+from database_manager import AnalyticsManager
+from faq_browser import list_page, render_faq_browser
 from datetime import datetime
 
 # PAGE CONFIGURATION
@@ -74,12 +72,16 @@ FAQs = {
     "Is medical facility available?": "Yes, campus medical center with doctors and emergency services.",
 }
 
-# INITIALIZE SEARCH ENGINE
+# SEARCH ENGINE - fitted on the first search and kept for the process, not on every rerun
 questions_list = list(FAQs.keys())
 answers_list = list(FAQs.values())
 
-vectorizer = TfidfVectorizer(lowercase=True, stop_words='english', ngram_range=(1, 2))
-question_vectors = vectorizer.fit_transform(questions_list)
+
+@st.cache_resource
+def load_search_engine():
+    from search_engine import create_engine
+    return create_engine(questions_list, answers=answers_list)
+
 
 # SIDEBAR NAVIGATION
 with st.sidebar:
@@ -114,23 +116,16 @@ elif page == "❓ FAQ Bot":
     
     if user_question and search_button:
         # Search for answer
-        user_vec = vectorizer.transform([user_question])
-        similarities = cosine_similarity(user_vec, question_vectors)[0]
-        top_indices = similarities.argsort()[-3:][::-1]
+        search_engine = load_search_engine()
+        results = search_engine.search(user_question, top_k=3)
         
         st.markdown("---")
         st.markdown("### 📌 TOP ANSWERS")
         
-        for idx, top_idx in enumerate(top_indices, 1):
-            confidence = similarities[top_idx]
-            confidence_pct = confidence * 100
-            
-            if confidence_pct >= 70:
-                emoji, color = "✅", "#28a745"
-            elif confidence_pct >= 50:
-                emoji, color = "⚠️", "#ffc107"
-            else:
-                emoji, color = "❌", "#dc3545"
+        for idx, result in enumerate(results, 1):
+            top_idx = result['index']
+            confidence_pct = result['confidence_percent']
+            color, emoji = search_engine.get_confidence_color(result['confidence'])
             
             st.markdown(f"""
             <div class="answer-box">
@@ -142,21 +137,20 @@ elif page == "❓ FAQ Bot":
     
     st.markdown("---")
     with st.expander("📚 VIEW ALL FAQs"):
-        for i, (q, a) in enumerate(FAQs.items(), 1):
-            st.markdown(f"**{i}. {q}**")
-            st.markdown(f"_{a}_")
-            st.divider()
+        render_faq_browser(
+            "all_faqs",
+            lambda after, limit, category: list_page(questions_list, answers_list, after, limit),
+            search=lambda query, limit, category: [
+                result['question'] for result in load_search_engine().search(query, top_k=limit) if result['score'] > 0
+            ],
+            answer=FAQs.get
+        )
 
 # ANALYTICS PAGE
 elif page == "📊 Analytics":
     st.markdown('<div class="section-header">📊 ANALYTICS DASHBOARD</div>', unsafe_allow_html=True)
     
-    analytics_file = "analytics_data.json"
-    if os.path.exists(analytics_file):
-        with open(analytics_file, 'r') as f:
-            analytics = json.load(f)
-    else:
-        analytics = {"total_queries": 0, "high_confidence": 0, "low_confidence": 0}
+    analytics = AnalyticsManager.load_analytics()
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -0,0 +1,64 @@
+"""
+QUERY ANALYZER BENCHMARK
+Times the per-query transform through the generic sklearn path
+(vectorizer.transform / transform_queries) against the precompiled
+QueryAnalyzer the engine now uses, for each scoring model, and checks that
+both produce the same query rows.
+
+Queries come from the top_questions log in analytics_data.json when it has
+any, otherwise from the FAQ questions themselves.
+
+Run: python benchmarks/bench_analyzer.py [--repeats 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database_manager import FAQDatabase, AnalyticsManager  # noqa: E402
+from search_engine import SemanticSearch, SCORING_MODELS  # noqa: E402
+
+
+def median_us(transform, queries, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            transform(query)
+            timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    entries = list(FAQDatabase().iter_entries())
+    questions = [question for question, _, _ in entries]
+    answers = [answer for _, answer, _ in entries]
+    categories = [category for _, _, category in entries]
+    logged = list(AnalyticsManager.load_analytics().get("top_questions", {}))
+    queries = logged or questions
+
+    print(f"source: {'analytics log' if logged else 'FAQ questions'} ({len(queries)} distinct)")
+    print(f"{'model':<8}{'sklearn us':>12}{'analyzer us':>13}{'speedup':>9}{'max diff':>10}")
+    for scoring in SCORING_MODELS:
+        engine = SemanticSearch(questions, answers=answers, categories=categories,
+                                scoring=scoring, result_cache_size=0)
+        vectorizer, analyzer = engine.vectorizer, engine.snapshot().analyzer
+        generic = vectorizer.transform_queries if scoring == "bm25" else vectorizer.transform
+
+        expected = generic(queries).tocsr()
+        diff = abs(expected - analyzer.transform(queries)).max() if len(queries) else 0.0
+        before = median_us(lambda query: generic([query]), queries, args.repeats)
+        after = median_us(analyzer.analyze, queries, args.repeats)
+        print(f"{scoring:<8}{before:>12.1f}{after:>13.1f}{before / after:>8.1f}x{diff:>10.1e}")
+
+
+if __name__ == "__main__":
+    main()
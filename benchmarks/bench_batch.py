@@ -0,0 +1,53 @@
+"""
+BATCH QUERY BENCHMARK
+Replays queries through SemanticSearch one at a time and through
+search_batch(), reporting queries per second for both. The result cache
+is off, so both paths score every query.
+
+Queries come from the top_questions log in analytics_data.json when it has
+any, otherwise from the FAQ questions themselves.
+
+Run: python benchmarks/bench_batch.py [--queries 20000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database_manager import FAQDatabase, AnalyticsManager  # noqa: E402
+from search_engine import SemanticSearch  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    faq_db = FAQDatabase()
+    # The queries repeat, so a result cache would turn the loop into cache hits; batches bypass it
+    engine = SemanticSearch(faq_db.get_questions_list(), result_cache_size=0)
+
+    logged = list(AnalyticsManager.load_analytics().get("top_questions", {}))
+    source = logged or list(faq_db.get_questions_list())
+    queries = [source[i % len(source)] for i in range(args.queries)]
+
+    loop_sample = queries[:min(len(queries), 2000)]
+    start = time.perf_counter()
+    for query in loop_sample:
+        engine.search(query, top_k=args.top_k)
+    loop_qps = len(loop_sample) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    engine.search_batch(queries, top_k=args.top_k)
+    batch_qps = len(queries) / (time.perf_counter() - start)
+
+    print(f"source: {'analytics log' if logged else 'FAQ questions'} ({len(source)} distinct)")
+    print(f"search() loop : {loop_qps:>10.0f} queries/s")
+    print(f"search_batch(): {batch_qps:>10.0f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
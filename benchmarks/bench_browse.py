@@ -0,0 +1,65 @@
+"""
+FAQ BROWSE BENCHMARK
+Per-rerun cost of the "View All FAQs" listing as the store grows: the old
+listing read every row and sent three markdown elements per FAQ; the paged
+browser fetches one keyset page (first, deep, and deep within a category)
+and sends one element. "full list ms" is only the read; each element it
+sends adds roughly 0.1 ms more in st.markdown (see bench_fragments.py).
+Stores are synthetic SQLite files in a temp dir.
+
+Run: python benchmarks/bench_browse.py [--sizes 1000 10000 100000] [--repeats 50]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from faq_browser import PAGE_SIZE, render_faq_page  # noqa: E402
+from faq_store import SQLiteFAQStore  # noqa: E402
+
+CATEGORIES = ["Admissions", "Academics", "Hostel", "Finance", "Placements", "Facilities", "Library", "Sports"]
+
+
+def median_ms(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'FAQs':>8}{'full list ms':>14}{'elements':>10}{'page 1 ms':>11}{'deep ms':>9}"
+          f"{'category deep ms':>18}{'elements':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            store = SQLiteFAQStore(os.path.join(tmp, f"faqs_{size}.db"))
+            store.seed((f"Question {i} about {CATEGORIES[i % len(CATEGORIES)].lower()}?",
+                        f"Answer {i}, a sentence or two long like the real ones.", CATEGORIES[i % len(CATEGORIES)])
+                       for i in range(size))
+            deep = size - 2 * PAGE_SIZE * len(CATEGORIES)
+
+            full = median_ms(lambda: [f"**{i}. {q}**" for i, (q, _) in enumerate(store.iter_pairs(), 1)],
+                             max(args.repeats // 10, 3))
+            first = median_ms(lambda: render_faq_page(store.page(0, PAGE_SIZE + 1)[:PAGE_SIZE], 1), args.repeats)
+            deep_ms = median_ms(lambda: render_faq_page(store.page(deep, PAGE_SIZE + 1)[:PAGE_SIZE], 1),
+                                args.repeats)
+            category = median_ms(lambda: render_faq_page(store.page(deep, PAGE_SIZE + 1, "Finance")[:PAGE_SIZE], 1),
+                                 args.repeats)
+            # Old: question, answer and separator per FAQ; new: filters, page, caption, two buttons
+            print(f"{size:>8}{full:>14.2f}{3 * size:>10}{first:>11.3f}{deep_ms:>9.3f}{category:>18.3f}{5:>10}")
+
+
+if __name__ == "__main__":
+    main()
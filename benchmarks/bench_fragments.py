@@ -0,0 +1,91 @@
+"""
+FRAGMENT CACHE BENCHMARK
+Reruns every page of app.py in both themes through Streamlit's AppTest
+runtime and reports, per page: the median rerun time, the time spent
+inside st.markdown (dedent, HTML handling, building the message) and the
+markdown payload sent to the browser (serialized bytes per rerun).
+
+Pass --root with a checkout from before the fragment cache to compare.
+Every page is visited once before timing, so the search index and the
+fragment cache are warm, as they are for every rerun after the first.
+
+Run: python benchmarks/bench_fragments.py [--reruns 20] [--root DIR] [--app app.py]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--root", default=ROOT, help="checkout to profile (default: this one)")
+    parser.add_argument("--app", default="app.py")
+    args = parser.parse_args()
+
+    # The app opens its data files relative to the working directory
+    os.chdir(args.root)
+    sys.path.insert(0, args.root)
+    from streamlit.elements.markdown import MarkdownMixin
+    from streamlit.testing.v1 import AppTest
+
+    markdown_seconds = []
+    render_markdown = MarkdownMixin._markdown
+
+    def timed_markdown(self, *call_args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return render_markdown(self, *call_args, **kwargs)
+        finally:
+            markdown_seconds.append(time.perf_counter() - start)
+
+    MarkdownMixin._markdown = timed_markdown
+
+    at = AppTest.from_file(os.path.join(args.root, args.app), default_timeout=120)
+    at.run()
+    themes, pages = at.sidebar.radio[0].options, at.sidebar.radio[1].options
+
+    def show(theme: str, page: str):
+        # Widgets are looked up again: each run replaces the element tree
+        at.sidebar.radio[0].set_value(theme)
+        at.sidebar.radio[1].set_value(page)
+        at.run()
+
+    for theme in themes:
+        for page in pages:
+            show(theme, page)
+
+    print(f"{'page':<16}{'theme':<10}{'rerun ms':>10}{'markdown ms':>13}{'payload B':>11}")
+    totals = np.zeros(3)
+    for theme in themes:
+        for page in pages:
+            show(theme, page)
+            reruns, markdown = [], []
+            for _ in range(args.reruns):
+                markdown_seconds.clear()
+                start = time.perf_counter()
+                at.run()
+                reruns.append(time.perf_counter() - start)
+                markdown.append(sum(markdown_seconds))
+            if at.exception:
+                raise RuntimeError(f"{page}: {at.exception[0].value}")
+            payload = sum(element.proto.ByteSize() for element in at.markdown)
+            row = np.array([np.median(reruns) * 1000, np.median(markdown) * 1000, payload])
+            totals += row
+            print(f"{page:<16}{theme:<10}{row[0]:>10.1f}{row[1]:>13.2f}{row[2]:>11.0f}")
+    print(f"{'total':<26}{totals[0]:>10.1f}{totals[1]:>13.2f}{totals[2]:>11.0f}")
+
+    if "theme_manager" in sys.modules:
+        stats = sys.modules["theme_manager"].FRAGMENTS.stats()
+        print(f"fragment cache: {stats['fragments']} blocks, {stats['bytes']} bytes, "
+              f"{stats['hits']} hits / {stats['misses']} misses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+INCREMENTAL ADD BENCHMARK
+Latency of SemanticSearch.add_questions() for one question at a time, as
+the Learning page submits them, against the cost of rebuilding the word
+posting lists and the n-gram fallback index over all rows (what every add
+used to pay).
+
+Adds index only the appended rows (inverted_index.AppendedIndex); copying
+the row matrices and question tuples is still proportional to the corpus,
+so the add column still grows with the size, just far more slowly. The run
+fails (exit status 1) unless the rankings after the adds match a fresh
+build over the same rows.
+
+Run: python benchmarks/bench_incremental.py [--sizes 10000 100000] [--adds 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_shared_index import corpus, queries  # noqa: E402
+from char_index import CharNgramIndex  # noqa: E402
+from inverted_index import InvertedIndex  # noqa: E402
+from search_engine import SemanticSearch  # noqa: E402
+
+
+def same_rankings(engine: SemanticSearch, probe) -> bool:
+    """Search results through the appended posting lists equal those of one fresh build"""
+    snapshot = engine.snapshot()
+    fallback = snapshot.fallback
+    fresh = snapshot._replace(postings=InvertedIndex(snapshot.question_vectors),
+                              fallback=CharNgramIndex((), fallback.vectorizer, fallback.matrix))
+    for query in probe:
+        engine._snapshot = snapshot
+        appended = [(r['index'], round(r['score'], 9)) for r in engine.search(query, top_k=5)]
+        engine._snapshot = fresh
+        rebuilt = [(r['index'], round(r['score'], 9)) for r in engine.search(query, top_k=5)]
+        if appended != rebuilt:
+            engine._snapshot = snapshot
+            return False
+    engine._snapshot = snapshot
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--adds", type=int, default=50)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'FAQs':>8} {'add p50 ms':>11} {'add p95 ms':>11} {'rebuild ms':>11}")
+    for size in args.sizes:
+        questions, answers, categories = corpus(size + args.adds)
+        # No compaction during the run: every add takes the incremental path
+        engine = SemanticSearch(questions[:size], answers=answers[:size], categories=categories[:size],
+                                result_cache_size=0, drift_threshold=float("inf"))
+        latencies = []
+        for i in range(size, size + args.adds):
+            start = time.perf_counter()
+            engine.add_questions([questions[i]], answers=[answers[i]], categories=[categories[i]])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        snapshot = engine.snapshot()
+        start = time.perf_counter()
+        InvertedIndex(snapshot.question_vectors)
+        CharNgramIndex((), snapshot.fallback.vectorizer, snapshot.fallback.matrix)
+        rebuild_ms = (time.perf_counter() - start) * 1000
+        print(f"{size:>8} {np.percentile(latencies, 50):>11.2f} {np.percentile(latencies, 95):>11.2f} "
+              f"{rebuild_ms:>11.1f}")
+
+        probe = queries(questions[size:], 200)
+        if not same_rankings(engine, probe):
+            failed = True
+            print("         FAIL: rankings after the adds differ from a fresh build")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+SCORING MODEL BENCHMARK
+Runs TF-IDF cosine and BM25 side by side on the FAQ set, reporting hit rate,
+confidence spread and per-query latency.
+
+Queries are derived from each FAQ question with its known answer as the
+target: the bare keywords of the question, and the keywords with the most
+specific one dropped (a vaguer query). Both engines index questions,
+answers and categories exactly as app.py does.
+
+Run: python benchmarks/bench_scoring.py [--repeats 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database_manager import FAQDatabase  # noqa: E402
+from search_engine import SemanticSearch, SCORING_MODELS, normalize_query  # noqa: E402
+
+
+def keywords(question: str):
+    return [word for word in normalize_query(question).split() if word not in ENGLISH_STOP_WORDS]
+
+
+def build_queries(questions):
+    """(query, expected index) pairs: full keywords, then keywords minus the longest"""
+    pairs = []
+    for i, question in enumerate(questions):
+        words = keywords(question)
+        if not words:
+            continue
+        pairs.append((" ".join(words), i))
+        if len(words) > 1:
+            longest = max(words, key=len)
+            pairs.append((" ".join(word for word in words if word != longest), i))
+    return pairs
+
+
+def evaluate(engine: SemanticSearch, pairs, repeats: int) -> dict:
+    hits1 = hits3 = 0
+    hit_conf, miss_conf = [], []
+    for query, expected in pairs:
+        results = engine.search(query, top_k=3)
+        ranked = [result['index'] for result in results]
+        top = results[0]['similarity'] if results else 0.0
+        if ranked and ranked[0] == expected:
+            hits1 += 1
+            hit_conf.append(top)
+        else:
+            miss_conf.append(top)
+        hits3 += expected in ranked
+
+    timings = []
+    for _ in range(repeats):
+        for query, _ in pairs:
+            start = time.perf_counter()
+            engine.search(query, top_k=3)
+            timings.append(time.perf_counter() - start)
+    return {
+        "hit@1": hits1 / len(pairs),
+        "hit@3": hits3 / len(pairs),
+        "conf_hit": float(np.mean(hit_conf)) if hit_conf else 0.0,
+        "conf_miss": float(np.mean(miss_conf)) if miss_conf else 0.0,
+        "ms": float(np.median(timings)) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    entries = list(FAQDatabase().iter_entries())
+    questions = [question for question, _, _ in entries]
+    answers = [answer for _, answer, _ in entries]
+    categories = [category for _, _, category in entries]
+    pairs = build_queries(questions)
+
+    print(f"{len(questions)} FAQs, {len(pairs)} queries")
+    print(f"{'model':<8}{'hit@1':>8}{'hit@3':>8}{'conf hit':>10}{'conf miss':>11}{'ms/query':>10}")
+    for scoring in SCORING_MODELS:
+        # Result cache off so every repeat is really scored
+        engine = SemanticSearch(questions, answers=answers, categories=categories,
+                                scoring=scoring, result_cache_size=0)
+        stats = evaluate(engine, pairs, args.repeats)
+        print(f"{scoring:<8}{stats['hit@1']:>8.1%}{stats['hit@3']:>8.1%}"
+              f"{stats['conf_hit']:>10.2f}{stats['conf_miss']:>11.2f}{stats['ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+SERVICE LOAD TEST
+Starts faq_service.py with 1 worker and with N workers (default: one per
+core) and drives GET /search over keep-alive connections from several
+client processes for a fixed time. Reports requests/sec and p50/p95/p99
+latency per worker count.
+
+Queries are the FAQ questions in turn; --unique appends a number to each
+so every request misses the engine's result cache.
+
+The clients share the machine with the server: on a small box they take
+cores the workers could have used, so compare runs on the same machine.
+Even so, more workers must not mean fewer requests: the run fails (exit
+status 1) if the multi-worker run serves less than MIN_SCALING times the
+single-worker rate, as it did while multi-worker connections ran without
+TCP_NODELAY (about 40 ms per keep-alive request).
+
+Run: python benchmarks/bench_service.py [--workers 4] [--connections 32] [--duration 10] [--unique]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from database_manager import FAQDatabase  # noqa: E402
+
+HOST = "127.0.0.1"
+# Lowest multi-worker / single-worker req/s ratio accepted; below 1 to allow for noise on a busy box
+MIN_SCALING = 0.9
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def start_service(port: int, workers: int) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, "faq_service.py", "--port", str(port), "--workers", str(workers)],
+                               cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"service exited:\n{process.stderr.read().decode()[-2000:]}")
+        try:
+            # Every worker must have loaded its index: ask until the port answers a few times in a row
+            for _ in range(workers * 4):
+                urllib.request.urlopen(f"http://{HOST}:{port}/search?q=warmup", timeout=5).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("service did not start")
+
+
+async def _connection(port: int, paths, offset: int, deadline: float, latencies: list) -> int:
+    """Send requests back to back on one keep-alive connection; returns the error count"""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    errors, i = 0, offset
+    try:
+        while time.perf_counter() < deadline:
+            request = f"GET {paths[i % len(paths)]} HTTP/1.1\r\nHost: {HOST}\r\n\r\n".encode()
+            i += 1
+            start = time.perf_counter()
+            writer.write(request)
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.partition(b":")
+                if name.lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if b" 200 " not in status:
+                errors += 1
+    finally:
+        writer.close()
+    return errors
+
+
+def _client(job):
+    """One client process: its share of the connections on one event loop"""
+    port, paths, connections, offset, duration = job
+
+    async def run():
+        latencies = []
+        deadline = time.perf_counter() + duration
+        errors = await asyncio.gather(*(_connection(port, paths, offset + c * 997, deadline, latencies)
+                                        for c in range(connections)))
+        return latencies, sum(errors)
+
+    return asyncio.run(run())
+
+
+def load(port: int, paths, connections: int, clients: int, duration: float):
+    jobs = [(port, paths, max(1, connections // clients), client * 7919, duration) for client in range(clients)]
+    with multiprocessing.Pool(clients) as pool:
+        outcomes = pool.map(_client, jobs)
+    latencies = np.concatenate([np.array(latencies) for latencies, _ in outcomes]) * 1000
+    return len(latencies) / duration, np.percentile(latencies, [50, 95, 99]), sum(errors for _, errors in outcomes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="N for the multi-worker run")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="load generator processes")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--unique", action="store_true", help="make every query miss the result cache")
+    args = parser.parse_args()
+
+    questions = list(FAQDatabase().get_questions_list())
+    if args.unique:
+        queries = [f"{question} {i}" for i in range(50) for question in questions]
+    else:
+        queries = questions
+    paths = [f"/search?q={urllib.parse.quote(query)}&top_k=3" for query in queries]
+
+    print(f"{args.connections} keep-alive connections from {args.clients} client process(es), "
+          f"{args.duration:.0f} s per run, {len(set(paths))} distinct queries, {os.cpu_count()} core(s)")
+    print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    rates = {}
+    for workers in sorted({1, args.workers}):
+        port = free_port()
+        service = start_service(port, workers)
+        try:
+            rps, (p50, p95, p99), errors = load(port, paths, args.connections, args.clients, args.duration)
+        finally:
+            service.terminate()
+            service.wait(timeout=30)
+        rates[workers] = rps
+        print(f"{workers:>8}{rps:>10.0f}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}{errors:>8}")
+    if args.workers > 1 and rates[args.workers] < MIN_SCALING * rates[1]:
+        print(f"FAIL: {args.workers} workers served {rates[args.workers]:.0f} req/s, "
+              f"slower than 1 worker ({rates[1]:.0f} req/s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
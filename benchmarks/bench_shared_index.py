@@ -0,0 +1,140 @@
+"""
+SHARED INDEX MEMORY BENCHMARK
+Per-worker memory as the corpus grows, for N worker processes that each
+load their own index (from the saved, memory-mapped cache: the cheapest
+private load) versus N workers attached to one shared generation
+(shared_index.SharedSemanticSearch).
+
+Each worker loads, answers the same queries (typos and one-word queries
+included, so the typo index and n-gram fallback are used), then reports
+from /proc/self/smaps_rollup while all workers are alive:
+  anon MB   private (anonymous) memory added by the index; it is paid once per worker
+  pss MB    proportional share, file pages split between the workers mapping them
+Linux only. Corpora are synthetic and built in a temp dir.
+
+Run: python benchmarks/bench_shared_index.py [--sizes 5000 20000 80000] [--workers 4] [--queries 2000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "te", "vi", "zo", "pa", "de", "fi", "go", "hu", "ji", "bo", "ce",
+             "du", "ex", "ri"]
+CATEGORIES = ["Admissions", "Academics", "Hostel", "Finance", "Placements", "Facilities", "Library", "Sports"]
+
+
+def corpus(size: int):
+    """Zipf-distributed made-up words: 8-word questions and 22-word answers, the same on every call"""
+    rng = random.Random(0)
+    words = sorted({"".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(60000)})
+    weights = 1 / np.arange(1, len(words) + 1)
+    rows = np.random.default_rng(0).choice(len(words), size=(size, 30), p=weights / weights.sum())
+    questions = [" ".join(words[i] for i in row[:8]) + "?" for row in rows]
+    answers = [" ".join(words[i] for i in row[8:]) for row in rows]
+    categories = [CATEGORIES[i % len(CATEGORIES)] for i in range(size)]
+    return questions, answers, categories
+
+
+def queries(questions, count: int):
+    rng = random.Random(1)
+    picked = [rng.choice(questions) for _ in range(count)]
+    # Every third query loses a letter (typo index), every fifth is a single word (n-gram fallback)
+    typos = [query[:3] + query[4:] if i % 3 == 0 else query for i, query in enumerate(picked)]
+    return [query.split()[0] if i % 5 == 0 else query for i, query in enumerate(typos)]
+
+
+def memory_mb():
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1]) / 1024
+    return values["Anonymous"], values["Pss"]
+
+
+def worker(mode: str, size: int, cache_dir: str, shared_dir: str, n_queries: int, barrier, results):
+    from search_engine import SemanticSearch
+    from shared_index import SharedSemanticSearch
+    base_anon, _ = memory_mb()
+    start = time.perf_counter()
+    if mode == "shared":
+        engine = SharedSemanticSearch(shared_dir)
+        sample = queries(engine.questions, n_queries)
+    else:
+        # A private worker needs the corpus (from the FAQ store) to check and hold its index
+        questions, answers, categories = corpus(size)
+        engine = SemanticSearch(questions, answers=answers, categories=categories, cache_dir=cache_dir)
+        sample = queries(questions, n_queries)
+        del questions, answers, categories
+    load_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    top = [tuple(result['index'] for result in engine.search(query, top_k=3)) for query in sample]
+    query_ms = (time.perf_counter() - start) * 1000 / len(sample)
+    barrier.wait()
+    anon, pss = memory_mb()
+    results.put((mode, anon - base_anon, pss, load_ms, query_ms, hash(tuple(top))))
+    barrier.wait()
+
+
+def run_workers(mode: str, args, size: int, cache_dir: str, shared_dir: str):
+    context = multiprocessing.get_context("spawn")
+    barrier, results = context.Barrier(args.workers), context.Queue()
+    processes = [context.Process(target=worker, args=(mode, size, cache_dir, shared_dir, args.queries, barrier,
+                                                      results)) for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000, 80000])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    from search_engine import SemanticSearch
+
+    print(f"{args.workers} workers per run; anon and pss are per worker (median), total is the sum of pss")
+    print(f"{'docs':>7}{'mode':>8}{'anon MB':>9}{'pss MB':>8}{'total MB':>10}{'load ms':>9}{'query ms':>10}"
+          f"{'index MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            cache_dir, shared_dir = os.path.join(tmp, f"cache_{size}"), os.path.join(tmp, f"shared_{size}")
+            questions, answers, categories = corpus(size)
+            start = time.perf_counter()
+            SemanticSearch(questions, answers=answers, categories=categories, cache_dir=cache_dir,
+                           shared_dir=shared_dir)
+            fit_s = time.perf_counter() - start
+            index_mb = sum(os.path.getsize(os.path.join(folder, name)) for folder, _, names in os.walk(shared_dir)
+                           for name in names) / 2 ** 20
+            del questions, answers, categories
+
+            rankings = set()
+            for mode in ("private", "shared"):
+                rows = run_workers(mode, args, size, cache_dir, shared_dir)
+                anon, pss, load_ms, query_ms = (float(np.median([row[i] for row in rows])) for i in range(1, 5))
+                rankings.update(row[5] for row in rows)
+                print(f"{size:>7}{mode:>8}{anon:>9.0f}{pss:>8.0f}{sum(row[2] for row in rows):>10.0f}"
+                      f"{load_ms:>9.0f}{query_ms:>10.3f}{index_mb if mode == 'shared' else 0:>10.0f}")
+            if len(rankings) != 1:
+                raise RuntimeError("shared and private workers ranked the queries differently")
+            print(f"{'':>7}(fit and publish {fit_s:.1f} s; identical rankings)")
+
+
+if __name__ == "__main__":
+    main()
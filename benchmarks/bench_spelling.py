@@ -0,0 +1,102 @@
+"""
+SPELLING CORRECTION BENCHMARK
+Misspells one keyword of every FAQ-derived query (a dropped, doubled,
+swapped or replaced letter) and reports hit@1 with and without the
+SymSpell corrector, plus what correction adds to the query path: analysis
+time with a cold correction cache (every typo looked up in the deletion
+index) and a warm one (repeated typos), against analysis without it.
+
+Run: python benchmarks/bench_spelling.py [--repeats 50] [--seed 0]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database_manager import FAQDatabase  # noqa: E402
+from search_engine import SemanticSearch  # noqa: E402
+from bench_scoring import keywords  # noqa: E402
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(("drop", "double", "swap", "replace"))
+    if edit == "drop":
+        return word[:i] + word[i + 1:]
+    if edit == "double":
+        return word[:i] + word[i] + word[i:]
+    if edit == "swap":
+        return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+    return word[:i] + rng.choice(string.ascii_lowercase.replace(word[i], "")) + word[i + 1:]
+
+
+def build_queries(questions, rng: random.Random):
+    """(query with a typo in its longest keyword, expected index) pairs"""
+    pairs = []
+    for i, question in enumerate(questions):
+        words = keywords(question)
+        longest = max(words, key=len, default="")
+        if len(longest) < 5:
+            continue
+        pairs.append((" ".join(misspell(word, rng) if word == longest else word for word in words), i))
+    return pairs
+
+
+def hit_rate(engine: SemanticSearch, pairs) -> float:
+    return sum(engine.search(query, top_k=1)[0]['index'] == expected for query, expected in pairs) / len(pairs)
+
+
+def median_us(analyze, queries, repeats: int, reset=None) -> float:
+    timings = []
+    for _ in range(repeats):
+        if reset is not None:
+            reset()
+        for query in queries:
+            start = time.perf_counter()
+            analyze(query)
+            timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    entries = list(FAQDatabase().iter_entries())
+    questions = [question for question, _, _ in entries]
+    answers = [answer for _, answer, _ in entries]
+    categories = [category for _, _, category in entries]
+    pairs = build_queries(questions, random.Random(args.seed))
+    queries = [query for query, _ in pairs]
+
+    start = time.perf_counter()
+    engine = SemanticSearch(questions, answers=answers, categories=categories, result_cache_size=0)
+    build_ms = (time.perf_counter() - start) * 1000
+    plain = SemanticSearch(questions, answers=answers, categories=categories, result_cache_size=0,
+                           correct_spelling=False)
+    snapshot = engine.snapshot()
+    analyzer, corrector = snapshot.analyzer, snapshot.corrector
+
+    print(f"{len(questions)} FAQs, {len(pairs)} misspelled queries, e.g. {queries[0]!r}")
+    print(f"corrector: {len(corrector)} words, {corrector.n_deletes} delete keys (index built in {build_ms:.1f} ms)")
+    print(f"hit@1 without correction: {hit_rate(plain, pairs):.1%}")
+    print(f"hit@1 with correction   : {hit_rate(engine, pairs):.1%}")
+
+    base = median_us(analyzer.analyze, queries, args.repeats)
+    cold = median_us(lambda query: analyzer.analyze(query, corrector), queries, args.repeats,
+                     reset=corrector._correct_token.cache_clear)
+    warm = median_us(lambda query: analyzer.analyze(query, corrector), queries, args.repeats)
+    print(f"analyze us/query: {base:.1f} plain, {cold:.1f} corrected (cold cache), {warm:.1f} corrected (warm)")
+    print(f"correction adds : {cold - base:.1f} us cold, {warm - base:.1f} us warm")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+STARTUP BENCHMARK
+Renders the default (Home) page of each app once in Streamlit's bare mode
+under `python -X importtime`, and reports the wall time, the total import
+time and the slowest top-level imports.
+
+The search stack must load on the first query, not on page render: the
+run fails (exit status 1) if any of HEAVY_MODULES was imported, so an
+eager import that creeps back in is caught.
+
+Run: python benchmarks/bench_startup.py [--top 8] [--root DIR] [app.py ...]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ["app.py", "app_final.py", "app_simple.py"]
+HEAVY_MODULES = ("sklearn", "scipy", "search_engine", "sentence_transformers", "pypdf")
+
+# "import time: <self us> | <cumulative us> | <indented module name>"
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def profile(app: str, root: str = ROOT):
+    """(wall seconds, [(cumulative us, module)] for top-level imports, all imported names)"""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", app], cwd=root,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"{app} failed:\n{completed.stderr[-2000:]}")
+
+    top_level, modules = [], set()
+    for line in completed.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        modules.add(name)
+        # Nesting is two spaces per level after the first space
+        if len(indent) == 1:
+            top_level.append((int(cumulative), name))
+    return wall, sorted(top_level, reverse=True), modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("apps", nargs="*", default=APPS)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--root", default=ROOT, help="checkout to profile (default: this one)")
+    args = parser.parse_args()
+
+    failed = False
+    for app in args.apps:
+        wall, top_level, modules = profile(app, args.root)
+        heavy = sorted(name for name in modules if name.split(".")[0] in HEAVY_MODULES and "." not in name)
+        print(f"{app}: {wall * 1000:.0f} ms wall, {sum(us for us, _ in top_level) / 1000:.0f} ms importing")
+        for cumulative, name in top_level[:args.top]:
+            print(f"    {cumulative / 1000:>8.1f} ms  {name}")
+        if heavy:
+            failed = True
+            print(f"    FAIL: loaded before any search: {', '.join(heavy)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
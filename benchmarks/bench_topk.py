@@ -0,0 +1,123 @@
+"""
+TOP-K RETRIEVAL BENCHMARK
+Compares the old per-query path (cosine_similarity + full argsort) with the
+pre-normalized sparse dot product + argpartition path, and with the posting
+list scoring SemanticSearch uses (InvertedIndex, MaxScore pruning on).
+
+MaxScore must stay exact: the run fails (exit status 1) unless its top-k
+scores match the exhaustive posting-list scan and the full dot product for
+every query.
+
+Run: python benchmarks/bench_topk.py [--sizes 1000 10000 100000 1000000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inverted_index import InvertedIndex  # noqa: E402
+
+VOCABULARY_SIZE = 50000
+TERMS_PER_DOC = 8
+TERMS_PER_QUERY = 3
+
+
+def random_tfidf(rows: int, terms_per_row: int, rng: np.random.Generator) -> csr_matrix:
+    """Random L2-normalized sparse rows shaped like a TF-IDF question matrix"""
+    # Zipf-ish term ids so a few terms are common, like real questions
+    indices = (rng.pareto(1.2, rows * terms_per_row) * 50).astype(np.int64) % VOCABULARY_SIZE
+    data = rng.random(rows * terms_per_row) + 0.1
+    indptr = np.arange(0, rows * terms_per_row + 1, terms_per_row)
+    matrix = csr_matrix((data, indices, indptr), shape=(rows, VOCABULARY_SIZE))
+    matrix.sum_duplicates()
+    return normalize(matrix, norm='l2')
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, best first, via partial selection"""
+    if top_k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.intp)
+    if top_k < len(scores):
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def check_maxscore(postings: InvertedIndex, matrix: csr_matrix, queries: csr_matrix, top_k: int) -> None:
+    """Raise unless MaxScore returns the exhaustive top-k scores for every query"""
+    for i in range(queries.shape[0]):
+        query = queries[i]
+        similarities = (matrix @ query.T).toarray().ravel()
+        expected = similarities[top_k_indices(similarities, top_k)]
+        expected = expected[expected > 0]
+        for early_termination in (True, False):
+            _, scores = postings.score(query.indices, query.data, top_k, early_termination)
+            if len(scores) != len(expected) or not np.allclose(scores, expected):
+                raise RuntimeError(f"query {i}: early_termination={early_termination} returned {scores}, "
+                                   f"the full dot product {expected}")
+
+
+def time_per_query(search, queries, repeats: int) -> float:
+    """Median milliseconds per query"""
+    timings = []
+    for _ in range(repeats):
+        for i in range(queries.shape[0]):
+            query = queries[i]
+            start = time.perf_counter()
+            search(query)
+            timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    queries = random_tfidf(args.queries, TERMS_PER_QUERY, rng)
+
+    print(f"{'FAQs':>10} {'old ms':>10} {'new ms':>10} {'speedup':>9} {'postings ms':>12}")
+    for size in args.sizes:
+        matrix = random_tfidf(size, TERMS_PER_DOC, rng)
+        repeats = 3 if size <= 100000 else 1
+
+        def old_search(query):
+            similarities = cosine_similarity(query, matrix)[0]
+            return similarities.argsort()[-args.top_k:][::-1]
+
+        def new_search(query):
+            similarities = (matrix @ query.T).toarray().ravel()
+            return top_k_indices(similarities, args.top_k)
+
+        # Both paths must agree on the best match before timing them
+        for i in range(min(5, args.queries)):
+            old_best, new_best = old_search(queries[i])[0], new_search(queries[i])[0]
+            assert np.isclose(cosine_similarity(queries[i], matrix[old_best])[0, 0],
+                              cosine_similarity(queries[i], matrix[new_best])[0, 0])
+
+        postings = InvertedIndex(matrix)
+        check_maxscore(postings, matrix, queries, args.top_k)
+
+        def postings_search(query):
+            return postings.score(query.indices, query.data, args.top_k)
+
+        old_ms = time_per_query(old_search, queries, repeats)
+        new_ms = time_per_query(new_search, queries, repeats)
+        postings_ms = time_per_query(postings_search, queries, repeats)
+        print(f"{size:>10} {old_ms:>10.3f} {new_ms:>10.3f} {old_ms / new_ms:>8.1f}x {postings_ms:>12.3f}")
+    print("MaxScore top-k scores matched the exhaustive scan for every query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# BM25 - Okapi BM25 weights precomputed into a sparse document-term matrix
+from typing import Dict, Iterable
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import CountVectorizer
+
+
+class BM25Vectorizer:
+    """BM25 with the same fit/transform surface as TfidfVectorizer
+
+    Document rows hold the saturated, length-normalized term frequency
+    tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)), and query rows hold
+    each term's IDF as a share of the query's total IDF divided by k1 + 1. A
+    dot product between the two is then BM25 scaled into [0, 1), so scoring
+    goes through the inverted index unchanged and scores read as confidences.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, k1: float = K1, b: float = B, **count_options):
+        self.k1 = k1
+        self.b = b
+        self.counter = CountVectorizer(**count_options)
+        self.idf_ = None
+        self.avgdl_ = None
+
+    @property
+    def vocabulary_(self) -> Dict[str, int]:
+        return self.counter.vocabulary_
+
+    @vocabulary_.setter
+    def vocabulary_(self, vocabulary: Dict[str, int]) -> None:
+        self.counter.vocabulary_ = vocabulary
+
+    def get_feature_names_out(self) -> np.ndarray:
+        return self.counter.get_feature_names_out()
+
+    def fit(self, documents: Iterable[str]) -> "BM25Vectorizer":
+        """Learn the vocabulary, IDF array and average document length"""
+        counts = self.counter.fit_transform(documents)
+        n_docs = counts.shape[0]
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+        self.idf_ = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        self.avgdl_ = float(counts.sum()) / max(n_docs, 1) or 1.0
+        return self
+
+    def fit_transform(self, documents: Iterable[str]) -> csr_matrix:
+        documents = list(documents)
+        return self.fit(documents).transform(documents)
+
+    def transform(self, documents: Iterable[str]) -> csr_matrix:
+        """Document rows: saturated term frequencies with length normalization"""
+        counts = self.counter.transform(documents).astype(np.float64)
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        norms = self.k1 * (1 - self.b + self.b * lengths / self.avgdl_)
+        tf = counts.data
+        row_norms = np.repeat(norms, np.diff(counts.indptr))
+        counts.data = tf * (self.k1 + 1) / (tf + row_norms)
+        return counts
+
+    def transform_queries(self, queries: Iterable[str]) -> csr_matrix:
+        """Query rows: each known term's share of the query IDF mass"""
+        counts = self.counter.transform(queries).astype(np.float64)
+        counts.data = self.idf_[counts.indices]
+        totals = np.asarray(counts.sum(axis=1)).ravel() * (self.k1 + 1)
+        totals[totals == 0] = 1.0
+        counts.data /= np.repeat(totals, np.diff(counts.indptr))
+        return counts
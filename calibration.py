@@ -0,0 +1,106 @@
+# CALIBRATION - Maps raw retrieval scores to the probability an answer is helpful
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Thresholds on calibrated confidence (a probability, not a raw cosine)
+CONFIDENCE_HIGH = 0.7
+CONFIDENCE_MEDIUM = 0.5
+
+# Feedback rating -> label; a partial answer counts as half helpful
+RATING_LABELS = {"helpful": 1.0, "somewhat": 0.5, "partial": 0.5, "not_helpful": 0.0}
+
+
+def feedback_samples(feedback: Iterable[Dict], scoring: str) -> List[Tuple[float, float]]:
+    """(score, label) pairs from logged feedback that recorded a score for this scoring model
+
+    Scores of n-gram fallback answers are character n-gram similarities, not
+    this model's scores, and are left out.
+    """
+    samples = []
+    for entry in feedback:
+        if entry.get("score") is None or entry.get("scoring") != scoring or entry.get("fallback"):
+            continue
+        label = RATING_LABELS.get(entry.get("rating"))
+        if label is not None:
+            samples.append((float(entry["score"]), label))
+    return samples
+
+
+class ScoreCalibrator:
+    """Monotone score -> P(helpful) lookup table
+
+    Fitted once when the index is built, then applied with np.interp, so a
+    search pays one interpolation over its top_k scores. Until enough
+    feedback exists the mapping is the raw score clipped to [0, 1].
+    """
+
+    MIN_SAMPLES = 20
+    # From this many samples isotonic regression replaces a logistic (Platt) fit
+    ISOTONIC_MIN_SAMPLES = 500
+    GRID_SIZE = 64
+
+    # numpy is imported inside the methods: the feedback helpers above are used
+    # by pages that render before the search stack is loaded
+
+    def __init__(self, scores: Optional[List[float]] = None, probabilities: Optional[List[float]] = None,
+                 n_samples: int = 0):
+        import numpy as np
+        self.scores = np.asarray(scores, dtype=np.float64) if scores is not None else None
+        self.probabilities = np.asarray(probabilities, dtype=np.float64) if probabilities is not None else None
+        self.n_samples = n_samples
+
+    @property
+    def fitted(self) -> bool:
+        return self.scores is not None
+
+    def __call__(self, scores):
+        import numpy as np
+        scores = np.asarray(scores, dtype=np.float64)
+        if not self.fitted:
+            return np.clip(scores, 0.0, 1.0)
+        return np.interp(scores, self.scores, self.probabilities)
+
+    @classmethod
+    def fit(cls, samples: Iterable[Tuple[float, float]]) -> "ScoreCalibrator":
+        """Fit from (score, label) pairs; labels are in [0, 1]"""
+        import numpy as np
+        samples = list(samples)
+        if len(samples) < cls.MIN_SAMPLES:
+            return cls()
+        scores = np.array([score for score, _ in samples], dtype=np.float64)
+        labels = np.array([label for _, label in samples], dtype=np.float64)
+        if labels.min() == labels.max() or scores.min() == scores.max():
+            return cls()
+
+        # Over the observed range only: fused (RRF) scores span about 0.016-0.033,
+        # so a grid over [0, 1] would leave them one or two grid points
+        grid = np.linspace(scores.min(), scores.max(), cls.GRID_SIZE)
+        if len(samples) >= cls.ISOTONIC_MIN_SAMPLES:
+            from sklearn.isotonic import IsotonicRegression
+            model = IsotonicRegression(y_min=0.0, y_max=1.0, increasing=True, out_of_bounds="clip")
+            probabilities = model.fit(scores, labels).predict(grid)
+        else:
+            from sklearn.linear_model import LogisticRegression
+            # Standardized first: the regularization would flatten a fit on a
+            # narrow raw range; soft labels as a weighted positive and negative copy
+            center, scale = scores.mean(), scores.std()
+            x = np.concatenate([scores, scores]).reshape(-1, 1)
+            y = np.concatenate([np.ones(len(scores)), np.zeros(len(scores))])
+            weights = np.concatenate([labels, 1.0 - labels])
+            model = LogisticRegression().fit((x - center) / scale, y, sample_weight=weights)
+            if model.coef_[0, 0] > 0:
+                probabilities = model.predict_proba((grid.reshape(-1, 1) - center) / scale)[:, 1]
+            else:
+                # Higher scores must never mean less confidence; fall back to the base rate
+                probabilities = np.full(len(grid), labels.mean())
+        return cls(grid.tolist(), probabilities.tolist(), len(samples))
+
+    def to_dict(self) -> Dict:
+        return {
+            "scores": self.scores.tolist() if self.fitted else None,
+            "probabilities": self.probabilities.tolist() if self.fitted else None,
+            "n_samples": self.n_samples,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ScoreCalibrator":
+        return cls(data.get("scores"), data.get("probabilities"), data.get("n_samples", 0))
@@ -0,0 +1,104 @@
+# CHAR INDEX - Character n-gram fallback index for short and misspelled queries
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from index_store import StringTable, _load, _load_postings, _save, _save_postings
+from inverted_index import AppendedIndex, InvertedIndex
+
+
+class CharNgramIndex:
+    """TF-IDF over character n-grams inside word boundaries (char_wb)
+
+    "fee" shares no word with "How to pay college fees?" but shares " fe",
+    "fee" and " fee", so the word index's near-empty answer to a one-word
+    or misspelled query can be rescued here. Rows align with the word
+    index; empty texts (passages, which are too long to be worth it) get
+    empty rows. Instances are immutable: appended() and subset() return new
+    ones, so they can live in a published snapshot.
+    """
+
+    NGRAM_RANGE = (3, 5)
+
+    def __init__(self, texts: Sequence[str], vectorizer: Optional[TfidfVectorizer] = None,
+                 matrix: Optional[csr_matrix] = None, postings: Optional[InvertedIndex] = None):
+        """Fit on texts, or wrap an already fitted vectorizer and its rows (and their postings)"""
+        if vectorizer is None:
+            vectorizer = self.new_vectorizer()
+            texts = list(texts)
+            if any(texts):
+                matrix = vectorizer.fit_transform(texts).tocsr()
+            else:
+                vectorizer, matrix = None, csr_matrix((len(texts), 0))
+        self.vectorizer = vectorizer
+        # Rows the base posting lists were built from; appended rows live in the postings
+        self._matrix = matrix
+        if postings is None and vectorizer is not None:
+            postings = InvertedIndex(matrix)
+        self.postings = postings
+
+    @property
+    def matrix(self) -> csr_matrix:
+        """All rows, stacked only when asked for (saving, subsetting): appends do not copy the index"""
+        if isinstance(self.postings, AppendedIndex):
+            return vstack([self._matrix, self.postings.rows], format="csr")
+        return self._matrix
+
+    @classmethod
+    def new_vectorizer(cls) -> TfidfVectorizer:
+        """Unfitted vectorizer with this index's settings"""
+        return TfidfVectorizer(analyzer="char_wb", ngram_range=cls.NGRAM_RANGE, lowercase=True,
+                               sublinear_tf=True, norm="l2")
+
+    def write(self, path: str) -> Optional[List[int]]:
+        """Save vocabulary, IDF, rows and postings as memory-mappable files; the shape attach() needs
+
+        None (and nothing written) when there is no vocabulary to save.
+        """
+        if self.vectorizer is None:
+            return None
+        StringTable.write(path, "char_vocabulary", self.vectorizer.get_feature_names_out().tolist())
+        _save(path, "char_idf", self.vectorizer.idf_)
+        matrix = self.matrix
+        _save_postings(path, "char_", matrix, self.postings)
+        return list(matrix.shape)
+
+    @classmethod
+    def attach(cls, path: str, shape: Sequence[int]) -> "CharNgramIndex":
+        """Index over files saved by write(), memory-mapped rather than refitted"""
+        vectorizer = cls.new_vectorizer()
+        # The n-gram vocabulary stays small (it saturates with the alphabet); sklearn needs a dict
+        vectorizer.vocabulary_ = {gram: i for i, gram in enumerate(StringTable.attach(path, "char_vocabulary"))}
+        vectorizer.idf_ = _load(path, "char_idf")
+        matrix, postings = _load_postings(path, "char_", tuple(shape))
+        return cls((), vectorizer, matrix, postings)
+
+    def appended(self, texts: Sequence[str]) -> "CharNgramIndex":
+        """Index with rows for texts added after the existing ones (no refit)"""
+        texts = list(texts)
+        if self.vectorizer is None:
+            return CharNgramIndex(([""] * self.matrix.shape[0]) + texts)
+        rows = self.vectorizer.transform(texts)
+        return CharNgramIndex((), self.vectorizer, self._matrix, self.postings.appended(rows))
+
+    def subset(self, rows: List[int]) -> "CharNgramIndex":
+        """Index keeping only the given rows, in that order"""
+        return CharNgramIndex((), self.vectorizer, self.matrix[rows])
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (row ids, cosine similarities), best first"""
+        if self.vectorizer is None or top_k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        query_vector = self.vectorizer.transform([query])
+        return self.postings.score(query_vector.indices, query_vector.data, top_k)
+
+    def search_batch(self, queries: Sequence[str], top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """search() for many queries: one transform and one sparse product for all of them"""
+        if self.vectorizer is None or top_k <= 0 or len(queries) == 0:
+            return [(np.empty(0, dtype=np.intp), np.empty(0)) for _ in queries]
+        scores = self.postings.dot(self.vectorizer.transform(list(queries)))
+        scores.sort_indices()
+        return [InvertedIndex.top_k(scores.indices[start:end], scores.data[start:end], top_k)
+                for start, end in zip(scores.indptr[:-1], scores.indptr[1:])]
@@ -1,92 +1,200 @@
 # FAQ DATABASE MANAGER - Handles all FAQ-related operations
-import json
 import os
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+from calibration import CONFIDENCE_MEDIUM, feedback_samples
+from event_log import EventLog
+from faq_store import SQLiteFAQStore
 
 class FAQDatabase:
-    """Manages FAQ data with custom university-specific questions"""
+    """Manages FAQ data with custom university-specific questions
+
+    Pairs live in a SQLite store (see faq_store.py), seeded with the built-in
+    FAQs on first use, so contributed answers survive restarts.
+    """
+    
+    DB_FILE = "faq_data.db"
+    # Where build_search_engine() publishes the index for service workers to map
+    # (shared_index.py); FAQ_SHARED_INDEX_DIR, unset keeps the index private
+    SHARED_INDEX_DIR = os.environ.get("FAQ_SHARED_INDEX_DIR") or None
     
-    def __init__(self):
-        self.faqs = self._initialize_faqs()
+    def __init__(self, db_path: str = DB_FILE):
+        self.store = SQLiteFAQStore(db_path)
+        if self.store.count() == 0:
+            self._seed()
+    
+    def _seed(self) -> None:
+        """Load the built-in FAQs into an empty store"""
+        self.store.seed(
+            (question, answer, category)
+            for category, pairs in self._initialize_faqs().items()
+            for question, answer in pairs.items()
+        )
     
     @staticmethod
-    def _initialize_faqs() -> Dict[str, str]:
-        """Create custom university FAQ database"""
+    def _initialize_faqs() -> Dict[str, Dict[str, str]]:
+        """Create custom university FAQ database, grouped by category"""
         return {
-            # ENROLLMENT & ADMISSION
-            "How can I enroll in courses?": "You can enroll through the student portal during registration week each semester.",
-            "What documents are needed for admission?": "Marks cards, ID proof, photographs, and application form are required for admission.",
-            "What is the minimum attendance required?": "Minimum 75 percent attendance is mandatory for all students.",
-            "When are exams conducted?": "Exams are conducted at the end of each semester, typically after 24 weeks of classes.",
+            "Enrollment & Admission": {
+                "How can I enroll in courses?": "You can enroll through the student portal during registration week each semester.",
+                "What documents are needed for admission?": "Marks cards, ID proof, photographs, and application form are required for admission.",
+                "What is the minimum attendance required?": "Minimum 75 percent attendance is mandatory for all students.",
+                "When are exams conducted?": "Exams are conducted at the end of each semester, typically after 24 weeks of classes."
+            },
             
-            # ACADEMIC RESOURCES
-            "What facilities are available on campus?": "Library, computing labs, hostel, sports ground, medical center, and recreation facilities.",
-            "What are library timings?": "Library is open from 9 AM to 8 PM on weekdays and 10 AM to 6 PM on weekends.",
-            "Is WiFi available on campus?": "Yes, free high-speed WiFi is available throughout the campus.",
-            "How to access student portal?": "Login using your student ID and password on the main website portal.",
+            "Academic Resources": {
+                "What facilities are available on campus?": "Library, computing labs, hostel, sports ground, medical center, and recreation facilities.",
+                "What are library timings?": "Library is open from 9 AM to 8 PM on weekdays and 10 AM to 6 PM on weekends.",
+                "Is WiFi available on campus?": "Yes, free high-speed WiFi is available throughout the campus.",
+                "How to access student portal?": "Login using your student ID and password on the main website portal."
+            },
             
-            # HOSTEL SERVICES
-            "Is hostel available?": "Yes, hostel is available for both boys and girls with comfortable accommodation.",
-            "How to apply for hostel?": "Apply through the hostel application form available on the student portal.",
-            "Is hostel food provided?": "Yes, mess facility provides breakfast, lunch, dinner and snacks daily.",
-            "What are hostel room types?": "Single, Double, and Triple occupancy rooms are available with modern amenities.",
+            "Hostel Services": {
+                "Is hostel available?": "Yes, hostel is available for both boys and girls with comfortable accommodation.",
+                "How to apply for hostel?": "Apply through the hostel application form available on the student portal.",
+                "Is hostel food provided?": "Yes, mess facility provides breakfast, lunch, dinner and snacks daily.",
+                "What are hostel room types?": "Single, Double, and Triple occupancy rooms are available with modern amenities."
+            },
             
-            # FINANCIAL & FEES
-            "How to pay college fees?": "Fees can be paid online through the portal, bank transfer, or at the fee collection desk.",
-            "Are scholarships available?": "Yes, merit-based and need-based scholarships are provided to eligible students.",
-            "How to apply for financial aid?": "Submit financial aid form on the university website during application period.",
+            "Financial & Fees": {
+                "How to pay college fees?": "Fees can be paid online through the portal, bank transfer, or at the fee collection desk.",
+                "Are scholarships available?": "Yes, merit-based and need-based scholarships are provided to eligible students.",
+                "How to apply for financial aid?": "Submit financial aid form on the university website during application period."
+            },
             
-            # PLACEMENT & CAREER
-            "Is placement support available?": "Yes, placement and training cell assists students with internships and job placements.",
-            "Are internships available?": "Yes, students get internship opportunities during summer and final year.",
-            "What is average placement percentage?": "Our university has 98% placement rate with average CTC of 8-12 LPA.",
+            "Placement & Career": {
+                "Is placement support available?": "Yes, placement and training cell assists students with internships and job placements.",
+                "Are internships available?": "Yes, students get internship opportunities during summer and final year.",
+                "What is average placement percentage?": "Our university has 98% placement rate with average CTC of 8-12 LPA."
+            },
             
-            # CAMPUS LIFE
-            "Is sports facility available?": "Yes, various indoor and outdoor sports facilities with professional coaching available.",
-            "Is medical facility available?": "Yes, campus has medical center with doctors and emergency services.",
-            "What courses are offered?": "Engineering, Data Science, Business Administration, and various postgraduate programs.",
+            "Campus Life": {
+                "Is sports facility available?": "Yes, various indoor and outdoor sports facilities with professional coaching available.",
+                "Is medical facility available?": "Yes, campus has medical center with doctors and emergency services.",
+                "What courses are offered?": "Engineering, Data Science, Business Administration, and various postgraduate programs."
+            },
             
-            # STUDENT SERVICES
-            "How to get ID card?": "ID card is automatically issued to all students during the orientation week.",
-            "Is counseling support available?": "Yes, counseling services are provided for academic and personal guidance.",
-            "How to contact administration?": "Email admin@gmucollege.edu or visit the main office during office hours.",
-            "What are college working hours?": "College operates from 9 AM to 4 PM on weekdays.",
+            "Student Services": {
+                "How to get ID card?": "ID card is automatically issued to all students during the orientation week.",
+                "Is counseling support available?": "Yes, counseling services are provided for academic and personal guidance.",
+                "How to contact administration?": "Email admin@gmucollege.edu or visit the main office during office hours.",
+                "What are college working hours?": "College operates from 9 AM to 4 PM on weekdays."
+            },
             
-            # ACADEMIC SUPPORT
-            "Is there research facility?": "Yes, well-equipped laboratories support student and faculty research work.",
-            "How to submit assignments?": "Assignments can be submitted online through portal or in-class as specified by professors.",
-            "Are workshops conducted?": "Yes, regular technical and soft skills workshops are conducted throughout the year.",
-            "What is exam passing criteria?": "Minimum 40 percent marks is required to pass each semester examination."
+            "Academic Support": {
+                "Is there research facility?": "Yes, well-equipped laboratories support student and faculty research work.",
+                "How to submit assignments?": "Assignments can be submitted online through portal or in-class as specified by professors.",
+                "Are workshops conducted?": "Yes, regular technical and soft skills workshops are conducted throughout the year.",
+                "What is exam passing criteria?": "Minimum 40 percent marks is required to pass each semester examination."
+            }
         }
     
     def get_all_faqs(self) -> Dict[str, str]:
         """Get all FAQ pairs"""
-        return self.faqs.copy()
+        return dict(self.store.iter_pairs())
+    
+    def iter_faqs(self, category: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """Stream (question, answer) pairs, optionally for one category"""
+        return self.store.iter_pairs(category=category)
+    
+    def iter_entries(self) -> Iterator[Tuple[str, str, str]]:
+        """Stream (question, answer, category) rows in index order"""
+        return self.store.iter_entries()
+    
+    def get_faq_page(self, after_id: int = 0, limit: int = 10,
+                     category: Optional[str] = None) -> List[Tuple[int, str, str]]:
+        """(id, question, answer) rows following after_id, for paging through the FAQs"""
+        return self.store.page(after_id, limit, category)
+    
+    def get_questions_list(self) -> Iterator[str]:
+        """Stream all questions in index order"""
+        return (question for question, _ in self.store.iter_pairs())
+    
+    def get_answers_list(self) -> Iterator[str]:
+        """Stream all answers in index order"""
+        return (answer for _, answer in self.store.iter_pairs())
+    
+    def filter_category(self, questions: List[str], category: str) -> List[str]:
+        """Keep the questions filed under category, in order"""
+        return self.store.in_category(questions, category)
+    
+    def get_answer(self, question: str) -> str:
+        """Get the answer for an indexed question"""
+        return self.store.answer(question) or ""
+    
+    def ingest_documents(self) -> Dict[str, int]:
+        """Extract passages from new or changed handbook PDFs"""
+        # Imported here: pypdf is slow to load and only index builds need it
+        from pdf_ingest import ingest_pdfs
+        return ingest_pdfs(self.store)
+    
+    def get_passages_list(self) -> Iterator[str]:
+        """Stream all document passages in index order"""
+        return self.store.iter_passage_texts()
+    
+    def get_passage_source(self, passage: str) -> Optional[Tuple[str, int]]:
+        """(PDF file, page) a passage was taken from"""
+        return self.store.passage_source(passage)
     
-    def get_questions_list(self) -> List[str]:
-        """Get list of all questions"""
-        return list(self.faqs.keys())
+    def iter_passage_sources(self) -> Iterator[Tuple[str, str, int]]:
+        """Stream (passage, PDF file, page) in index order"""
+        return self.store.iter_passages()
     
-    def get_answers_list(self) -> List[str]:
-        """Get list of all answers"""
-        return list(self.faqs.values())
+    def build_search_engine(self, index_dir: Optional[str] = None, shared_dir: Optional[str] = SHARED_INDEX_DIR):
+        """Search index over the FAQs and handbook passages, calibrated from logged feedback
+
+        New or changed PDFs are ingested first. The saved index in index_dir
+        (index_cache/faq by default) is reused when the corpus is unchanged.
+        With shared_dir, the index and every later refit are also published
+        there for service workers to attach to; dense and hybrid engines are
+        never shared.
+        """
+        # Imported here: the search stack (scikit-learn, SciPy) is slow to load
+        from search_engine import create_engine, FAQ_DOC, PASSAGE_DOC, SCORING_MODELS, SemanticSearch
+        from index_store import DEFAULT_INDEX_DIR
+        self.ingest_documents()
+        entries = list(self.iter_entries())
+        passages = list(self.get_passages_list())
+        questions = [question for question, _, _ in entries] + passages
+        answers = [answer for _, answer, _ in entries] + [""] * len(passages)
+        categories = [category for _, _, category in entries] + [""] * len(passages)
+        doc_types = [FAQ_DOC] * len(entries) + [PASSAGE_DOC] * len(passages)
+        shared = {"shared_dir": shared_dir} if shared_dir and SemanticSearch.SCORING in SCORING_MODELS else {}
+        engine = create_engine(questions, cache_dir=index_dir or os.path.join(DEFAULT_INDEX_DIR, "faq"),
+                               doc_types=doc_types, answers=answers, categories=categories, **shared)
+        # Confidence calibration is refitted from logged feedback with every build
+        engine.calibrate(AnalyticsManager.calibration_samples(AnalyticsManager.load_analytics(), engine.scoring))
+        return engine
+    
+    def get_categories(self) -> List[str]:
+        """Get all FAQ categories"""
+        return self.store.categories()
     
-    def add_faq(self, question: str, answer: str) -> bool:
+    def add_faq(self, question: str, answer: str, category: str = "General") -> bool:
         """Add new FAQ pair"""
         if question and answer:
-            self.faqs[question] = answer
+            self.store.upsert(question, answer, category=category, source="contributed")
             return True
         return False
     
-    def get_faq_count(self) -> int:
+    def get_faq_count(self, category: Optional[str] = None) -> int:
         """Get total number of FAQs"""
-        return len(self.faqs)
+        return self.store.count(category)
 
 
 class AnalyticsManager:
-    """Manages user interaction analytics"""
+    """Manages user interaction analytics
+
+    Every interaction is an event queued for a background writer that appends
+    to EVENTS_FILE; ANALYTICS_FILE is the compacted snapshot. Counters are
+    derived from snapshot + tail.
+    """
     
     ANALYTICS_FILE = "analytics_data.json"
+    EVENTS_FILE = "analytics_events.jsonl"
+    FLUSH_INTERVAL = 1.0      # seconds between background writer batches
+    QUEUE_SIZE = 10000        # events buffered before the overflow policy applies
+    QUEUE_OVERFLOW = "drop"   # or "block" for backpressure on the script thread
+    _event_log = None
     
     @staticmethod
     def initialize_analytics() -> Dict:
@@ -100,45 +208,99 @@ class AnalyticsManager:
             "user_feedback": []
         }
     
+    @staticmethod
+    def apply_event(analytics: Dict, event: Dict) -> None:
+        """Fold one logged event into the analytics counters"""
+        kind = event["type"]
+        if kind == "query":
+            analytics["total_queries"] += 1
+            query = event["query"]
+            analytics["top_questions"][query] = analytics["top_questions"].get(query, 0) + 1
+        elif kind == "confidence":
+            if event["confidence"] >= CONFIDENCE_MEDIUM:
+                analytics["high_confidence"] += 1
+            else:
+                analytics["low_confidence"] += 1
+        elif kind == "feedback":
+            entry = {"query": event["query"], "rating": event["rating"]}
+            if "score" in event:
+                entry.update(score=event["score"], scoring=event["scoring"])
+            if event.get("fallback"):
+                entry["fallback"] = True
+            analytics["user_feedback"].append(entry)
+        elif kind == "learned":
+            analytics["learned_answers"] += 1
+    
+    @staticmethod
+    def event_log() -> EventLog:
+        """Process-wide event log shared by all sessions"""
+        if AnalyticsManager._event_log is None:
+            AnalyticsManager._event_log = EventLog(
+                AnalyticsManager.ANALYTICS_FILE,
+                AnalyticsManager.EVENTS_FILE,
+                AnalyticsManager.initialize_analytics,
+                AnalyticsManager.apply_event,
+                queue_size=AnalyticsManager.QUEUE_SIZE,
+                flush_interval=AnalyticsManager.FLUSH_INTERVAL,
+                overflow=AnalyticsManager.QUEUE_OVERFLOW
+            )
+        return AnalyticsManager._event_log
+    
     @staticmethod
     def load_analytics() -> Dict:
-        """Load analytics from file"""
-        if os.path.exists(AnalyticsManager.ANALYTICS_FILE):
-            with open(AnalyticsManager.ANALYTICS_FILE, 'r') as f:
-                return json.load(f)
-        return AnalyticsManager.initialize_analytics()
+        """Load analytics from snapshot plus event log"""
+        return AnalyticsManager.event_log().load()
     
     @staticmethod
     def save_analytics(data: Dict) -> None:
-        """Save analytics to file"""
-        with open(AnalyticsManager.ANALYTICS_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
+        """Nudge the background writer to flush recorded events
+
+        Events were captured as they were recorded, so data itself is not
+        written, and the script thread never waits on the disk.
+        """
+        AnalyticsManager.event_log().flush(wait=False)
+    
+    @staticmethod
+    def _record(analytics: Dict, event: Dict) -> None:
+        """Apply an event to the session view and queue it for the log"""
+        AnalyticsManager.apply_event(analytics, event)
+        AnalyticsManager.event_log().append(event)
     
     @staticmethod
     def record_query(analytics: Dict, query: str) -> None:
         """Record a user query"""
-        analytics["total_queries"] += 1
-        if query not in analytics["top_questions"]:
-            analytics["top_questions"][query] = 0
-        analytics["top_questions"][query] += 1
+        AnalyticsManager._record(analytics, {"type": "query", "query": query})
     
     @staticmethod
     def record_confidence(analytics: Dict, confidence: float) -> None:
         """Record answer confidence"""
-        if confidence >= 0.5:
-            analytics["high_confidence"] += 1
-        else:
-            analytics["low_confidence"] += 1
+        AnalyticsManager._record(analytics, {"type": "confidence", "confidence": float(confidence)})
+    
+    @staticmethod
+    def record_feedback(analytics: Dict, query: str, rating: str,
+                        score: Optional[float] = None, scoring: Optional[str] = None,
+                        fallback: bool = False) -> None:
+        """Record user feedback, with the top answer's raw score for calibration
+
+        fallback marks an answer from the n-gram fallback, whose score is not
+        calibrated.
+        """
+        event = {"type": "feedback", "query": query, "rating": rating}
+        if score is not None:
+            event.update(score=float(score), scoring=scoring)
+        if fallback:
+            event["fallback"] = True
+        AnalyticsManager._record(analytics, event)
     
     @staticmethod
-    def record_feedback(analytics: Dict, query: str, rating: str) -> None:
-        """Record user feedback"""
-        analytics["user_feedback"].append({"query": query, "rating": rating})
+    def calibration_samples(analytics: Dict, scoring: str) -> List[Tuple[float, float]]:
+        """(score, label) pairs from feedback given under a scoring model"""
+        return feedback_samples(analytics["user_feedback"], scoring)
     
     @staticmethod
     def add_learned_answer(analytics: Dict) -> None:
         """Increment learned answers count"""
-        analytics["learned_answers"] += 1
+        AnalyticsManager._record(analytics, {"type": "learned"})
     
     @staticmethod
     def get_top_questions(analytics: Dict, limit: int = 10) -> List[Tuple[str, int]]:
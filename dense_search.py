@@ -0,0 +1,173 @@
+# DENSE SEARCH - Sentence-embedding retrieval with an IVF nearest-neighbour index
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ann_index import IVFIndex
+from index_store import corpus_hash, load_embeddings, save_embeddings
+from search_engine import IndexSnapshot, SemanticSearch
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # dense mode is optional; TF-IDF and BM25 work without it
+    SentenceTransformer = None
+
+DEFAULT_MODEL_PATH = os.environ.get("FAQ_EMBEDDING_MODEL", os.path.join("models", "all-MiniLM-L6-v2"))
+
+
+class SentenceEncoder:
+    """Local, CPU-only sentence embedding model loaded from a directory on disk"""
+
+    BATCH_SIZE = 64
+
+    def __init__(self, model_path: str = DEFAULT_MODEL_PATH, batch_size: int = BATCH_SIZE):
+        if SentenceTransformer is None:
+            raise ImportError("dense retrieval needs sentence-transformers: pip install sentence-transformers")
+        if not os.path.isdir(model_path):
+            raise FileNotFoundError(f"embedding model not found at {model_path!r} (set FAQ_EMBEDDING_MODEL)")
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_path, device="cpu")
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Unit-length float32 embeddings, batch_size texts per forward pass
+
+        Empty texts (e.g. a passage with no answer field) get a zero row so
+        they add nothing to a score.
+        """
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        present = [i for i, text in enumerate(texts) if text]
+        if present:
+            embeddings[present] = self.model.encode([texts[i] for i in present], batch_size=self.batch_size,
+                                                    normalize_embeddings=True, convert_to_numpy=True)
+        return embeddings
+
+
+class DenseSearch(SemanticSearch):
+    """SemanticSearch over sentence embeddings instead of term weights
+
+    Matches paraphrases that share no words with an FAQ. Documents are
+    embedded in batches when the index is built (and only the new rows on
+    add_questions); a request embeds just its query. Field blocks, weights,
+    the result cache and copy-on-write snapshots work as in SemanticSearch.
+    """
+
+    SCORING_MODELS = ("dense",)
+
+    def __init__(self, questions: List[str], encoder: Optional[SentenceEncoder] = None,
+                 model_path: str = DEFAULT_MODEL_PATH, quantize: bool = True,
+                 n_probe: int = IVFIndex.N_PROBE, **options):
+        """encoder defaults to a SentenceEncoder loaded from model_path
+
+        quantize stores the searched rows as int8 codes; n_probe is how many
+        IVF cells each query scans. Other options are as for SemanticSearch.
+        """
+        self.encoder = encoder or SentenceEncoder(model_path)
+        self.quantize = quantize
+        self.n_probe = n_probe
+        options["scoring"] = "dense"
+        super().__init__(questions, **options)
+
+    def _new_vectorizer(self) -> SentenceEncoder:
+        return self.encoder
+
+    def _new_analyzer(self, vectorizer: SentenceEncoder) -> None:
+        # Queries go through the encoder; there are no terms to analyze
+        return None
+
+    def _new_fallback(self, analyzer, questions, doc_types) -> None:
+        # Embeddings already tolerate short and misspelled queries
+        return None
+
+    def _query_vectors(self, vectorizer: SentenceEncoder, queries: Sequence[str]) -> np.ndarray:
+        return vectorizer.encode(list(queries))
+
+    def _vectorize(self, vectorizer: SentenceEncoder, questions, answers, categories, fit: bool = False) -> np.ndarray:
+        """One embedding block per field, side by side"""
+        blocks = [vectorizer.encode(list(texts)) for texts in self._field_texts(questions, answers, categories)]
+        return blocks[0] if len(blocks) == 1 else np.hstack(blocks)
+
+    def _build_postings(self, vectors: np.ndarray, incremental: bool) -> IVFIndex:
+        """Re-bucket rows under the current centroids on small edits; recluster on a fit"""
+        previous = self._snapshot.postings
+        centroids = previous.centroids if incremental and previous is not None else None
+        return IVFIndex(vectors, n_probe=self.n_probe, quantize=self.quantize, centroids=centroids)
+
+    @staticmethod
+    def _append_rows(vectors: np.ndarray, new_vectors: np.ndarray) -> np.ndarray:
+        return np.vstack([vectors, new_vectors])
+
+    @staticmethod
+    def _count_orphans(new_vectors: np.ndarray) -> int:
+        # Every text embeds to something; nothing waits on a refit to become searchable
+        return 0
+
+    def _weighted_query(self, query_vector: np.ndarray, weights: Tuple[float, ...]) -> np.ndarray:
+        return np.concatenate([query_vector * weight for weight in weights])
+
+    def _search(self, snapshot: IndexSnapshot, query: str, top_k: int, weights: Tuple[float, ...]) -> List[Dict]:
+        if len(snapshot.questions) == 0:
+            return []
+        query_vector = self._query_vectors(snapshot.vectorizer, [query])[0]
+        top_indices, scores = snapshot.postings.search(self._weighted_query(query_vector, weights), top_k)
+        return self._results(snapshot, top_indices, np.maximum(scores, 0.0), top_k)
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 3,
+                     field_weights: Optional[Dict[str, float]] = None, with_fallback: bool = False) -> tuple:
+        """Embed all queries in one batch, then probe the IVF index per query (there is no fallback)"""
+        snapshot = self._snapshot
+        top_k = max(top_k, 0)
+        indices = np.full((len(queries), top_k), -1, dtype=np.int64)
+        scores = np.zeros((len(queries), top_k), dtype=np.float32)
+        no_fallback = np.zeros(len(queries), dtype=bool)
+        if len(snapshot.questions) == 0 or len(queries) == 0 or top_k <= 0:
+            return (indices, scores, no_fallback) if with_fallback else (indices, scores)
+
+        weights = self._weights(field_weights)
+        for row, query_vector in enumerate(self._query_vectors(snapshot.vectorizer, queries)):
+            found, found_scores = snapshot.postings.search(self._weighted_query(query_vector, weights), top_k)
+            indices[row, :len(found)] = found
+            scores[row, :len(found)] = np.maximum(found_scores, 0.0)
+        return (indices, scores, no_fallback) if with_fallback else (indices, scores)
+
+    def _compact(self) -> None:
+        """Recluster the IVF cells in the background; embeddings never change"""
+        while True:
+            current = self._snapshot
+            postings = self._build_postings(current.question_vectors, incremental=False)
+            with self._lock:
+                # Writes that landed while clustering would be lost; cluster again
+                if self._snapshot is not current:
+                    continue
+                self._snapshot = current._replace(postings=postings, generation=current.generation + 1)
+                self._fitted_count = len(current.questions)
+                self._changes = 0
+                self._orphans = 0
+            return
+
+    def _corpus_hash(self, questions, doc_types, answers, categories) -> str:
+        model = getattr(self.encoder, "model_path", type(self.encoder).__name__)
+        return corpus_hash((self.scoring, model) + self.fields, questions, doc_types,
+                           *self._field_texts(questions, answers, categories)[1:])
+
+    def _load_cached(self, questions: List[str], doc_types: List[str],
+                     answers: List[str], categories: List[str]) -> bool:
+        """Memory-map saved embeddings so a restart skips the embedding pass"""
+        embeddings = load_embeddings(self.cache_dir, self._corpus_hash(questions, doc_types, answers, categories))
+        if embeddings is None:
+            return False
+        with self._lock:
+            self._publish(tuple(questions), tuple(doc_types), tuple(answers), tuple(categories),
+                          self.encoder, embeddings)
+            self._fitted_count = len(questions)
+            self._changes = 0
+            self._orphans = 0
+        return True
+
+    def _save_cached(self, snapshot: IndexSnapshot) -> None:
+        if not self.cache_dir or snapshot.question_vectors is None:
+            return
+        save_embeddings(self.cache_dir, self._corpus_hash(snapshot.questions, snapshot.doc_types, snapshot.answers,
+                                                          snapshot.categories), snapshot.question_vectors)
@@ -0,0 +1,235 @@
+# EVENT LOG - Append-only analytics events with periodic snapshot compaction
+import atexit
+import json
+import os
+import queue
+import threading
+from typing import Callable, Dict, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-process use only
+    fcntl = None
+
+
+class EventLog:
+    """Line-delimited JSON event log folded into a JSON snapshot
+
+    State is never rewritten per interaction. Events go onto a bounded
+    in-memory queue and a background writer thread appends them to the log in
+    batches, one write and fsync per batch, every flush_interval seconds. The
+    log is folded into the snapshot file only when it grows past compact_every
+    lines. Readers rebuild state as snapshot + tail, so concurrent sessions
+    and processes only ever append and cannot clobber each other.
+
+    When the queue is full, overflow="drop" discards the event (counted in
+    dropped) and overflow="block" waits up to block_timeout seconds for room
+    before dropping. Pending events are flushed at interpreter exit.
+
+    A torn last log line (a crash mid-append) is skipped. An unreadable
+    snapshot is read as initial_state, and the next compaction moves it
+    to <snapshot_file>.corrupt instead of overwriting it.
+    """
+
+    COMPACT_EVERY = 1000
+    QUEUE_SIZE = 10000
+    FLUSH_INTERVAL = 1.0
+    BLOCK_TIMEOUT = 1.0
+
+    def __init__(self, snapshot_file: str, log_file: str,
+                 initial_state: Callable[[], Dict], apply: Callable[[Dict, Dict], None],
+                 compact_every: int = COMPACT_EVERY, queue_size: int = QUEUE_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, overflow: str = "drop",
+                 block_timeout: float = BLOCK_TIMEOUT):
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"overflow must be 'drop' or 'block', not {overflow!r}")
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file
+        self.initial_state = initial_state
+        self.apply = apply
+        self.compact_every = compact_every
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = None
+        self._lock = threading.Lock()
+        self._tail_lines = None
+        atexit.register(self.close)
+
+    def load(self) -> Dict:
+        """Current state: the compacted snapshot with the log tail replayed
+
+        Events still queued for the writer are not included yet.
+        """
+        with self._lock, self._file_lock(shared=True):
+            state, tail_lines, _ = self._read_state()
+            self._tail_lines = tail_lines
+        return state
+
+    def append(self, event: Dict) -> None:
+        """Queue one event for the background writer; never touches the disk"""
+        if self._closed:
+            self._write_batch([event])
+            return
+        self._ensure_writer()
+        try:
+            if self.overflow == "block":
+                self._queue.put(event, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, wait: bool = True) -> None:
+        """Ask the writer to drain now; with wait, return once it is on disk"""
+        self._wake.set()
+        if not wait:
+            return
+        if self._writer is None or not self._writer.is_alive():
+            # Nobody would ever drain the queue: do it here rather than wait forever
+            self._drain()
+        self._queue.join()
+
+    def close(self) -> None:
+        """Stop the writer after a final drain (registered with atexit)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join()
+        self._drain()
+
+    def _ensure_writer(self) -> None:
+        """Start the writer, or a new one if the last one died"""
+        if self._writer is None or not self._writer.is_alive():
+            with self._lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+                    self._writer.start()
+
+    def _run(self) -> None:
+        """Writer loop: drain the queue every flush_interval or when woken"""
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._drain()
+
+    def _drain(self) -> None:
+        """Write everything currently queued as one batch"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+        try:
+            self._write_batch(batch)
+        except Exception:
+            # Losing a batch of analytics (e.g. an event json cannot encode)
+            # beats killing the writer thread and silently dropping the rest
+            self.dropped += len(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_batch(self, batch: List[Dict]) -> None:
+        """Append a batch with a single write and fsync, compacting if due"""
+        lines = "".join(json.dumps(event) + "\n" for event in batch).encode("utf-8")
+        with self._lock, self._file_lock(shared=False):
+            with open(self.log_file, "ab+") as f:
+                # After a torn last line, start on a fresh one so the first event is not lost with it
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        lines = b"\n" + lines
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._tail_lines is None:
+                self._tail_lines = self._count_lines()
+            else:
+                self._tail_lines += len(batch)
+            if self._tail_lines >= self.compact_every:
+                self._compact()
+
+    def compact(self) -> None:
+        """Fold the log into the snapshot and truncate the log"""
+        with self._lock, self._file_lock(shared=False):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Compaction body; caller holds both locks"""
+        state, _, corrupt = self._read_state()
+        if corrupt:
+            # Kept for inspection; its events are not in state
+            os.replace(self.snapshot_file, f"{self.snapshot_file}.corrupt")
+        tmp_path = f"{self.snapshot_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_file)
+        # Snapshot is durable before the events it absorbed are dropped
+        open(self.log_file, "w").close()
+        self._tail_lines = 0
+
+    def _read_state(self):
+        """Snapshot plus replayed tail, the number of tail lines, and whether the snapshot was unreadable"""
+        state, corrupt = None, False
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except ValueError:
+                corrupt = True
+        if state is None:
+            state = self.initial_state()
+
+        tail_lines = 0
+        if os.path.exists(self.log_file):
+            with open(self.log_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    tail_lines += 1
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from a crash mid-append
+                    self.apply(state, event)
+        return state, tail_lines, corrupt
+
+    def _count_lines(self) -> int:
+        if not os.path.exists(self.log_file):
+            return 0
+        with open(self.log_file, "rb") as f:
+            return sum(1 for _ in f)
+
+    def _file_lock(self, shared: bool):
+        return _FileLock(f"{self.log_file}.lock", shared)
+
+
+class _FileLock:
+    """Cross-process advisory lock on a side file (no-op without fcntl)"""
+
+    def __init__(self, path: str, shared: bool):
+        self.path = path
+        self.shared = shared
+        self._handle = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._handle = open(self.path, "a")
+            fcntl.flock(self._handle, fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._handle is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
@@ -0,0 +1,80 @@
+# FAQ BROWSER - Paginated, searchable "View All FAQs" listing
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import streamlit as st
+
+# (cursor, question, answer): the cursor orders rows and marks where the next page starts
+Row = Tuple[int, str, str]
+
+PAGE_SIZE = 10
+# Ranked matches a typed filter can page through; also the engine's top_k,
+# so every page of one filter is the same (cached) search
+SEARCH_LIMIT = 200
+ALL_CATEGORIES = "All categories"
+
+
+def list_page(questions: Sequence[str], answers: Sequence[str], after: int, limit: int) -> List[Row]:
+    """Rows of aligned in-memory lists after position after (cursors count from 1)"""
+    end = min(after + limit, len(questions), len(answers))
+    return [(i + 1, questions[i], answers[i]) for i in range(after, end)]
+
+
+def render_faq_page(rows: Sequence[Row], first_number: int) -> str:
+    """Markdown for one page of FAQs, shown as a single element"""
+    return "\n\n---\n\n".join(
+        f"**{number}. {question}**  \n_{answer}_"
+        for number, (_, question, answer) in enumerate(rows, first_number)
+    )
+
+
+def render_faq_browser(key: str, page_rows: Callable[[int, int, Optional[str]], List[Row]],
+                       search: Optional[Callable[[str, int, Optional[str]], List[str]]] = None,
+                       answer: Optional[Callable[[str], str]] = None,
+                       categories: Sequence[str] = (), page_size: int = PAGE_SIZE):
+    """Show one page of FAQs with filters and Previous/Next buttons
+
+    page_rows(after, limit, category) returns up to limit rows whose cursor
+    follows after, in order. search(query, limit, category) returns matching
+    questions best first, and answer(question) is asked only for the ones on
+    the visible page. Only that page is fetched and it is sent as one
+    markdown element, so a rerun costs the same for ten FAQs or ten
+    thousand. The cursors of the pages visited are kept in session state
+    under key; changing a filter starts over at page one.
+    """
+    query_box, category_box = st.columns([2, 1]) if search is not None and categories else (st, st)
+    query = query_box.text_input("Filter FAQs:", key=f"{key}_query",
+                                 placeholder="e.g., hostel fees") if search is not None else ""
+    category = category_box.selectbox("Category:", [ALL_CATEGORIES, *categories],
+                                      key=f"{key}_category") if categories else ALL_CATEGORIES
+    category = None if category == ALL_CATEGORIES else category
+    query = query.strip()
+
+    state = st.session_state.setdefault(f"{key}_pages", {"filter": None, "cursors": [0], "next": None})
+    if state["filter"] != (query, category):
+        state.update(filter=(query, category), cursors=[0], next=None)
+    after = state["cursors"][-1]
+
+    # One extra row tells whether there is a next page
+    if query:
+        matches = search(query, SEARCH_LIMIT, category)[after:after + page_size + 1]
+        rows = [(rank, question, "") for rank, question in enumerate(matches, after + 1)]
+    else:
+        rows = page_rows(after, page_size + 1, category)
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    state["next"] = rows[-1][0] if has_next else None
+    if query:
+        rows = [(rank, question, answer(question)) for rank, question, _ in rows]
+
+    page_number = len(state["cursors"])
+    if rows:
+        st.markdown(render_faq_page(rows, (page_number - 1) * page_size + 1))
+    else:
+        st.info("No FAQs match this filter.")
+
+    prev_col, info_col, next_col = st.columns([1, 2, 1])
+    prev_col.button("◀ Previous", key=f"{key}_prev", disabled=page_number == 1,
+                    on_click=lambda: state["cursors"].pop())
+    info_col.caption(f"Page {page_number}")
+    next_col.button("Next ▶", key=f"{key}_next", disabled=not has_next,
+                    on_click=lambda: state["cursors"].append(state["next"]))
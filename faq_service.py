@@ -0,0 +1,398 @@
+# FAQ SERVICE - Headless HTTP (ASGI) search API over the shared FAQ index
+"""
+Serves the same index as the Streamlit apps to kiosks, chat widgets and the
+mobile app:
+
+    GET  /search?q=...&top_k=3        (or POST {"query": ..., "top_k": 3})
+    POST /search/batch                {"queries": [...], "top_k": 3}
+    GET  /faq?after=0&limit=20&category=Hostel
+    GET  /health
+
+Run from the project directory (data files are relative to it):
+    python faq_service.py --port 8000 --workers 4
+
+The index is published once to a shared directory and every worker maps it
+read-only (shared_index.py), so adding workers does not add index copies.
+A Streamlit app started with the same FAQ_SHARED_INDEX_DIR publishes its
+refits and edits there, and the workers swap to them within a few seconds.
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+from collections.abc import Sequence
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from calibration import CONFIDENCE_HIGH, CONFIDENCE_MEDIUM
+from database_manager import FAQDatabase
+
+try:
+    import orjson
+except ImportError:  # standard json is about 3x slower on result lists
+    orjson = None
+
+try:
+    from uvicorn.protocols.http.auto import AutoHTTPProtocol
+except ImportError:  # only main() needs uvicorn; create_app() serves under any ASGI server
+    AutoHTTPProtocol = None
+
+
+class FastJSONResponse(JSONResponse):
+    """Compact JSON, through orjson when it is installed"""
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+if AutoHTTPProtocol is not None:
+    class NoDelayHTTPProtocol(AutoHTTPProtocol):
+        """uvicorn's HTTP protocol with Nagle's algorithm off on every connection
+
+        With --workers > 1 uvicorn binds the listening socket itself, without
+        proto=IPPROTO_TCP, so asyncio does not set TCP_NODELAY on accepted
+        connections; each keep-alive response then waits out the client's
+        delayed ACK (about 40 ms).
+        """
+
+        def connection_made(self, transport):
+            sock = transport.get_extra_info("socket")
+            if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            super().connection_made(transport)
+
+
+class BadRequest(ValueError):
+    """Invalid request parameters, answered with HTTP 400"""
+
+
+class SnapshotDocuments(Sequence):
+    """Response fields of an index snapshot's documents, built as results need them
+
+    Answers and categories come from the snapshot's own columns (memory-mapped
+    for a shared index), so a worker keeps no per-document table, only a
+    bounded cache of recently returned documents; passage sources, which the
+    index does not hold, come from a dict.
+    """
+
+    # Documents kept built; a few popular FAQs answer most queries
+    CACHE_SIZE = 4096
+
+    def __init__(self, snapshot, sources: Dict[str, str]):
+        self.snapshot = snapshot
+        self.sources = sources
+        self._document = lru_cache(maxsize=self.CACHE_SIZE)(self._build)
+
+    def __len__(self) -> int:
+        return len(self.snapshot.questions)
+
+    def __getitem__(self, index: int) -> Dict:
+        return self._document(int(index))
+
+    def _build(self, index: int) -> Dict:
+        snapshot = self.snapshot
+        question = snapshot.questions[index]
+        if snapshot.doc_types[index] == "passage":
+            return {"question": question, "answer": None, "category": None,
+                    "doc_type": "passage", "source": self.sources.get(question)}
+        return {"question": question, "answer": snapshot.answers[index], "category": snapshot.categories[index],
+                "doc_type": "faq", "source": None}
+
+
+class FAQService:
+    """A preloaded engine plus the response fields of every indexed document
+
+    Fields are looked up per result in the engine's snapshot, with passage
+    sources read from the FAQ store once per index generation: no
+    per-request SQL. Engines without snapshots (hybrid) get a table of
+    prepared dicts built from the store instead.
+    """
+
+    MAX_TOP_K = 20
+    MAX_BATCH = 1000
+    MAX_PAGE = 100
+
+    def __init__(self, faq_db: FAQDatabase, engine):
+        from search_engine import SCORING_MODELS
+        self.faq_db = faq_db
+        self.engine = engine
+        # Lexical searches are scored in a few sparse lookups; embedding a query is not
+        self.blocking_search = getattr(engine, "scoring", None) not in SCORING_MODELS
+        self._documents: tuple = ()
+        self._documents_generation = None
+        self._documents_lock = threading.Lock()
+
+    @classmethod
+    def load(cls) -> "FAQService":
+        """Open the FAQ store and its search index
+
+        With a shared index directory (FAQ_SHARED_INDEX_DIR), attach to the
+        index published there, publishing it first if nobody has; otherwise
+        build (or load the saved) index in this process.
+        """
+        faq_db = FAQDatabase()
+        shared_dir = _shared_dir()
+        if shared_dir is None:
+            return cls(faq_db, faq_db.build_search_engine())
+        from shared_index import SharedSemanticSearch, current_generation
+        if current_generation(shared_dir) is None:
+            faq_db.build_search_engine(shared_dir=shared_dir)
+        return cls(faq_db, SharedSemanticSearch(shared_dir))
+
+    def documents(self) -> Sequence:
+        """Static response fields per indexed document, rebuilt when the index changes"""
+        generation = self.engine.generation
+        if self._documents_generation != generation:
+            with self._documents_lock:
+                if self._documents_generation != generation:
+                    if hasattr(self.engine, "snapshot"):
+                        self._documents = SnapshotDocuments(self.engine.snapshot(), self._passage_sources())
+                    else:
+                        self._documents = self._build_documents(self.engine.questions)
+                    self._documents_generation = generation
+        return self._documents
+
+    def _passage_sources(self) -> Dict[str, str]:
+        return {text: f"{source} p.{page}" for text, source, page in self.faq_db.iter_passage_sources()}
+
+    def _build_documents(self, questions) -> tuple:
+        faqs = {question: (answer, category) for question, answer, category in self.faq_db.iter_entries()}
+        sources = self._passage_sources()
+        documents = []
+        for question in questions:
+            if question in faqs:
+                answer, category = faqs[question]
+                documents.append({"question": question, "answer": answer, "category": category,
+                                  "doc_type": "faq", "source": None})
+            else:
+                documents.append({"question": question, "answer": None, "category": None,
+                                  "doc_type": "passage", "source": sources.get(question)})
+        return tuple(documents)
+
+    @staticmethod
+    def confidence_level(confidence: float) -> str:
+        if confidence >= CONFIDENCE_HIGH:
+            return "high"
+        if confidence >= CONFIDENCE_MEDIUM:
+            return "medium"
+        return "low"
+
+    def _result(self, documents: Sequence, rank: int, index: int, score: float, confidence: float,
+                fallback: bool = False) -> Dict:
+        result = dict(documents[index]) if index < len(documents) else {"question": self.engine.questions[index]}
+        result.update(rank=rank, score=round(score, 6), confidence=round(confidence, 6),
+                      confidence_percent=round(confidence * 100, 1),
+                      confidence_level=self.confidence_level(confidence), fallback=fallback)
+        return result
+
+    def _top_k(self, value) -> int:
+        try:
+            top_k = int(value)
+        except (TypeError, ValueError):
+            raise BadRequest("top_k must be an integer")
+        if not 1 <= top_k <= self.MAX_TOP_K:
+            raise BadRequest(f"top_k must be between 1 and {self.MAX_TOP_K}")
+        return top_k
+
+    def search(self, query, top_k=3) -> Dict:
+        """Ranked matches for one query; zero-score padding is dropped"""
+        if not isinstance(query, str) or not query.strip():
+            raise BadRequest("query must be a non-empty string")
+        top_k = self._top_k(top_k)
+        start = time.perf_counter()
+        # Searching first lets a shared engine swap generations before the fields are looked up
+        matches = self.engine.search(query, top_k=top_k)
+        results = self._match_results(self.documents(), matches)
+        return {"query": query, "results": results, "took_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    def _match_results(self, documents: Sequence, matches: List[Dict]) -> List[Dict]:
+        return [
+            self._result(documents, rank, match['index'], match['score'], match['confidence'],
+                         match.get('fallback', False))
+            for rank, match in enumerate(matches, 1)
+            if match['score'] > 0
+        ]
+
+    def search_batch(self, queries, top_k=3) -> Dict:
+        """Ranked matches for many queries, scored in one pass (SemanticSearch.search_batch)
+
+        Engines that cannot give confidences for batch scores (hybrid fusion)
+        answer query by query instead.
+        """
+        if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+            raise BadRequest("queries must be a list of strings")
+        if len(queries) > self.MAX_BATCH:
+            raise BadRequest(f"at most {self.MAX_BATCH} queries per batch")
+        top_k = self._top_k(top_k)
+        start = time.perf_counter()
+        if not hasattr(self.engine, "batch_confidences"):
+            matches = [self.engine.search(query, top_k=top_k) for query in queries]
+            documents = self.documents()
+            return {"results": [self._match_results(documents, row) for row in matches],
+                    "took_ms": round((time.perf_counter() - start) * 1000, 3)}
+        indices, scores, fallback = self.engine.search_batch(queries, top_k=top_k, with_fallback=True)
+        documents = self.documents()
+        confidences = self.engine.batch_confidences(scores, fallback).tolist()
+        results = [
+            [self._result(documents, rank, index, score, confidence, row_fallback)
+             for rank, (index, score, confidence) in enumerate(zip(row, row_scores, row_confidences), 1)
+             if index >= 0 and score > 0]
+            for row, row_scores, row_confidences, row_fallback
+            in zip(indices.tolist(), scores.tolist(), confidences, fallback.tolist())
+        ]
+        return {"results": results, "took_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    def faq_page(self, after=0, limit=20, category: Optional[str] = None) -> Dict:
+        """One keyset page of FAQs; pass the returned next cursor as after"""
+        try:
+            after, limit = int(after), int(limit)
+        except (TypeError, ValueError):
+            raise BadRequest("after and limit must be integers")
+        if not 1 <= limit <= self.MAX_PAGE:
+            raise BadRequest(f"limit must be between 1 and {self.MAX_PAGE}")
+        rows = self.faq_db.get_faq_page(after, limit + 1, category or None)
+        items = [{"id": faq_id, "question": question, "answer": answer} for faq_id, question, answer in rows[:limit]]
+        return {"items": items, "next": items[-1]["id"] if len(rows) > limit else None}
+
+    def health(self) -> Dict:
+        # A shared engine otherwise only checks for a newer generation when it searches
+        if hasattr(self.engine, "refresh"):
+            self.engine.refresh()
+        return {"status": "ok", "documents": len(self.engine.questions), "generation": self.engine.generation,
+                "scoring": getattr(self.engine, "scoring", None), "cache": self.engine.cache_stats()}
+
+
+def _shared_dir() -> Optional[str]:
+    """FAQ_SHARED_INDEX_DIR, when the scoring model's index can be shared (TF-IDF or BM25)"""
+    from search_engine import SCORING_MODELS, SemanticSearch
+    shared_dir = os.environ.get("FAQ_SHARED_INDEX_DIR")
+    return shared_dir if shared_dir and SemanticSearch.SCORING in SCORING_MODELS else None
+
+
+def _service(request: Request) -> FAQService:
+    return request.app.state.service
+
+
+async def _json_body(request: Request) -> Dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise BadRequest("body must be JSON")
+    if not isinstance(body, dict):
+        raise BadRequest("body must be a JSON object")
+    return body
+
+
+async def search_endpoint(request: Request):
+    if request.method == "POST":
+        body = await _json_body(request)
+        query, top_k = body.get("query"), body.get("top_k", 3)
+    else:
+        query, top_k = request.query_params.get("q"), request.query_params.get("top_k", 3)
+    service = _service(request)
+    if service.blocking_search:
+        # Encoding the query would stall every other connection on this worker
+        return FastJSONResponse(await run_in_threadpool(service.search, query, top_k))
+    return FastJSONResponse(service.search(query, top_k))
+
+
+async def search_batch_endpoint(request: Request):
+    body = await _json_body(request)
+    # Batches can take long enough to stall other connections; score them off the event loop
+    return FastJSONResponse(await run_in_threadpool(_service(request).search_batch, body.get("queries"),
+                                                    body.get("top_k", 3)))
+
+
+async def faq_endpoint(request: Request):
+    params = request.query_params
+    return FastJSONResponse(_service(request).faq_page(params.get("after", 0), params.get("limit", 20),
+                                                       params.get("category")))
+
+
+async def health_endpoint(request: Request):
+    return FastJSONResponse(_service(request).health())
+
+
+async def bad_request(request: Request, exc: BadRequest):
+    return FastJSONResponse({"error": str(exc)}, status_code=400)
+
+
+def create_app(service: Optional[FAQService] = None) -> Starlette:
+    """ASGI app; without a service, one is loaded at startup (once per worker)"""
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        app.state.service = service or await run_in_threadpool(FAQService.load)
+        yield
+
+    return Starlette(
+        routes=[
+            Route("/search", search_endpoint, methods=["GET", "POST"]),
+            Route("/search/batch", search_batch_endpoint, methods=["POST"]),
+            Route("/faq", faq_endpoint, methods=["GET"]),
+            Route("/health", health_endpoint, methods=["GET"]),
+        ],
+        exception_handlers={BadRequest: bad_request},
+        lifespan=lifespan,
+    )
+
+
+# For `uvicorn faq_service:app --workers N --http faq_service:NoDelayHTTPProtocol`
+# (without --http, multi-worker keep-alive requests wait ~40 ms each; see NoDelayHTTPProtocol)
+app = create_app()
+
+WORKERS = int(os.environ.get("FAQ_SERVICE_WORKERS", 1))
+# Seconds an idle keep-alive connection stays open; clients reuse it for later requests
+KEEP_ALIVE = int(os.environ.get("FAQ_SERVICE_KEEP_ALIVE", 30))
+# Where the index is published for the workers to map; empty gives each worker its own copy
+SHARED_DIR = os.environ.get("FAQ_SHARED_INDEX_DIR", os.path.join("index_cache", "shared"))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve FAQ search over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="worker processes (default: FAQ_SERVICE_WORKERS or 1)")
+    parser.add_argument("--keep-alive", type=int, default=KEEP_ALIVE,
+                        help="idle keep-alive timeout in seconds (default: FAQ_SERVICE_KEEP_ALIVE or 30)")
+    parser.add_argument("--shared-dir", default=SHARED_DIR,
+                        help="directory the workers map the index from; '' gives each its own copy "
+                             "(default: FAQ_SHARED_INDEX_DIR or index_cache/shared)")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    # Workers (spawned processes) read the setting from the environment
+    if args.shared_dir:
+        os.environ["FAQ_SHARED_INDEX_DIR"] = args.shared_dir
+    else:
+        os.environ.pop("FAQ_SHARED_INDEX_DIR", None)
+    shared_dir = _shared_dir()
+    # Ingest PDFs and save (and publish) the index once here, so every worker starts by loading or mapping it
+    if shared_dir is not None:
+        FAQDatabase().build_search_engine(shared_dir=shared_dir)
+    options = dict(host=args.host, port=args.port, timeout_keep_alive=args.keep_alive,
+                   access_log=False, log_level="warning", http=NoDelayHTTPProtocol)
+    if args.workers > 1:
+        if shared_dir is None:
+            FAQService.load()
+        uvicorn.run("faq_service:app", workers=args.workers, **options)
+    else:
+        uvicorn.run(create_app(FAQService.load()), **options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# FAQ STORE - SQLite persistence for FAQ pairs and document passages
+import json
+import queue
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS faqs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question TEXT NOT NULL UNIQUE,
+    answer TEXT NOT NULL,
+    category TEXT NOT NULL DEFAULT 'General',
+    source TEXT NOT NULL DEFAULT 'seed',
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_faqs_category ON faqs(category, id);
+CREATE INDEX IF NOT EXISTS idx_faqs_created_at ON faqs(created_at);
+CREATE INDEX IF NOT EXISTS idx_faqs_source ON faqs(source, id);
+
+CREATE TABLE IF NOT EXISTS passages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_passages_source ON passages(source, id);
+CREATE INDEX IF NOT EXISTS idx_passages_text ON passages(text);
+
+CREATE TABLE IF NOT EXISTS ingested_files (
+    source TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    ingested_at REAL NOT NULL
+);
+"""
+
+# Statements are constant strings so each pooled connection's statement
+# cache keeps them prepared after first use
+SQL_UPSERT = ("INSERT INTO faqs (question, answer, category, source, created_at) VALUES (?, ?, ?, ?, ?) "
+              "ON CONFLICT(question) DO UPDATE SET answer = excluded.answer")
+SQL_INSERT_IGNORE = ("INSERT OR IGNORE INTO faqs (question, answer, category, source, created_at) "
+                     "VALUES (?, ?, ?, ?, ?)")
+SQL_ANSWER = "SELECT answer FROM faqs WHERE question = ?"
+SQL_COUNT = "SELECT COUNT(*) FROM faqs"
+SQL_COUNT_CATEGORY = "SELECT COUNT(*) FROM faqs WHERE category = ?"
+# Streamed in keyset chunks (see SQLiteFAQStore._stream): the last two parameters are the id to
+# seek past and the chunk size, and the id comes first in each row
+SQL_ALL = "SELECT id, question, answer FROM faqs WHERE id > ? ORDER BY id LIMIT ?"
+SQL_ALL_ENTRIES = "SELECT id, question, answer, category FROM faqs WHERE id > ? ORDER BY id LIMIT ?"
+SQL_BY_CATEGORY = "SELECT id, question, answer FROM faqs WHERE category = ? AND id > ? ORDER BY id LIMIT ?"
+SQL_BY_SOURCE = "SELECT id, question, answer FROM faqs WHERE source = ? AND id > ? ORDER BY id LIMIT ?"
+SQL_CATEGORIES = "SELECT DISTINCT category FROM faqs ORDER BY category"
+# The questions go in as one JSON array, so the statement text stays the same for any number of them
+SQL_IN_CATEGORY = "SELECT question FROM faqs WHERE category = ? AND question IN (SELECT value FROM json_each(?))"
+# Keyset pages: seek past the last id shown, so a page costs the same at any depth
+SQL_PAGE = "SELECT id, question, answer FROM faqs WHERE id > ? ORDER BY id LIMIT ?"
+SQL_PAGE_CATEGORY = "SELECT id, question, answer FROM faqs WHERE category = ? AND id > ? ORDER BY id LIMIT ?"
+SQL_DELETE = "DELETE FROM faqs WHERE question = ?"
+SQL_PASSAGE_INSERT = "INSERT INTO passages (source, page, text) VALUES (?, ?, ?)"
+SQL_PASSAGE_DELETE_SOURCE = "DELETE FROM passages WHERE source = ?"
+SQL_PASSAGE_TEXTS = "SELECT id, text FROM passages WHERE id > ? ORDER BY id LIMIT ?"
+SQL_PASSAGES = "SELECT id, text, source, page FROM passages WHERE id > ? ORDER BY id LIMIT ?"
+SQL_PASSAGE_LOOKUP = "SELECT source, page FROM passages WHERE text = ? LIMIT 1"
+SQL_FILE_HASH = "SELECT sha256 FROM ingested_files WHERE source = ?"
+SQL_FILE_UPSERT = ("INSERT INTO ingested_files (source, sha256, ingested_at) VALUES (?, ?, ?) "
+                   "ON CONFLICT(source) DO UPDATE SET sha256 = excluded.sha256, ingested_at = excluded.ingested_at")
+
+
+class PoolExhausted(RuntimeError):
+    """No pooled connection was returned within the wait limit"""
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared across Streamlit sessions
+
+    Borrowers wait at most timeout seconds (also SQLite's busy timeout) for
+    a free connection, then get PoolExhausted instead of hanging.
+    """
+
+    def __init__(self, path: str, size: int = 4, timeout: float = 30.0):
+        self.timeout = timeout
+        self._connections = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False,
+                                   cached_statements=64, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._connections.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection, returning it to the pool afterwards"""
+        try:
+            conn = self._connections.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolExhausted(f"no SQLite connection free after {self.timeout:g}s; "
+                                f"all {self._connections.maxsize} are borrowed") from None
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+
+class SQLiteFAQStore:
+    """FAQ rows in SQLite (WAL mode) with indexed category/created/source columns"""
+
+    FETCH_SIZE = 500
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def upsert(self, question: str, answer: str, category: str = "General", source: str = "contributed") -> None:
+        """Insert a pair, or replace the answer if the question exists"""
+        with self.pool.connection() as conn:
+            conn.execute(SQL_UPSERT, (question, answer, category, source, time.time()))
+
+    def seed(self, rows: Iterable[Tuple[str, str, str]], source: str = "seed") -> None:
+        """Insert (question, answer, category) rows that are not already stored"""
+        now = time.time()
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(SQL_INSERT_IGNORE, ((q, a, c, source, now) for q, a, c in rows))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, question: str) -> bool:
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_DELETE, (question,)).rowcount > 0
+
+    def answer(self, question: str) -> Optional[str]:
+        with self.pool.connection() as conn:
+            row = conn.execute(SQL_ANSWER, (question,)).fetchone()
+        return row[0] if row else None
+
+    def count(self, category: Optional[str] = None) -> int:
+        with self.pool.connection() as conn:
+            if category is None:
+                return conn.execute(SQL_COUNT).fetchone()[0]
+            return conn.execute(SQL_COUNT_CATEGORY, (category,)).fetchone()[0]
+
+    def categories(self) -> List[str]:
+        with self.pool.connection() as conn:
+            return [row[0] for row in conn.execute(SQL_CATEGORIES)]
+
+    def in_category(self, questions: Iterable[str], category: str) -> List[str]:
+        """The given questions that are stored under category, in the order given"""
+        questions = list(questions)
+        with self.pool.connection() as conn:
+            found = {row[0] for row in conn.execute(SQL_IN_CATEGORY, (category, json.dumps(questions)))}
+        return [question for question in questions if question in found]
+
+    def file_hash(self, source: str) -> Optional[str]:
+        """Content hash recorded when a document file was last ingested"""
+        with self.pool.connection() as conn:
+            row = conn.execute(SQL_FILE_HASH, (source,)).fetchone()
+        return row[0] if row else None
+
+    def replace_passages(self, source: str, sha256: str, passages: Iterable[Tuple[int, str]]) -> int:
+        """Swap in a file's (page, text) passages and record its hash atomically
+
+        passages may be a generator; rows are inserted as they are produced.
+        """
+        count = 0
+
+        def rows():
+            nonlocal count
+            for page, text in passages:
+                count += 1
+                yield source, page, text
+
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(SQL_PASSAGE_DELETE_SOURCE, (source,))
+                conn.executemany(SQL_PASSAGE_INSERT, rows())
+                conn.execute(SQL_FILE_UPSERT, (source, sha256, time.time()))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return count
+
+    def iter_passage_texts(self) -> Iterator[str]:
+        """Stream all passage texts in index order"""
+        for text, in self._stream(SQL_PASSAGE_TEXTS, ()):
+            yield text
+
+    def iter_passages(self) -> Iterator[Tuple[str, str, int]]:
+        """Stream (text, source file, page) for every passage in index order"""
+        return self._stream(SQL_PASSAGES, ())
+
+    def passage_source(self, text: str) -> Optional[Tuple[str, int]]:
+        """(source file, page) a passage came from"""
+        with self.pool.connection() as conn:
+            row = conn.execute(SQL_PASSAGE_LOOKUP, (text,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def iter_pairs(self, category: Optional[str] = None, source: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """Stream (question, answer) rows in insertion order, FETCH_SIZE at a time"""
+        if category is not None:
+            sql, params = SQL_BY_CATEGORY, (category,)
+        elif source is not None:
+            sql, params = SQL_BY_SOURCE, (source,)
+        else:
+            sql, params = SQL_ALL, ()
+        return self._stream(sql, params)
+
+    def iter_entries(self) -> Iterator[Tuple[str, str, str]]:
+        """Stream (question, answer, category) rows in insertion order"""
+        return self._stream(SQL_ALL_ENTRIES, ())
+
+    def page(self, after_id: int = 0, limit: int = 10, category: Optional[str] = None) -> List[Tuple[int, str, str]]:
+        """Up to limit (id, question, answer) rows with id > after_id, in insertion order
+
+        The category filter seeks the (category, id) index, so neither the
+        page depth nor the table size changes the cost.
+        """
+        with self.pool.connection() as conn:
+            if category is None:
+                return conn.execute(SQL_PAGE, (after_id, limit)).fetchall()
+            return conn.execute(SQL_PAGE_CATEGORY, (category, after_id, limit)).fetchall()
+
+    def _stream(self, sql: str, params: tuple) -> Iterator[tuple]:
+        """Yield query rows (without their leading id) FETCH_SIZE at a time
+
+        Each chunk is a keyset query on a connection borrowed only while it
+        is fetched, so an iterator that is consumed slowly, or abandoned
+        half-way, holds no pooled connection.
+        """
+        after_id = 0
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(sql, params + (after_id, self.FETCH_SIZE)).fetchall()
+            for row in rows:
+                yield row[1:]
+            if len(rows) < self.FETCH_SIZE:
+                return
+            after_id = rows[-1][0]
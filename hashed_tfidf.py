@@ -0,0 +1,103 @@
+# HASHED TF-IDF - TF-IDF over a fixed-width hashed feature space with incremental IDF
+from typing import Iterable
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils import murmurhash3_32
+
+
+class HashedTfidfVectorizer:
+    """TF-IDF without a vocabulary: every term hashes into one of n_features columns
+
+    Memory is set by n_features however large the corpus grows, and IDF is
+    derived from a dense document-frequency array, so documents are added or
+    removed by updating counts (with_documents) instead of refitting. IDF
+    and row weights follow TfidfVectorizer (smooth idf, l2-normalized rows);
+    a column no indexed document uses has IDF 0, so unknown query terms are
+    ignored as they are with a vocabulary. Distinct terms can share a column;
+    with 2**20 columns that stays rare at handbook scale.
+    """
+
+    N_FEATURES = 2 ** 20
+
+    # Row weighting, in TfidfVectorizer's terms (read by QueryAnalyzer)
+    norm = "l2"
+    sublinear_tf = False
+    binary = False
+
+    def __init__(self, n_features: int = N_FEATURES, **hashing_options):
+        self.n_features = n_features
+        self.counter = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None,
+                                         **hashing_options)
+        self.df_ = np.zeros(n_features, dtype=np.int32)
+        self.n_docs_ = 0
+        self.idf_ = np.zeros(n_features)
+
+    def feature_id(self, term: str) -> int:
+        """Column of an analyzed term (a token or an "a b" bigram), as HashingVectorizer places it"""
+        h = murmurhash3_32(term, seed=0)
+        if h == -2 ** 31:
+            return (2 ** 31 - 1 - (self.n_features - 1)) % self.n_features
+        return abs(h) % self.n_features
+
+    def _update_idf(self) -> None:
+        seen = self.df_ > 0
+        self.idf_ = np.zeros(self.n_features)
+        self.idf_[seen] = np.log((1 + self.n_docs_) / (1 + self.df_[seen])) + 1
+
+    def _term_columns(self, documents: Iterable[str]):
+        """Column of every (document, term) pair, and the number of documents"""
+        documents = list(documents)
+        if not documents:
+            return np.empty(0, dtype=np.int32), 0
+        counts = self.counter.transform(documents)
+        return counts.indices, counts.shape[0]
+
+    def fit(self, documents: Iterable[str]) -> "HashedTfidfVectorizer":
+        """Count document frequencies from scratch"""
+        columns, self.n_docs_ = self._term_columns(documents)
+        self.df_ = np.bincount(columns, minlength=self.n_features).astype(np.int32)
+        self._update_idf()
+        return self
+
+    def with_documents(self, added: Iterable[str] = (), removed: Iterable[str] = ()) -> "HashedTfidfVectorizer":
+        """Copy with documents added to and removed from the frequencies; self is unchanged
+
+        Published snapshots keep the instance they were built with, so an
+        update never changes the IDF under a running search.
+        """
+        updated = HashedTfidfVectorizer.__new__(HashedTfidfVectorizer)
+        updated.n_features = self.n_features
+        updated.counter = self.counter
+        updated.df_ = self.df_.copy()
+        added_columns, n_added = self._term_columns(added)
+        removed_columns, n_removed = self._term_columns(removed)
+        np.add.at(updated.df_, added_columns, 1)
+        np.subtract.at(updated.df_, removed_columns, 1)
+        np.maximum(updated.df_, 0, out=updated.df_)
+        updated.n_docs_ = max(self.n_docs_ + n_added - n_removed, 0)
+        updated._update_idf()
+        return updated
+
+    def restore(self, idf: np.ndarray, n_docs: int) -> "HashedTfidfVectorizer":
+        """Rebuild the frequencies from a saved IDF array (the inverse of the smooth IDF)"""
+        idf = np.asarray(idf, dtype=np.float64)
+        seen = idf > 0
+        self.n_docs_ = n_docs
+        self.df_ = np.zeros(self.n_features, dtype=np.int32)
+        self.df_[seen] = np.rint((1 + n_docs) / np.exp(idf[seen] - 1) - 1)
+        self._update_idf()
+        return self
+
+    def fit_transform(self, documents: Iterable[str]) -> csr_matrix:
+        documents = list(documents)
+        return self.fit(documents).transform(documents)
+
+    def transform(self, documents: Iterable[str]) -> csr_matrix:
+        """Rows of tf * idf, each scaled to unit length"""
+        counts = self.counter.transform(documents).astype(np.float64)
+        counts.data *= self.idf_[counts.indices]
+        counts.eliminate_zeros()
+        return normalize(counts, norm="l2", copy=False)
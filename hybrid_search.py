@@ -0,0 +1,230 @@
+# HYBRID SEARCH - Lexical and dense retrievers run concurrently and fused into one ranking
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from calibration import ScoreCalibrator
+from index_store import load_calibration, save_calibration
+from search_engine import FAQ_DOC, SemanticSearch
+
+FUSION_METHODS = ("rrf", "linear")
+
+
+class HybridSearch:
+    """Two engines over the same rows, queried in parallel under a deadline
+
+    Each search sends the query to the lexical (TF-IDF/BM25) and the dense
+    engine on its own thread pool. If both answer within latency_budget_ms their
+    candidates are fused: "rrf" sums 1 / (RRF_K + rank) over the engines,
+    "linear" blends their similarities with lexical_weight. If one misses
+    the deadline, the other's results are returned as they are (a fallback)
+    and the late search finishes in the background. Writes go to both
+    engines in the same order, so row indices stay aligned. The fused-score
+    calibration is saved in cache_dir, the directory holding both engines'
+    caches.
+    """
+
+    LATENCY_BUDGET_MS = float(os.environ.get("FAQ_HYBRID_BUDGET_MS", 150))
+    # Lexical model create_engine pairs with the dense one
+    LEXICAL_SCORING = os.environ.get("FAQ_HYBRID_LEXICAL", "tfidf")
+    RRF_K = 60
+    # Each engine returns this many times top_k candidates for fusion
+    CANDIDATE_FACTOR = 4
+    LATENCY_WINDOW = 1000
+    # Threads per engine; separate pools so a backlog of late dense searches
+    # never delays the lexical engine the fallback depends on
+    WORKERS = 4
+
+    def __init__(self, lexical: SemanticSearch, dense: SemanticSearch, fusion: str = "rrf",
+                 lexical_weight: float = 0.5, latency_budget_ms: float = LATENCY_BUDGET_MS,
+                 cache_dir: Optional[str] = None):
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"fusion must be one of {FUSION_METHODS}, not {fusion!r}")
+        self.lexical = lexical
+        self.dense = dense
+        self.fusion = fusion
+        self.lexical_weight = lexical_weight
+        self.latency_budget_ms = latency_budget_ms
+        self.scoring = "hybrid"
+        self.fallbacks = {"lexical": 0, "dense": 0}
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self._pools = {name: ThreadPoolExecutor(max_workers=self.WORKERS, thread_name_prefix=f"hybrid-{name}")
+                       for name in ("lexical", "dense")}
+        self._lock = threading.Lock()
+        self.cache_dir = cache_dir
+        self.calibrator = ScoreCalibrator()
+        if cache_dir:
+            saved = load_calibration(cache_dir, self._calibration_key())
+            if saved is not None:
+                self.calibrator = ScoreCalibrator.from_dict(saved)
+
+    def _calibration_key(self) -> str:
+        # Fused scores of the two methods are on different scales
+        return f"{self.scoring}-{self.fusion}"
+
+    @property
+    def questions(self) -> tuple:
+        return self.lexical.questions
+
+    @property
+    def generation(self) -> int:
+        return self.lexical.generation + self.dense.generation
+
+    def search(self, query: str, top_k: int = 3, field_weights: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """Fused top_k results in the same dict form as SemanticSearch.search()"""
+        start = time.perf_counter()
+        depth = top_k * self.CANDIDATE_FACTOR
+        futures = {
+            self._pools["lexical"].submit(self.lexical.search, query, depth, field_weights): "lexical",
+            self._pools["dense"].submit(self.dense.search, query, depth, field_weights): "dense",
+        }
+        done, _ = wait(futures, timeout=self.latency_budget_ms / 1000)
+        if not done:
+            # Past the budget with nothing back: take whichever engine finishes first
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+        ranked = {futures[future]: future.result() for future in done}
+        if len(ranked) == 2:
+            results = self._fuse(ranked["lexical"], ranked["dense"], top_k)
+        else:
+            name, results = next(iter(ranked.items()))
+            self.fallbacks[name] += 1
+            results = results[:top_k]
+        self._latencies.append((time.perf_counter() - start) * 1000)
+        return results
+
+    def calibrate(self, samples: Iterable[Tuple[float, float]]) -> ScoreCalibrator:
+        """Fit fused score -> confidence from (score, label) feedback and store it with the index"""
+        self.calibrator = ScoreCalibrator.fit(samples)
+        if self.cache_dir:
+            save_calibration(self.cache_dir, self._calibration_key(), self.calibrator.to_dict())
+        return self.calibrator
+
+    def _fuse(self, lexical: List[Dict], dense: List[Dict], top_k: int) -> List[Dict]:
+        """One ranking from both engines' candidates (zero-score padding ignored)
+
+        Until the fused score is calibrated, confidence is the best (rrf) or
+        blended (linear) confidence of the engines that returned the row.
+        """
+        fused, similarity, confidence, by_index = {}, {}, {}, {}
+        for name, results in (("lexical", lexical), ("dense", dense)):
+            matched = [result for result in results if result['score'] > 0]
+            for rank, result in enumerate(matched, 1):
+                idx = result['index']
+                by_index.setdefault(idx, result)
+                if self.fusion == "rrf":
+                    fused[idx] = fused.get(idx, 0.0) + 1.0 / (self.RRF_K + rank)
+                    similarity[idx] = max(similarity.get(idx, 0.0), result['similarity'])
+                    confidence[idx] = max(confidence.get(idx, 0.0), result['confidence'])
+                else:
+                    weight = self.lexical_weight if name == "lexical" else 1.0 - self.lexical_weight
+                    fused[idx] = fused.get(idx, 0.0) + weight * result['similarity']
+                    similarity[idx] = fused[idx]
+                    confidence[idx] = confidence.get(idx, 0.0) + weight * result['confidence']
+
+        order = sorted(fused, key=lambda idx: (-fused[idx], idx))[:top_k]
+        if self.calibrator.fitted:
+            confidence.update(zip(order, self.calibrator([fused[idx] for idx in order]).tolist()))
+        results = []
+        for idx in order:
+            results.append(dict(by_index[idx], score=fused[idx], similarity=similarity[idx],
+                                confidence=confidence[idx], confidence_percent=confidence[idx] * 100))
+        # Pad like a single engine would, from the lexical zero-score filler
+        for result in lexical:
+            if len(results) >= top_k:
+                break
+            if result['index'] not in fused:
+                results.append(dict(result))
+        return results
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 3,
+                     field_weights: Optional[Dict[str, float]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Both engines' batch searches in parallel, fused row by row (no deadline)"""
+        top_k = max(top_k, 0)
+        depth = top_k * self.CANDIDATE_FACTOR
+        lexical = self._pools["lexical"].submit(self.lexical.search_batch, queries, depth, field_weights)
+        dense = self._pools["dense"].submit(self.dense.search_batch, queries, depth, field_weights)
+        lexical_indices, lexical_scores = lexical.result()
+        dense_indices, dense_scores = dense.result()
+
+        indices = np.full((len(queries), top_k), -1, dtype=np.int64)
+        scores = np.zeros((len(queries), top_k), dtype=np.float32)
+        for row in range(len(queries)):
+            fused = self._fuse(self._as_results(lexical_indices[row], lexical_scores[row]),
+                               self._as_results(dense_indices[row], dense_scores[row]), top_k)
+            fused = [result for result in fused if result['score'] > 0]
+            indices[row, :len(fused)] = [result['index'] for result in fused]
+            scores[row, :len(fused)] = [result['score'] for result in fused]
+        return indices, scores
+
+    @staticmethod
+    def _as_results(indices: np.ndarray, scores: np.ndarray) -> List[Dict]:
+        return [{'index': int(idx), 'score': float(score), 'similarity': min(float(score), 1.0),
+                 'confidence': min(float(score), 1.0)} for idx, score in zip(indices, scores) if idx >= 0]
+
+    def latency_stats(self) -> Dict:
+        """p50/p99 of recent searches in ms against the budget, and fallback counts"""
+        latencies = np.array(self._latencies) if self._latencies else np.zeros(1)
+        return {
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "budget_ms": self.latency_budget_ms,
+            "fallbacks": dict(self.fallbacks),
+        }
+
+    def cache_stats(self) -> Dict:
+        """Result cache counters summed over both engines"""
+        hits = self.lexical.cache_hits + self.dense.cache_hits
+        misses = self.lexical.cache_misses + self.dense.cache_misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "size": self.lexical.cache_stats()["size"] + self.dense.cache_stats()["size"],
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+        }
+
+    def fallback_stats(self) -> Dict:
+        """Character n-gram fallback use by the lexical engine"""
+        return self.lexical.fallback_stats()
+
+    def add_questions(self, new_questions: Iterable[str], doc_type: str = FAQ_DOC,
+                      answers: Optional[Iterable[str]] = None, categories: Optional[Iterable[str]] = None) -> None:
+        new_questions = list(new_questions)
+        answers = list(answers) if answers is not None else None
+        categories = list(categories) if categories is not None else None
+        with self._lock:
+            self.lexical.add_questions(new_questions, doc_type, answers, categories)
+            self.dense.add_questions(new_questions, doc_type, answers, categories)
+
+    def update_questions(self, questions: Iterable[str], answers: Optional[Iterable[str]] = None,
+                         categories: Optional[Iterable[str]] = None) -> None:
+        questions = list(questions)
+        answers = list(answers) if answers is not None else None
+        categories = list(categories) if categories is not None else None
+        with self._lock:
+            self.lexical.update_questions(questions, answers, categories)
+            self.dense.update_questions(questions, answers, categories)
+
+    def remove_questions(self, indices: Iterable[int]) -> None:
+        indices = list(indices)
+        with self._lock:
+            self.lexical.remove_questions(indices)
+            self.dense.remove_questions(indices)
+
+    def retrain(self, questions: List[str], doc_types: Optional[List[str]] = None,
+                answers: Optional[List[str]] = None, categories: Optional[List[str]] = None) -> None:
+        questions = list(questions)
+        with self._lock:
+            self.lexical.retrain(questions, doc_types, answers, categories)
+            self.dense.retrain(questions, doc_types, answers, categories)
+
+    def get_confidence_color(self, confidence: float) -> tuple:
+        return self.lexical.get_confidence_color(confidence)
+
+    def get_confidence_label(self, confidence: float) -> str:
+        return self.lexical.get_confidence_label(confidence)
@@ -0,0 +1,351 @@
+# INDEX STORE - On-disk, memory-mappable search index artifact
+import hashlib
+import json
+import mmap
+import operator
+import os
+import threading
+from collections.abc import Mapping, Sequence
+from typing import Callable, Dict, Iterable, List, Optional, Sequence as SequenceType, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from inverted_index import AppendedIndex, InvertedIndex
+
+# Bump whenever the file layout or the vectorizer settings change
+FORMAT_VERSION = 3
+
+DEFAULT_INDEX_DIR = "index_cache"
+HEADER_FILE = "header.json"
+VOCABULARY_FILE = "vocabulary.txt"
+ARRAY_FILES = ("idf", "data", "indices", "indptr")
+EMBEDDINGS_HEADER_FILE = "embeddings.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+CALIBRATION_FILE = "calibration.json"
+
+
+def corpus_hash(*columns: Iterable[str]) -> str:
+    """Fingerprint of the indexed corpus columns, used to decide whether a refit is needed"""
+    digest = hashlib.sha256(f"v{FORMAT_VERSION}".encode("utf-8"))
+    for column in columns:
+        for value in column:
+            digest.update(value.encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(b"\1")
+    return digest.hexdigest()
+
+
+def save_index(path: str, questions_hash: str, terms: List[str], idf: np.ndarray, matrix: csr_matrix,
+               params: Optional[Dict] = None, write_tables: Optional[Callable[[str], Dict]] = None) -> None:
+    """Write vocabulary, IDF and CSR arrays as raw files plus a header
+
+    matrix may hold several field blocks side by side, each len(terms) wide
+    (or params["hash_features"] wide for a hashed feature space, which has no
+    terms). params holds small JSON-serializable scoring parameters kept in
+    the header. write_tables(path), when given, saves further structures
+    built from the same corpus (the n-gram index) and returns entries to
+    add to params.
+
+    The header is removed first and written last, so a crash part-way leaves
+    no header and the next start refits instead of loading mixed files.
+    """
+    os.makedirs(path, exist_ok=True)
+    header_path = os.path.join(path, HEADER_FILE)
+    if os.path.exists(header_path):
+        os.remove(header_path)
+
+    # scipy wants indices and indptr in one dtype; anything else forces a copy on load
+    index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+    arrays = {
+        "idf": np.ascontiguousarray(idf, dtype=np.float64),
+        "data": np.ascontiguousarray(matrix.data, dtype=np.float64),
+        "indices": np.ascontiguousarray(matrix.indices, dtype=index_dtype),
+        "indptr": np.ascontiguousarray(matrix.indptr, dtype=index_dtype),
+    }
+    for name, array in arrays.items():
+        _write_atomic(os.path.join(path, f"{name}.npy"), lambda f, a=array: np.save(f, a))
+
+    vocabulary = "\n".join(terms).encode("utf-8")
+    _write_atomic(os.path.join(path, VOCABULARY_FILE), lambda f: f.write(vocabulary))
+    params = dict(params or {}, **(write_tables(path) if write_tables is not None else {}))
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "corpus_hash": questions_hash,
+        "n_docs": int(matrix.shape[0]),
+        "n_features": int(matrix.shape[1]),
+        "n_fields": int(matrix.shape[1] // max(_block_width(terms, params), 1)),
+        "nnz": int(matrix.nnz),
+        "params": params,
+    }
+    _write_atomic(header_path, lambda f: f.write(json.dumps(header, indent=4).encode("utf-8")))
+
+
+def load_index(path: str, questions_hash: str) -> Optional[Tuple[List[str], np.ndarray, csr_matrix, Dict]]:
+    """Memory-map a saved index; None when missing, stale or from another format"""
+    header_path = os.path.join(path, HEADER_FILE)
+    if not os.path.exists(header_path):
+        return None
+    try:
+        with open(header_path, "r") as f:
+            header = json.load(f)
+        if header.get("format_version") != FORMAT_VERSION or header.get("corpus_hash") != questions_hash:
+            return None
+
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAY_FILES}
+        with open(os.path.join(path, VOCABULARY_FILE), "rb") as f:
+            raw = f.read().decode("utf-8")
+        terms = raw.split("\n") if raw else []
+    except (OSError, ValueError):
+        return None
+
+    shape = (header["n_docs"], header["n_features"])
+    if _block_width(terms, header.get("params", {})) * header.get("n_fields", 1) != shape[1] or arrays["indptr"].shape[0] != shape[0] + 1:
+        return None
+    matrix = csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+    return terms, arrays["idf"], matrix, header.get("params", {})
+
+
+def _block_width(terms: List[str], params: Dict) -> int:
+    """Columns per field block: the vocabulary size, or the hashed width"""
+    return len(terms) or int(params.get("hash_features", 0))
+
+
+def save_embeddings(path: str, questions_hash: str, embeddings: np.ndarray) -> None:
+    """Write a dense float32 embedding matrix plus its header (header last)"""
+    os.makedirs(path, exist_ok=True)
+    header_path = os.path.join(path, EMBEDDINGS_HEADER_FILE)
+    if os.path.exists(header_path):
+        os.remove(header_path)
+    array = np.ascontiguousarray(embeddings, dtype=np.float32)
+    _write_atomic(os.path.join(path, EMBEDDINGS_FILE), lambda f: np.save(f, array))
+    header = {
+        "format_version": FORMAT_VERSION,
+        "corpus_hash": questions_hash,
+        "shape": list(array.shape),
+    }
+    _write_atomic(header_path, lambda f: f.write(json.dumps(header, indent=4).encode("utf-8")))
+
+
+def load_embeddings(path: str, questions_hash: str) -> Optional[np.ndarray]:
+    """Memory-map saved embeddings; None when missing, stale or from another format"""
+    header_path = os.path.join(path, EMBEDDINGS_HEADER_FILE)
+    if not os.path.exists(header_path):
+        return None
+    try:
+        with open(header_path, "r") as f:
+            header = json.load(f)
+        if header.get("format_version") != FORMAT_VERSION or header.get("corpus_hash") != questions_hash:
+            return None
+        embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if list(embeddings.shape) != header["shape"]:
+        return None
+    return embeddings
+
+
+def save_calibration(path: str, scoring: str, calibration: Dict) -> None:
+    """Store a fitted score calibration next to the index it was fitted for"""
+    os.makedirs(path, exist_ok=True)
+    data = json.dumps({"format_version": FORMAT_VERSION, "scoring": scoring, "calibration": calibration}, indent=4)
+    _write_atomic(os.path.join(path, CALIBRATION_FILE), lambda f: f.write(data.encode("utf-8")))
+
+
+def load_calibration(path: str, scoring: str) -> Optional[Dict]:
+    """Saved calibration for this scoring model, or None"""
+    try:
+        with open(os.path.join(path, CALIBRATION_FILE), "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("format_version") != FORMAT_VERSION or data.get("scoring") != scoring:
+        return None
+    return data.get("calibration")
+
+
+def _save(path: str, name: str, array) -> None:
+    array = np.ascontiguousarray(array)
+    _write_atomic(os.path.join(path, f"{name}.npy"), lambda f: np.save(f, array))
+
+
+def _load(path: str, name: str) -> np.ndarray:
+    """Memory-mapped array as a plain ndarray view: np.memmap slicing costs several times more"""
+    return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r").view(np.ndarray)
+
+
+class StringTable(Sequence):
+    """Strings stored as one utf-8 blob plus an offsets array, decoded on access
+
+    Both files are memory-mapped read-only, so every process attached to a
+    generation reads the same page-cache pages instead of holding its own
+    str objects.
+    """
+
+    def __init__(self, offsets: np.ndarray, blob):
+        self._offsets = offsets
+        self._blob = blob
+        self._size = len(offsets) - 1
+
+    @staticmethod
+    def write(path: str, name: str, strings: SequenceType[str]) -> None:
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        _save(path, f"{name}.offsets", offsets)
+        blob = b"".join(encoded)
+        _write_atomic(os.path.join(path, f"{name}.bin"), lambda f: f.write(blob))
+
+    @classmethod
+    def attach(cls, path: str, name: str) -> "StringTable":
+        offsets = _load(path, f"{name}.offsets")
+        with open(os.path.join(path, f"{name}.bin"), "rb") as f:
+            # mmap refuses empty files
+            blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        return cls(offsets, blob)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def raw(self, index: int) -> bytes:
+        """utf-8 bytes of one string, without bounds checks"""
+        return self._blob[self._offsets[index]:self._offsets[index + 1]]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        index = operator.index(index)
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("string table index out of range")
+        offsets = self._offsets
+        return self._blob[offsets[index]:offsets[index + 1]].decode("utf-8")
+
+
+class MappedDict(Mapping):
+    """Read-only str -> int mapping: keys sorted by utf-8 bytes, found by binary search
+
+    Stands in for a vocabulary or word-count dict without building one per
+    process; callers that look up the same keys repeatedly cache the results.
+    """
+
+    def __init__(self, keys: StringTable, values: np.ndarray):
+        self._keys = keys
+        self._values = values
+
+    @staticmethod
+    def write(path: str, name: str, mapping: Dict[str, int]) -> None:
+        # Code point order is utf-8 byte order, which position() compares
+        keys = sorted(mapping)
+        StringTable.write(path, f"{name}.keys", keys)
+        _save(path, f"{name}.values", np.array([mapping[key] for key in keys], dtype=np.int64))
+
+    @classmethod
+    def attach(cls, path: str, name: str) -> "MappedDict":
+        return cls(StringTable.attach(path, f"{name}.keys"), _load(path, f"{name}.values"))
+
+    def position(self, key: str) -> int:
+        """Index of key in sorted order, or -1"""
+        target = key.encode("utf-8")
+        keys = self._keys
+        lo, hi = 0, len(keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if keys.raw(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(keys) and keys.raw(lo) == target else -1
+
+    def _value(self, position: int):
+        return int(self._values[position])
+
+    def get(self, key, default=None):
+        position = self.position(key) if isinstance(key, str) else -1
+        return default if position < 0 else self._value(position)
+
+    def __getitem__(self, key):
+        position = self.position(key) if isinstance(key, str) else -1
+        if position < 0:
+            raise KeyError(key)
+        return self._value(position)
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self.position(key) >= 0
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class MappedListDict(MappedDict):
+    """Read-only str -> list of str; each key's values are positions into a StringTable"""
+
+    def __init__(self, keys: StringTable, indptr: np.ndarray, item_ids: np.ndarray, items: StringTable):
+        super().__init__(keys, indptr)
+        self._item_ids = item_ids
+        self._items = items
+
+    @staticmethod
+    def write(path: str, name: str, mapping: Dict[str, List[str]], items: SequenceType[str]) -> None:
+        """items: every string the lists hold, in the order of the table they will be read from"""
+        item_ids = {item: i for i, item in enumerate(items)}
+        keys = sorted(mapping)
+        StringTable.write(path, f"{name}.keys", keys)
+        indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(mapping[key]) for key in keys], out=indptr[1:])
+        _save(path, f"{name}.values", indptr)
+        _save(path, f"{name}.items", np.array([item_ids[item] for key in keys for item in mapping[key]],
+                                              dtype=np.int32))
+
+    @classmethod
+    def attach(cls, path: str, name: str, items: StringTable) -> "MappedListDict":
+        return cls(StringTable.attach(path, f"{name}.keys"), _load(path, f"{name}.values"),
+                   _load(path, f"{name}.items"), items)
+
+    def _value(self, position: int) -> List[str]:
+        items = self._items
+        return [items[i] for i in self._item_ids[self._values[position]:self._values[position + 1]]]
+
+
+def _save_postings(path: str, prefix: str, matrix: csr_matrix, postings) -> None:
+    if isinstance(postings, AppendedIndex):
+        # Rows appended since the last build are merged into one set of posting lists
+        postings = InvertedIndex(matrix)
+    for name, array in (("data", matrix.data), ("indices", matrix.indices), ("indptr", matrix.indptr),
+                        ("postings_indptr", postings.indptr), ("postings_doc_ids", postings.doc_ids),
+                        ("postings_weights", postings.weights), ("term_max", postings.term_max)):
+        _save(path, f"{prefix}{name}", array)
+
+
+def _load_postings(path: str, prefix: str, shape: Tuple[int, int]) -> Tuple[csr_matrix, InvertedIndex]:
+    matrix = csr_matrix((_load(path, f"{prefix}data"), _load(path, f"{prefix}indices"),
+                         _load(path, f"{prefix}indptr")), shape=shape, copy=False)
+    postings = InvertedIndex.from_arrays(_load(path, f"{prefix}postings_indptr"),
+                                         _load(path, f"{prefix}postings_doc_ids"),
+                                         _load(path, f"{prefix}postings_weights"),
+                                         _load(path, f"{prefix}term_max"), shape[0])
+    return matrix, postings
+
+
+def _write_atomic(path: str, write) -> None:
+    """Write through a temp file and rename so readers never see partial files
+
+    The temp name is per process and thread: service workers starting
+    together save the same files, and each rename must find its own file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
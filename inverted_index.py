@@ -0,0 +1,158 @@
+# INVERTED INDEX - Posting lists over the TF-IDF vocabulary for candidate pruning
+from typing import Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix, hstack, vstack
+
+
+class InvertedIndex:
+    """Term -> (document, weight) posting lists built from a document-term matrix
+
+    Only documents sharing at least one query term are ever touched, so query
+    cost follows the posting-list lengths of the query terms rather than the
+    number of indexed documents.
+    """
+
+    def __init__(self, matrix: csr_matrix):
+        """Build posting lists (CSC columns) and per-term score upper bounds"""
+        postings = matrix.tocsc()
+        postings.sort_indices()
+        self.indptr = postings.indptr
+        self.doc_ids = postings.indices
+        self.weights = postings.data
+        self.n_docs = matrix.shape[0]
+        # Largest weight in each posting list, the MaxScore upper bound per term
+        self.term_max = np.zeros(matrix.shape[1])
+        lengths = np.diff(self.indptr)
+        nonempty = lengths > 0
+        if nonempty.any():
+            self.term_max[nonempty] = np.maximum.reduceat(self.weights, self.indptr[:-1][nonempty])
+
+    @classmethod
+    def from_arrays(cls, indptr: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray, term_max: np.ndarray,
+                    n_docs: int) -> "InvertedIndex":
+        """Wrap posting arrays built earlier (e.g. memory-mapped from disk) without copying them"""
+        index = cls.__new__(cls)
+        index.indptr, index.doc_ids, index.weights, index.term_max = indptr, doc_ids, weights, term_max
+        index.n_docs = n_docs
+        return index
+
+    def appended(self, rows: csr_matrix) -> "AppendedIndex":
+        """Index with rows added after the existing documents, without rebuilding these posting lists"""
+        return AppendedIndex(self, rows)
+
+    def dot(self, queries: csr_matrix) -> csr_matrix:
+        """Scores of many query rows against every document, as a (queries x documents) matrix"""
+        # The posting lists are the matrix's columns: read as CSR they are its transpose, no copy
+        columns = csr_matrix((self.weights, self.doc_ids, self.indptr), shape=(len(self.indptr) - 1, self.n_docs),
+                             copy=False)
+        return (queries @ columns).tocsr()
+
+    def _postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[term], self.indptr[term + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    def score(self, terms: np.ndarray, query_weights: np.ndarray, top_k: int,
+              early_termination: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (doc_ids, scores) by dot product, best first
+
+        Terms are visited in order of their score upper bound. With
+        early_termination, once the k-th best score already beats everything
+        the unvisited terms could add, those terms stop admitting new
+        candidates (MaxScore) and are only probed for the existing ones by
+        binary search, so their long posting lists are never scanned.
+        """
+        if len(terms) == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        bounds = query_weights * self.term_max[terms]
+        order = np.argsort(-bounds, kind='stable')
+        remaining = float(bounds.sum())
+        # Only the query's terms: the vocabulary (or a hashed space) can be wide
+        lengths = self.indptr[terms + 1] - self.indptr[terms]
+        unvisited_length = int(lengths.sum())
+        visited_length = 0
+
+        doc_parts, score_parts = [], []
+        candidates = scores = None
+        for position in order:
+            term, weight = terms[position], query_weights[position]
+            remaining -= bounds[position]
+            unvisited_length -= lengths[position]
+            docs, term_weights = self._postings(term)
+
+            if candidates is None:
+                doc_parts.append(docs)
+                score_parts.append(term_weights * weight)
+                visited_length += len(docs)
+                # Checking the threshold costs a merge; only worth it when the
+                # unvisited lists are longer than what has been collected so far
+                if early_termination and remaining > 0 and unvisited_length > visited_length:
+                    merged_docs, merged_scores = self._merge(doc_parts, score_parts)
+                    if len(merged_docs) >= top_k and np.partition(merged_scores, -top_k)[-top_k] >= remaining:
+                        candidates, scores = merged_docs, merged_scores
+            elif len(docs):
+                # Non-essential term: look candidates up in its sorted posting list
+                found = np.searchsorted(docs, candidates)
+                hit = found < len(docs)
+                hit[hit] = docs[found[hit]] == candidates[hit]
+                scores[hit] += term_weights[found[hit]] * weight
+
+        if candidates is None:
+            candidates, scores = self._merge(doc_parts, score_parts)
+        return self.top_k(candidates, scores, top_k)
+
+    @staticmethod
+    def top_k(candidates: np.ndarray, scores: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Best top_k of (sorted doc ids, scores), best first; ties go to the lower doc id"""
+        if top_k < len(scores):
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return candidates[best], scores[best]
+
+    @staticmethod
+    def _merge(doc_parts, score_parts) -> Tuple[np.ndarray, np.ndarray]:
+        """Sum per-term contributions into one score per distinct document"""
+        docs = np.concatenate(doc_parts)
+        contributions = np.concatenate(score_parts)
+        unique_docs, positions = np.unique(docs, return_inverse=True)
+        return unique_docs, np.bincount(positions, weights=contributions, minlength=len(unique_docs))
+
+
+class AppendedIndex:
+    """An InvertedIndex plus posting lists for the rows appended since it was built
+
+    An append only indexes the rows appended so far, so its cost follows
+    their number (bounded by the compaction drift threshold) rather than the
+    index size; compaction builds one InvertedIndex over all rows again.
+    Every document is in exactly one of the two, so merging their top-k
+    results gives the exact top k.
+    """
+
+    def __init__(self, base: InvertedIndex, rows: csr_matrix):
+        self.base = base
+        self.rows = rows
+        # Posting lists only for the terms the appended rows use: the vocabulary can be millions wide
+        self.terms = np.unique(rows.indices)
+        self.delta = InvertedIndex(csr_matrix((rows.data, np.searchsorted(self.terms, rows.indices), rows.indptr),
+                                              shape=(rows.shape[0], len(self.terms))))
+        self.n_docs = base.n_docs + rows.shape[0]
+
+    def appended(self, rows: csr_matrix) -> "AppendedIndex":
+        return AppendedIndex(self.base, vstack([self.rows, rows], format="csr"))
+
+    def dot(self, queries: csr_matrix) -> csr_matrix:
+        return hstack([self.base.dot(queries), self.delta.dot(queries[:, self.terms])], format="csr")
+
+    def score(self, terms: np.ndarray, query_weights: np.ndarray, top_k: int,
+              early_termination: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        base_docs, base_scores = self.base.score(terms, query_weights, top_k, early_termination)
+        positions = np.minimum(np.searchsorted(self.terms, terms), max(len(self.terms) - 1, 0))
+        used = self.terms[positions] == terms if len(self.terms) else np.zeros(len(terms), dtype=bool)
+        delta_docs, delta_scores = self.delta.score(positions[used], query_weights[used], top_k, early_termination)
+        # Appended rows come after every base row, so the ids stay sorted
+        candidates = np.concatenate([np.sort(base_docs), np.sort(delta_docs) + self.base.n_docs])
+        scores = np.concatenate([base_scores[np.argsort(base_docs)], delta_scores[np.argsort(delta_docs)]])
+        return InvertedIndex.top_k(candidates, scores, top_k)
@@ -0,0 +1,79 @@
+# PDF INGESTION - Streams handbook/manual PDFs into searchable passages
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+from faq_store import SQLiteFAQStore
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF answers are optional; FAQs work without pypdf
+    PdfReader = None
+
+PDF_FILES = ["College_Handbook.pdf", "Hostel_Manual.pdf"]
+
+WORDS_PER_PASSAGE = 80
+PASSAGE_OVERLAP = 20
+# Below this many changed files a process pool costs more than it saves
+MIN_FILES_FOR_POOL = 4
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hash file contents in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_passages(path: str, words_per_passage: int = WORDS_PER_PASSAGE,
+                  overlap: int = PASSAGE_OVERLAP) -> Iterator[Tuple[int, str]]:
+    """Yield (page number, passage) one page at a time
+
+    Only the current page's text is held in memory. Passages are windows of
+    words_per_passage words that share overlap words with the previous one,
+    so a sentence cut at a window edge still appears whole in one passage.
+    """
+    step = max(1, words_per_passage - overlap)
+    reader = PdfReader(path)
+    for page_number, page in enumerate(reader.pages, 1):
+        words = (page.extract_text() or "").split()
+        if not words:
+            continue
+        for start in range(0, max(len(words) - overlap, 1), step):
+            yield page_number, " ".join(words[start:start + words_per_passage])
+
+
+def _ingest_file(db_path: str, path: str, digest: str) -> Tuple[str, int]:
+    """Extract one PDF into the store (runs in a worker process)"""
+    store = SQLiteFAQStore(db_path, pool_size=1)
+    return path, store.replace_passages(os.path.basename(path), digest, iter_passages(path))
+
+
+def ingest_pdfs(store: SQLiteFAQStore, paths: List[str] = PDF_FILES) -> Dict[str, int]:
+    """Index passages of new or changed PDFs; returns passages written per file
+
+    Files whose content hash matches the last ingestion are skipped, so a
+    restart with unchanged PDFs does no extraction at all. Many changed files
+    are extracted in parallel worker processes, each writing to SQLite itself.
+    """
+    if PdfReader is None:
+        return {}
+
+    changed = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        digest = file_sha256(path)
+        if store.file_hash(os.path.basename(path)) != digest:
+            changed.append((path, digest))
+
+    if len(changed) < MIN_FILES_FOR_POOL:
+        return {path: store.replace_passages(os.path.basename(path), digest, iter_passages(path))
+                for path, digest in changed}
+
+    with ProcessPoolExecutor() as pool:
+        futures = [pool.submit(_ingest_file, store.path, path, digest) for path, digest in changed]
+        return dict(future.result() for future in futures)
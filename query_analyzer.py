@@ -0,0 +1,158 @@
+# QUERY ANALYZER - Precompiled tokenization and term weighting for incoming queries
+import re
+from collections import namedtuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from bm25 import BM25Vectorizer
+from hashed_tfidf import HashedTfidfVectorizer
+from spelling import SpellCorrector
+
+# One query's sparse row as parallel arrays: feature ids (sorted) and weights
+QueryVector = namedtuple("QueryVector", ["indices", "data"])
+
+
+class QueryAnalyzer:
+    """Query rows identical to the fitted vectorizer's, without the sklearn call path
+
+    vectorizer.transform([query]) builds the analyzer chain, a count matrix
+    and a csr matrix on every call. Here everything that depends only on the
+    fitted vocabulary is prepared once: the token regex is compiled, stop
+    words are a frozenset, each token maps straight to an integer id, and a
+    bigram is found by its pair of token ids instead of joining an "a b"
+    string. Weights match TfidfVectorizer.transform() (tf * idf, l2-normed)
+    or BM25Vectorizer.transform_queries(). With a HashedTfidfVectorizer,
+    terms are hashed instead, through a bounded cache of recent terms; a
+    vocabulary that is not a dict (a memory-mapped one, see shared_index.py)
+    is searched term by term through the same cache rather than copied.
+    """
+
+    # Distinct terms whose column is remembered (hashed features and mapped vocabularies only)
+    TERM_CACHE_SIZE = 65536
+
+    def __init__(self, vectorizer):
+        self.bm25 = isinstance(vectorizer, BM25Vectorizer)
+        self.hashed = isinstance(vectorizer, HashedTfidfVectorizer)
+        options = vectorizer.counter if self.bm25 or self.hashed else vectorizer
+        min_n, max_n = options.ngram_range
+        if (options.analyzer != "word" or options.tokenizer is not None or options.preprocessor is not None
+                or options.strip_accents is not None or min_n != 1 or max_n > 2):
+            raise ValueError("QueryAnalyzer supports the default word tokenizer with unigrams and bigrams")
+        if not self.bm25 and (vectorizer.norm != "l2" or vectorizer.sublinear_tf or vectorizer.binary):
+            raise ValueError("QueryAnalyzer supports l2-normalized TF-IDF with raw term counts")
+        self.bigrams = max_n == 2
+        self.lowercase = options.lowercase
+        self.token_pattern = re.compile(options.token_pattern)
+        self.stop_words = frozenset(options.get_stop_words() or ())
+        self.idf = np.asarray(vectorizer.idf_, dtype=np.float64)
+        self.k1 = vectorizer.k1 if self.bm25 else None
+
+        if self.hashed:
+            self.n_features = vectorizer.n_features
+            self._feature_id = lru_cache(maxsize=self.TERM_CACHE_SIZE)(vectorizer.feature_id)
+            return
+
+        vocabulary = vectorizer.vocabulary_
+        self.n_features = len(vocabulary)
+        if not isinstance(vocabulary, dict):
+            # Unknown terms get -1 and are skipped
+            self._feature_id = lru_cache(maxsize=self.TERM_CACHE_SIZE)(lambda term: vocabulary.get(term, -1))
+            return
+
+        self._feature_id = None
+        # Unigram features keep their feature id; tokens that only occur inside
+        # a bigram get ids past the vocabulary so they never count on their own
+        self._token_ids: Dict[str, int] = {term: i for term, i in vocabulary.items() if " " not in term}
+        bigrams = [(term.split(" "), i) for term, i in vocabulary.items() if " " in term]
+        for pair, _ in bigrams:
+            for token in pair:
+                if token not in self._token_ids:
+                    self._token_ids[token] = self.n_features + len(self._token_ids)
+        self._n_ids = self.n_features + len(self._token_ids)
+        self._bigrams: Dict[int, int] = {self._token_ids[a] * self._n_ids + self._token_ids[b]: i
+                                         for (a, b), i in bigrams}
+
+    def tokens(self, text: str) -> List[str]:
+        """Words of a text as the vectorizer sees them, stop words removed"""
+        if self.lowercase:
+            text = text.lower()
+        stop_words = self.stop_words
+        return [token for token in self.token_pattern.findall(text) if token not in stop_words]
+
+    def analyze(self, query: str, corrector: Optional[SpellCorrector] = None) -> QueryVector:
+        """Weighted feature ids of one query, as in the vectorizer's query row
+
+        With a corrector, misspelled tokens are replaced before unigrams and
+        bigrams are formed.
+        """
+        tokens = self.tokens(query)
+        if corrector is not None:
+            tokens = corrector.correct_tokens(tokens)
+        counts = self._counts(tokens) if self._feature_id is None else self._term_counts(tokens)
+        if not counts:
+            return QueryVector(np.empty(0, dtype=np.intp), np.empty(0))
+
+        features = sorted(counts)
+        indices = np.array(features, dtype=np.intp)
+        data = self.idf[indices]
+        if self.hashed:
+            # Columns no document uses have idf 0: unknown terms, dropped as a vocabulary would
+            known = data > 0
+            if not known.all():
+                features = [feature for feature, keep in zip(features, known) if keep]
+                indices, data = indices[known], data[known]
+                if not features:
+                    return QueryVector(indices, data)
+        if self.bm25:
+            # transform_queries ignores repeats: each known term counts its idf once
+            data /= data.sum() * (self.k1 + 1)
+        else:
+            data *= [counts[feature] for feature in features]
+            data /= np.sqrt(np.dot(data, data))
+        return QueryVector(indices, data)
+
+    def _counts(self, tokens) -> Dict[int, int]:
+        """Feature id -> count through the vocabulary's token and bigram id tables"""
+        token_id = self._token_ids.get
+        ids = [token_id(token, -1) for token in tokens]
+        counts: Dict[int, int] = {}
+        n_features = self.n_features
+        for i in ids:
+            if 0 <= i < n_features:
+                counts[i] = counts.get(i, 0) + 1
+        if self._bigrams:
+            bigram_id = self._bigrams.get
+            n_ids = self._n_ids
+            for a, b in zip(ids, ids[1:]):
+                if a >= 0 and b >= 0:
+                    feature = bigram_id(a * n_ids + b)
+                    if feature is not None:
+                        counts[feature] = counts.get(feature, 0) + 1
+        return counts
+
+    def _term_counts(self, tokens) -> Dict[int, int]:
+        """Column -> count, looking each term up; the same terms the id tables would form"""
+        feature_id = self._feature_id
+        counts: Dict[int, int] = {}
+        for token in tokens:
+            feature = feature_id(token)
+            if feature >= 0:
+                counts[feature] = counts.get(feature, 0) + 1
+        if self.bigrams:
+            for a, b in zip(tokens, tokens[1:]):
+                feature = feature_id(a + " " + b)
+                if feature >= 0:
+                    counts[feature] = counts.get(feature, 0) + 1
+        return counts
+
+    def transform(self, queries: Sequence[str], corrector: Optional[SpellCorrector] = None) -> csr_matrix:
+        """Query rows for a batch, as one csr matrix"""
+        rows = [self.analyze(query, corrector) for query in queries]
+        indptr = np.zeros(len(rows) + 1, dtype=np.intp)
+        np.cumsum([len(row.indices) for row in rows], out=indptr[1:])
+        indices = np.concatenate([row.indices for row in rows]) if rows else np.empty(0, dtype=np.intp)
+        data = np.concatenate([row.data for row in rows]) if rows else np.empty(0)
+        return csr_matrix((data, indices, indptr), shape=(len(rows), self.n_features))
@@ -1,62 +1,843 @@
-# SEARCH ENGINE - Custom semantic search for FAQs
+# SEARCH ENGINE - Custom semantic search for FAQs and handbook passages
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Dict
+from scipy.sparse import hstack, vstack
+from typing import List, Dict, Iterable, Optional, Sequence, Tuple, Union
+from bm25 import BM25Vectorizer
+from char_index import CharNgramIndex
+from hashed_tfidf import HashedTfidfVectorizer
+from calibration import CONFIDENCE_HIGH, CONFIDENCE_MEDIUM, ScoreCalibrator
+from index_store import corpus_hash, load_calibration, load_index, save_calibration, save_index
+from inverted_index import InvertedIndex
+from query_analyzer import QueryAnalyzer
+from spelling import SpellCorrector
+
+# Immutable view of the index. Writers build a new one and swap the reference,
+# so a reader that grabbed a snapshot never sees a half-built matrix.
+IndexSnapshot = namedtuple("IndexSnapshot",
+                           ["questions", "doc_types", "answers", "categories",
+                            "vectorizer", "question_vectors", "postings", "analyzer", "corrector", "fallback", "generation"])
+
+# Document types held in one index: curated FAQ questions and PDF passages
+FAQ_DOC = "faq"
+PASSAGE_DOC = "passage"
+
+# Text fields that can be indexed, each as its own block of columns over one
+# shared vocabulary, and how much a match in each counts by default
+FIELDS = ("question", "answer", "category")
+DEFAULT_FIELD_WEIGHTS = {"question": 1.0, "answer": 0.4, "category": 0.2}
+
+# Scoring models: TF-IDF cosine, or Okapi BM25 scaled into [0, 1)
+SCORING_MODELS = ("tfidf", "bm25")
+Vectorizer = Union[TfidfVectorizer, BM25Vectorizer, HashedTfidfVectorizer]
+
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: case, punctuation and spacing folded away
+
+    Punctuation becomes a space rather than vanishing, so the normalized text
+    tokenizes exactly like the original and results are unchanged.
+    """
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", query.lower())).strip()
+
+
+def create_engine(questions: List[str], scoring: Optional[str] = None, **options):
+    """Search engine for the configured scoring model (SemanticSearch.SCORING)
+
+    "dense" and "hybrid" return engines with the SemanticSearch interface;
+    their dependencies are imported only when selected.
+    """
+    scoring = scoring or SemanticSearch.SCORING
+    if scoring == "dense":
+        from dense_search import DenseSearch
+        return DenseSearch(questions, **options)
+    if scoring == "hybrid":
+        from dense_search import DenseSearch
+        from hybrid_search import HybridSearch
+        questions = list(questions)
+        cache_dir = options.pop("cache_dir", None)
+        lexical = SemanticSearch(questions, scoring=HybridSearch.LEXICAL_SCORING,
+                                 cache_dir=cache_dir and os.path.join(cache_dir, "lexical"), **options)
+        dense = DenseSearch(questions, cache_dir=cache_dir and os.path.join(cache_dir, "dense"), **options)
+        return HybridSearch(lexical, dense, cache_dir=cache_dir)
+    return SemanticSearch(questions, scoring=scoring, **options)
+
 
 class SemanticSearch:
-    """Semantic search engine using TF-IDF and cosine similarity"""
-    
-    def __init__(self, questions: List[str]):
-        """Initialize search engine with questions"""
-        self.questions = questions
-        self.vectorizer = TfidfVectorizer(lowercase=True, stop_words='english', ngram_range=(1, 2))
-        self.question_vectors = self.vectorizer.fit_transform(questions)
-    
-    def search(self, query: str, top_k: int = 3) -> List[Dict]:
-        """Search for similar questions and return results"""
-        if len(self.questions) == 0:
+    """Semantic search engine using TF-IDF cosine similarity or BM25
+
+    Safe to share between sessions: searches read the current snapshot without
+    locking, writes are serialized and published copy-on-write.
+    """
+
+    # Share of documents added/removed since the last fit before the
+    # vocabulary and IDF weights are refreshed in the background
+    DRIFT_THRESHOLD = 0.2
+
+    # Distinct (query, top_k) results kept in the LRU result cache
+    RESULT_CACHE_SIZE = 1024
+
+    # Scoring model used when none is passed in; FAQ_SEARCH_SCORING=bm25 (or dense
+    # or hybrid, through create_engine) switches every app
+    SCORING = os.environ.get("FAQ_SEARCH_SCORING", "tfidf")
+    SCORING_MODELS = SCORING_MODELS
+
+    # Width of the hashed feature space for TF-IDF (FAQ_HASH_FEATURES, e.g.
+    # 1048576); 0 keeps a fitted vocabulary
+    HASH_FEATURES = int(os.environ.get("FAQ_HASH_FEATURES", 0))
+
+    # Most frequent words the typo index corrects to in hashed mode (about
+    # 4 KB each, so some 40 MB); hashing is there to keep memory bounded
+    HASHED_SPELLING_WORDS = 10000
+
+    # Top word-level score below which the character n-gram index is tried
+    FALLBACK_THRESHOLD = 0.15
+    # Weaker n-gram matches are coincidental overlaps ("can" in "canteen" and "How can I")
+    FALLBACK_MIN_SCORE = 0.25
+    # Recent fallback lookups kept for the latency percentiles
+    LATENCY_WINDOW = 1000
+    # Seconds an add/update/remove waits before it is published to shared_dir,
+    # so a burst of writes becomes one generation
+    SHARE_DELAY = 1.0
+
+    def __init__(self, questions: List[str], drift_threshold: float = DRIFT_THRESHOLD,
+                 cache_dir: Optional[str] = None, early_termination: bool = True,
+                 result_cache_size: int = RESULT_CACHE_SIZE, doc_types: Optional[List[str]] = None,
+                 answers: Optional[List[str]] = None, categories: Optional[List[str]] = None,
+                 field_weights: Optional[Dict[str, float]] = None, scoring: Optional[str] = None,
+                 hash_features: int = HASH_FEATURES, correct_spelling: Optional[bool] = None,
+                 fallback_threshold: float = FALLBACK_THRESHOLD, shared_dir: Optional[str] = None):
+        """Initialize search engine with questions
+
+        doc_types tags each entry (FAQ_DOC or PASSAGE_DOC); all are FAQs by default.
+        answers and categories, when given, are indexed as extra fields aligned
+        with questions; field_weights overrides DEFAULT_FIELD_WEIGHTS and can
+        also be set per search. scoring picks a model from SCORING_MODELS
+        (default SCORING).
+        hash_features > 0 makes TF-IDF hash terms into that many columns instead
+        of fitting a vocabulary: memory stays fixed and add/remove update IDF
+        in place of a refit. Other scoring models ignore it.
+        correct_spelling replaces query words the index has never seen with
+        the closest indexed word (SpellCorrector), rebuilt with every full fit.
+        It is on by default except with hash_features, where the typo index
+        would grow with the vocabulary; turned on there, it corrects only to
+        the HASHED_SPELLING_WORDS most frequent words.
+        When the best word-level score is below fallback_threshold, FAQ
+        questions are also searched by character n-grams (CharNgramIndex);
+        0 disables that index.
+        With cache_dir set, a saved index for the same questions is memory-mapped
+        instead of refitting, and every full fit is written back there.
+        early_termination enables MaxScore pruning in the inverted index.
+        result_cache_size bounds the LRU result cache (0 disables it).
+        A confidence calibration saved in cache_dir by calibrate() is reused.
+        With shared_dir set, the index (and every later full fit) is also
+        published there as a read-only generation that worker processes map
+        instead of each holding a copy (shared_index.SharedSemanticSearch);
+        incremental writes follow within SHARE_DELAY seconds.
+        """
+        scoring = scoring or self.SCORING
+        if scoring not in self.SCORING_MODELS:
+            raise ValueError(f"scoring must be one of {self.SCORING_MODELS}, not {scoring!r}")
+        self.scoring = scoring
+        self.hash_features = hash_features if scoring == "tfidf" else 0
+        self.drift_threshold = drift_threshold
+        self.cache_dir = cache_dir
+        self.shared_dir = shared_dir
+        self.early_termination = early_termination
+        self.correct_spelling = correct_spelling if correct_spelling is not None else not self.hash_features
+        self.fallback_threshold = fallback_threshold
+        self.searches_scored = 0
+        self.fallback_searches = 0
+        self._fallback_latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.result_cache_size = result_cache_size
+        self._result_cache = OrderedDict()
+        self._result_cache_generation = 0
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+        self._compaction = None
+        self._share_lock = threading.Lock()
+        self._share_timer = None
+        self._snapshot = IndexSnapshot((), (), (), (), None, None, None, None, None, None, 0)
+        self.fields = ("question",) + (("answer",) if answers is not None else ()) + \
+                      (("category",) if categories is not None else ())
+        self.field_weights = dict(DEFAULT_FIELD_WEIGHTS, **(field_weights or {}))
+        questions = list(questions)
+        doc_types = list(doc_types) if doc_types is not None else [FAQ_DOC] * len(questions)
+        answers = list(answers) if answers is not None else [""] * len(questions)
+        categories = list(categories) if categories is not None else [""] * len(questions)
+        if not (cache_dir and self._load_cached(questions, doc_types, answers, categories)):
+            self._fit(questions, doc_types, answers, categories)
+        elif shared_dir:
+            self._share()
+
+        self.calibrator = ScoreCalibrator()
+        self._calibration_version = 0
+        if cache_dir:
+            saved = load_calibration(cache_dir, self.scoring)
+            if saved is not None:
+                self.calibrator = ScoreCalibrator.from_dict(saved)
+
+    @property
+    def questions(self) -> tuple:
+        return self._snapshot.questions
+
+    @property
+    def vectorizer(self) -> Vectorizer:
+        return self._snapshot.vectorizer
+
+    @property
+    def question_vectors(self):
+        return self._snapshot.question_vectors
+
+    @property
+    def generation(self) -> int:
+        """Incremented every time a new snapshot is published"""
+        return self._snapshot.generation
+
+    def snapshot(self) -> IndexSnapshot:
+        """Current immutable index snapshot"""
+        return self._snapshot
+
+    def _new_vectorizer(self) -> Vectorizer:
+        """Create the vectorizer used for every fit
+
+        norm='l2' makes every row unit length at build time (and every appended
+        row as it is transformed), so cosine similarity is a plain dot product.
+        BM25 rows are built so that a dot product gives the BM25 score.
+        """
+        if self.scoring == "bm25":
+            return BM25Vectorizer(lowercase=True, stop_words='english', ngram_range=(1, 2))
+        if self.hash_features:
+            return HashedTfidfVectorizer(self.hash_features, lowercase=True, stop_words='english',
+                                         ngram_range=(1, 2))
+        return TfidfVectorizer(lowercase=True, stop_words='english', ngram_range=(1, 2), norm='l2')
+
+    def _new_analyzer(self, vectorizer: Vectorizer) -> QueryAnalyzer:
+        """Precompiled query path for a freshly fitted (or loaded) vectorizer"""
+        return QueryAnalyzer(vectorizer)
+
+    def _new_corrector(self, analyzer: QueryAnalyzer, questions, answers, categories) -> Optional[SpellCorrector]:
+        """Typo index over every indexed word, built with each full fit"""
+        if not self.correct_spelling or analyzer is None:
+            return None
+        texts = [text for field in self._field_texts(questions, answers, categories) for text in field]
+        max_targets = self.HASHED_SPELLING_WORDS if self.hash_features else None
+        return SpellCorrector.from_texts(texts, analyzer.tokens, max_targets=max_targets)
+
+    def _new_fallback(self, analyzer: QueryAnalyzer, questions, doc_types) -> Optional[CharNgramIndex]:
+        """Character n-gram index over FAQ questions; passages get empty rows"""
+        if self.fallback_threshold <= 0 or analyzer is None:
+            return None
+        return CharNgramIndex(self._fallback_texts(analyzer, questions, doc_types))
+
+    @staticmethod
+    def _fallback_texts(analyzer: QueryAnalyzer, questions, doc_types) -> List[str]:
+        """Question words without stop words: "is there" or "how do I" must not make a match"""
+        return [" ".join(analyzer.tokens(question)) if doc_type == FAQ_DOC else ""
+                for question, doc_type in zip(questions, doc_types)]
+
+    def _with_documents(self, vectorizer: Vectorizer, added: Optional[tuple] = None,
+                        removed: Optional[tuple] = None) -> Vectorizer:
+        """Vectorizer to use after (questions, answers, categories) rows are added or removed
+
+        A fitted vocabulary stays as it is until the next fit; hashed features
+        fold the change into their document frequencies straight away.
+        """
+        if not isinstance(vectorizer, HashedTfidfVectorizer):
+            return vectorizer
+
+        def texts(rows):
+            return [text for field in self._field_texts(*rows) for text in field] if rows else ()
+        return vectorizer.with_documents(texts(added), texts(removed))
+
+    def _publish(self, questions: tuple, doc_types: tuple, answers: tuple, categories: tuple,
+                 vectorizer: Vectorizer, vectors, incremental: bool = False,
+                 fallback: Optional[CharNgramIndex] = None, corrector: Optional[SpellCorrector] = None) -> None:
+        """Swap in a new snapshot; caller must hold the write lock
+
+        incremental marks rows appended or removed without a refit; the
+        caller then passes the fallback index with the same rows changed.
+        A full publish builds a new fallback index and typo index unless
+        they are passed in (loaded from cache_dir).
+        """
+        postings = self._build_postings(vectors, incremental) if vectors is not None else None
+        # Appends keep the vocabulary, so the analyzer built for it still applies
+        if vectorizer is self._snapshot.vectorizer:
+            analyzer = self._snapshot.analyzer
+        else:
+            analyzer = self._new_analyzer(vectorizer) if vectors is not None else None
+        # Words added since the last fit are picked up by the next one
+        if incremental:
+            corrector = self._snapshot.corrector
+        else:
+            if corrector is None:
+                corrector = self._new_corrector(analyzer, questions, answers, categories)
+            if fallback is None:
+                fallback = self._new_fallback(analyzer, questions, doc_types)
+        self._snapshot = IndexSnapshot(questions, doc_types, answers, categories, vectorizer, vectors,
+                                       postings, analyzer, corrector, fallback, self._snapshot.generation + 1)
+
+    def _build_postings(self, vectors, incremental: bool):
+        """Search structure over the document rows of a new snapshot
+
+        An incremental publish that only appended rows indexes just those,
+        next to the existing posting lists (see AppendedIndex); removals,
+        edits and fits build the posting lists anew.
+        """
+        previous = self._snapshot.postings
+        if incremental and previous is not None and vectors.shape[0] > previous.n_docs:
+            return previous.appended(vectors[previous.n_docs:])
+        return InvertedIndex(vectors)
+
+    @staticmethod
+    def _append_rows(vectors, new_vectors):
+        return vstack([vectors, new_vectors], format='csr')
+
+    @staticmethod
+    def _count_orphans(new_vectors) -> int:
+        """Rows sharing no term with the vocabulary; they can never match until refit"""
+        return int((new_vectors.getnnz(axis=1) == 0).sum())
+
+    def _field_texts(self, questions, answers, categories) -> List[Sequence[str]]:
+        """Texts of each indexed field, in self.fields order"""
+        texts = {"question": questions, "answer": answers, "category": categories}
+        return [texts[field] for field in self.fields]
+
+    def _vectorize(self, vectorizer: Vectorizer, questions, answers, categories, fit: bool = False):
+        """Document-term matrix with one column block per field
+
+        Each block is l2-normalized on its own, so a field's contribution to a
+        score is the cosine similarity with that field times its weight.
+        """
+        field_texts = self._field_texts(questions, answers, categories)
+        if fit:
+            vectorizer.fit([text for texts in field_texts for text in texts])
+        blocks = [vectorizer.transform(texts) for texts in field_texts]
+        return blocks[0].tocsr() if len(blocks) == 1 else hstack(blocks, format='csr')
+
+    def _fit(self, questions: List[str], doc_types: List[str], answers: List[str], categories: List[str]) -> None:
+        """Fit vocabulary and IDF weights over the full question list"""
+        vectorizer = self._new_vectorizer()
+        vectors = self._vectorize(vectorizer, questions, answers, categories, fit=True) if questions else None
+        with self._lock:
+            self._publish(tuple(questions), tuple(doc_types), tuple(answers), tuple(categories), vectorizer, vectors)
+            snapshot = self._snapshot
+            self._fitted_count = len(questions)
+            self._changes = 0
+            self._orphans = 0
+        self._save_cached(snapshot)
+
+    def _corpus_hash(self, questions, doc_types, answers, categories) -> str:
+        hashing = (f"hashed{self.hash_features}",) if self.hash_features else ()
+        return corpus_hash((self.scoring,) + hashing + self.fields, questions, doc_types,
+                           *self._field_texts(questions, answers, categories)[1:])
+
+    def _load_cached(self, questions: List[str], doc_types: List[str],
+                     answers: List[str], categories: List[str]) -> bool:
+        """Memory-map a saved index when it was built from exactly these questions"""
+        loaded = load_index(self.cache_dir, self._corpus_hash(questions, doc_types, answers, categories))
+        if loaded is None:
+            return False
+        terms, idf, vectors, params = loaded
+        vectorizer = self._new_vectorizer()
+        if self.hash_features:
+            vectorizer.restore(idf, params["n_docs"])
+        else:
+            vectorizer.vocabulary_ = {term: i for i, term in enumerate(terms)}
+            vectorizer.idf_ = idf
+        if self.scoring == "bm25":
+            vectorizer.avgdl_ = params["avgdl"]
+        fallback, corrector = None, None
+        try:
+            if self.fallback_threshold > 0 and params.get("fallback_shape") is not None:
+                fallback = CharNgramIndex.attach(self.cache_dir, params["fallback_shape"])
+            if self.correct_spelling and params.get("spelling") is not None:
+                corrector = SpellCorrector.attach(self.cache_dir, **params["spelling"])
+        except (OSError, ValueError):
+            # Rebuilt from the questions by _publish
+            fallback, corrector = None, None
+        with self._lock:
+            self._publish(tuple(questions), tuple(doc_types), tuple(answers), tuple(categories), vectorizer, vectors,
+                          fallback=fallback, corrector=corrector)
+            self._fitted_count = len(questions)
+            self._changes = 0
+            self._orphans = 0
+        return True
+
+    def _save_cached(self, snapshot: IndexSnapshot) -> None:
+        """Persist a freshly fitted snapshot so the next start can skip the fit (and share it)
+
+        The n-gram fallback index and the typo index are saved with it, so a
+        cached start rebuilds neither.
+        """
+        vectorizer, vectors = snapshot.vectorizer, snapshot.question_vectors
+        if vectors is None:
+            return
+        if self.cache_dir:
+            if self.hash_features:
+                terms, params = [], {"hash_features": self.hash_features, "n_docs": vectorizer.n_docs_}
+            else:
+                terms = vectorizer.get_feature_names_out().tolist()
+                params = {"avgdl": vectorizer.avgdl_} if self.scoring == "bm25" else None
+
+            def write_tables(path: str) -> Dict:
+                fallback, corrector = snapshot.fallback, snapshot.corrector
+                return {"fallback_shape": fallback.write(path) if fallback is not None else None,
+                        "spelling": corrector.write(path) if corrector is not None else None}
+            save_index(self.cache_dir, self._corpus_hash(snapshot.questions, snapshot.doc_types, snapshot.answers,
+                                                         snapshot.categories),
+                       terms, vectorizer.idf_, vectors, params, write_tables)
+        if self.shared_dir:
+            self._share()
+
+    def _share(self) -> None:
+        """Publish the current snapshot to shared_dir as a new generation"""
+        # Imported here: shared_index builds on this module
+        from shared_index import publish_index
+        # One at a time, so an older snapshot can never be published over a newer one
+        with self._share_lock:
+            publish_index(self.shared_dir, self)
+
+    def _share_later(self) -> None:
+        """Publish an incremental write after SHARE_DELAY, together with any that follow it"""
+        if not self.shared_dir:
+            return
+        with self._lock:
+            if self._share_timer is not None:
+                return
+            self._share_timer = threading.Timer(self.SHARE_DELAY, self._share_pending)
+            self._share_timer.daemon = True
+            self._share_timer.start()
+
+    def _share_pending(self) -> None:
+        # Cleared first: a write landing while this publishes schedules the next one
+        with self._lock:
+            self._share_timer = None
+        self._share()
+
+    def _weights(self, field_weights: Optional[Dict[str, float]]) -> Tuple[float, ...]:
+        """Per-field weights for one search, in self.fields order"""
+        weights = self.field_weights if not field_weights else dict(self.field_weights, **field_weights)
+        return tuple(float(weights.get(field, 0.0)) for field in self.fields)
+
+    @staticmethod
+    def _expand_query(query_vector, n_terms: int, weights: Tuple[float, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """Map a query's terms into every weighted field block
+
+        The result scores against the block matrix in a single pass, so any
+        mix of field weights costs the same as a question-only search.
+        """
+        terms, values = [], []
+        for block, weight in enumerate(weights):
+            if weight:
+                terms.append(query_vector.indices + block * n_terms)
+                values.append(query_vector.data * weight)
+        if not terms:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        return np.concatenate(terms), np.concatenate(values)
+
+    def calibrate(self, samples: Iterable[Tuple[float, float]]) -> ScoreCalibrator:
+        """Fit score -> confidence from (score, label) feedback and store it with the index"""
+        calibrator = ScoreCalibrator.fit(samples)
+        with self._cache_lock:
+            self.calibrator = calibrator
+            self._calibration_version += 1
+            self._result_cache.clear()
+        for path in (self.cache_dir, self.shared_dir):
+            if path:
+                save_calibration(path, self.scoring, calibrator.to_dict())
+        return calibrator
+
+    def search(self, query: str, top_k: int = 3, field_weights: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """Search for similar questions and return results
+
+        field_weights overrides the engine's field weights for this search.
+        Repeated queries are answered from the LRU result cache. Entries belong
+        to one index generation, so retrain() and add/remove invalidate them.
+        """
+        snapshot = self._snapshot
+        calibration_version = self._calibration_version
+        weights = self._weights(field_weights)
+        if self.result_cache_size <= 0:
+            return self._search(snapshot, query, top_k, weights)
+
+        key = (normalize_query(query), top_k, weights)
+        with self._cache_lock:
+            if self._result_cache_generation != snapshot.generation:
+                self._result_cache.clear()
+                self._result_cache_generation = snapshot.generation
+            cached = self._result_cache.get(key)
+            if cached is not None:
+                self._result_cache.move_to_end(key)
+                self.cache_hits += 1
+                return [dict(result) for result in cached]
+            self.cache_misses += 1
+
+        results = self._search(snapshot, query, top_k, weights)
+        with self._cache_lock:
+            # A newer snapshot or calibration may have been published while scoring
+            if (self._result_cache_generation == snapshot.generation
+                    and self._calibration_version == calibration_version):
+                self._result_cache[key] = [dict(result) for result in results]
+                while len(self._result_cache) > self.result_cache_size:
+                    self._result_cache.popitem(last=False)
+        return results
+
+    def cache_stats(self) -> Dict:
+        """Result cache hit/miss counters for the Analytics page"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self._result_cache),
+            "hit_rate": self.cache_hits / lookups if lookups else 0.0
+        }
+
+    def fallback_stats(self) -> Dict:
+        """Share of scored searches that consulted the n-gram index, and its p50/p99 in ms"""
+        latencies = np.array(self._fallback_latencies) if self._fallback_latencies else np.zeros(1)
+        return {
+            "searches": self.searches_scored,
+            "fallbacks": self.fallback_searches,
+            "share": self.fallback_searches / self.searches_scored if self.searches_scored else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+        }
+
+    def _search(self, snapshot: IndexSnapshot, query: str, top_k: int, weights: Tuple[float, ...]) -> List[Dict]:
+        """Score one query against a snapshot
+
+        'score' is the weighted sum over fields used for ranking; 'similarity'
+        is the same value capped at 1.0; 'confidence' is the calibrated
+        probability that the answer helps.
+        """
+        questions = snapshot.questions
+
+        if len(questions) == 0:
             return []
-        
-        # Transform query
-        query_vector = self.vectorizer.transform([query])
-        
-        # Calculate similarity scores
-        similarities = cosine_similarity(query_vector, self.question_vectors)[0]
-        
-        # Get top K matches
-        top_indices = similarities.argsort()[-top_k:][::-1]
-        
+
+        # Analyze query once (unit length, like every indexed field block)
+        query_vector = snapshot.analyzer.analyze(query, snapshot.corrector)
+        terms, query_weights = self._expand_query(query_vector, snapshot.analyzer.n_features, weights)
+
+        # Score only the questions sharing a term with the query
+        top_indices, scores = snapshot.postings.score(terms, query_weights, top_k, self.early_termination)
+        self.searches_scored += 1
+        fallback = False
+        if snapshot.fallback is not None and (len(scores) == 0 or scores[0] < self.fallback_threshold):
+            top_indices, scores, fallback = self._fallback(snapshot, query, top_k, top_indices, scores)
+        return self._results(snapshot, top_indices, scores, top_k, fallback)
+
+    def _fallback(self, snapshot: IndexSnapshot, query: str, top_k: int,
+                  top_indices: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """Character n-gram ranking instead of a weak word-level one, if it is a real match and scores higher
+
+        The query's n-grams come from its words as the analyzer sees them,
+        like the questions': case, punctuation and stop words play no part,
+        so "fee?" and "fee" rank alike and "is there a gym" finds nothing.
+        """
+        start = time.perf_counter()
+        fallback_indices, fallback_scores = snapshot.fallback.search(" ".join(snapshot.analyzer.tokens(query)), top_k)
+        self.fallback_searches += 1
+        self._fallback_latencies.append((time.perf_counter() - start) * 1000)
+        if self._fallback_wins(fallback_scores, scores[0] if len(scores) else 0.0):
+            return fallback_indices, fallback_scores, True
+        return top_indices, scores, False
+
+    def _fallback_wins(self, fallback_scores: np.ndarray, word_score: float) -> bool:
+        return len(fallback_scores) > 0 and fallback_scores[0] >= self.FALLBACK_MIN_SCORE \
+            and fallback_scores[0] > word_score
+
+    def _results(self, snapshot: IndexSnapshot, top_indices: np.ndarray, scores: np.ndarray,
+                 top_k: int, fallback: bool = False) -> List[Dict]:
+        """Result dicts for ranked (index, score) pairs, padded to top_k
+
+        'fallback' marks a ranking that came from the character n-gram index.
+        """
+        questions = snapshot.questions
+        top_indices, scores = self._pad_results(top_indices, scores, len(questions), top_k)
+        confidences = self._confidences(scores, np.full(len(scores), fallback))
+
         results = []
-        for idx in top_indices:
+        for idx, score, confidence in zip(top_indices, scores, confidences):
             results.append({
-                'index': idx,
-                'question': self.questions[idx],
-                'similarity': float(similarities[idx]),
-                'confidence_percent': float(similarities[idx] * 100)
+                'index': int(idx),
+                'question': questions[idx],
+                'doc_type': snapshot.doc_types[idx],
+                'score': float(score),
+                'similarity': min(float(score), 1.0),
+                'confidence': float(confidence),
+                'confidence_percent': float(confidence) * 100,
+                'fallback': fallback
             })
-        
+
         return results
-    
-    def retrain(self, questions: List[str]) -> None:
+
+    # Upper bound on dense scores materialized at once by search_batch
+    BATCH_SCORE_CELLS = 4_000_000
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 3,
+                     field_weights: Optional[Dict[str, float]] = None, with_fallback: bool = False) -> tuple:
+        """Search many queries at once for replay and offline evaluation
+
+        All queries are analyzed into one matrix and scored with one sparse
+        matrix-matrix product per chunk; weak rows are re-ranked by the
+        character n-gram index as in search(). Returns (indices, scores)
+        arrays of shape (len(queries), top_k), best first; slots beyond the
+        corpus size hold index -1 and score 0. with_fallback adds a third,
+        boolean array marking the rows ranked by the n-gram index.
+        """
+        snapshot = self._snapshot
+        n_docs = len(snapshot.questions)
+        # top_k <= 0 asks for nothing: empty rows rather than a negative shape
+        top_k = max(top_k, 0)
+        indices = np.full((len(queries), top_k), -1, dtype=np.int64)
+        scores = np.zeros((len(queries), top_k), dtype=np.float32)
+        fallback_rows = np.zeros(len(queries), dtype=bool)
+        if n_docs == 0 or len(queries) == 0 or top_k <= 0:
+            return (indices, scores, fallback_rows) if with_fallback else (indices, scores)
+
+        query_vectors = snapshot.analyzer.transform(queries, snapshot.corrector)
+        weights = self._weights(field_weights)
+        if len(weights) > 1:
+            query_vectors = hstack([query_vectors * weight for weight in weights], format='csr')
+        else:
+            query_vectors = query_vectors * weights[0]
+        document_vectors_t = snapshot.question_vectors.T.tocsr()
+        k = min(top_k, n_docs)
+        chunk = max(1, self.BATCH_SCORE_CELLS // n_docs)
+        for start in range(0, len(queries), chunk):
+            block = (query_vectors[start:start + chunk] @ document_vectors_t).toarray()
+            if k < n_docs:
+                best = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            else:
+                best = np.broadcast_to(np.arange(n_docs), block.shape).copy()
+            best_scores = np.take_along_axis(block, best, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind='stable')
+            indices[start:start + chunk, :k] = np.take_along_axis(best, order, axis=1)
+            scores[start:start + chunk, :k] = np.take_along_axis(best_scores, order, axis=1)
+
+        if snapshot.fallback is not None:
+            weak = np.flatnonzero(scores[:, 0] < self.fallback_threshold)
+            matches = snapshot.fallback.search_batch([" ".join(snapshot.analyzer.tokens(queries[row]))
+                                                      for row in weak], top_k)
+            for row, (found, found_scores) in zip(weak, matches):
+                if self._fallback_wins(found_scores, scores[row, 0]):
+                    indices[row], scores[row] = -1, 0.0
+                    indices[row, :len(found)] = found
+                    scores[row, :len(found)] = found_scores
+                    fallback_rows[row] = True
+        return (indices, scores, fallback_rows) if with_fallback else (indices, scores)
+
+    def _confidences(self, scores: np.ndarray, fallback: np.ndarray) -> np.ndarray:
+        """Calibrated confidences, except for n-gram fallback scores (marked by fallback, per row)
+
+        Those are character n-gram cosines, not word-level scores, so the
+        word-level calibration does not apply: they are reported as they are.
+        """
+        confidences = self.calibrator(scores)
+        if fallback.any():
+            confidences = np.where(fallback.reshape(fallback.shape + (1,) * (scores.ndim - 1)),
+                                   np.clip(scores, 0.0, 1.0), confidences)
+        return confidences
+
+    def batch_confidences(self, scores: np.ndarray, fallback: Optional[np.ndarray] = None) -> np.ndarray:
+        """Confidences for search_batch() scores (and its fallback rows), as search() reports them"""
+        return self._confidences(scores, fallback if fallback is not None else np.zeros(len(scores), dtype=bool))
+
+    @staticmethod
+    def _pad_results(indices: np.ndarray, scores: np.ndarray, n_docs: int, top_k: int):
+        """Fill up to top_k with zero-score questions, as a full scan would return"""
+        missing = min(top_k, n_docs) - len(indices)
+        if missing <= 0:
+            return indices, scores
+        # At most len(indices) + missing ids are needed to find enough unmatched ones
+        pool = np.arange(min(n_docs, len(indices) + missing))
+        filler = pool[~np.isin(pool, indices)][:missing]
+        return np.concatenate([indices, filler]), np.concatenate([scores, np.zeros(len(filler))])
+
+    def add_questions(self, new_questions: Iterable[str], doc_type: str = FAQ_DOC,
+                      answers: Optional[Iterable[str]] = None, categories: Optional[Iterable[str]] = None) -> None:
+        """Append questions using the existing vocabulary, without a refit
+
+        answers and categories, when given, are aligned with new_questions.
+        Questions that are already indexed are skipped, so concurrent sessions
+        submitting the same question cannot create duplicate entries.
+        """
+        new_questions = list(new_questions)
+        answers = list(answers) if answers is not None else [""] * len(new_questions)
+        categories = list(categories) if categories is not None else [""] * len(new_questions)
+        with self._lock:
+            current = self._snapshot
+            known = set(current.questions)
+            fresh, fresh_answers, fresh_categories = [], [], []
+            for question, answer, category in zip(new_questions, answers, categories):
+                if question not in known:
+                    known.add(question)
+                    fresh.append(question)
+                    fresh_answers.append(answer)
+                    fresh_categories.append(category)
+            if not fresh:
+                return
+            if current.question_vectors is None:
+                fit_needed = True
+            else:
+                fit_needed = False
+                vectorizer = self._with_documents(current.vectorizer, added=(fresh, fresh_answers, fresh_categories))
+                new_vectors = self._vectorize(vectorizer, fresh, fresh_answers, fresh_categories)
+                vectors = self._append_rows(current.question_vectors, new_vectors)
+                fallback = current.fallback
+                if fallback is not None:
+                    fallback = fallback.appended(self._fallback_texts(current.analyzer, fresh,
+                                                                      [doc_type] * len(fresh)))
+                self._publish(current.questions + tuple(fresh), current.doc_types + (doc_type,) * len(fresh),
+                              current.answers + tuple(fresh_answers), current.categories + tuple(fresh_categories),
+                              vectorizer, vectors, incremental=True, fallback=fallback)
+                self._changes += len(fresh)
+                self._orphans += self._count_orphans(new_vectors)
+        if fit_needed:
+            self._fit(fresh, [doc_type] * len(fresh), fresh_answers, fresh_categories)
+        else:
+            self._share_later()
+            self._maybe_compact()
+
+    def update_questions(self, questions: Iterable[str], answers: Optional[Iterable[str]] = None,
+                         categories: Optional[Iterable[str]] = None) -> None:
+        """Re-index the answer and category of questions already indexed, in place
+
+        answers and categories, when given, are aligned with questions; None
+        keeps the indexed values. Rows keep their index and are vectorized
+        with the existing vocabulary, like add_questions(). Questions that
+        are not indexed are ignored.
+        """
+        questions = list(questions)
+        answers = list(answers) if answers is not None else [None] * len(questions)
+        categories = list(categories) if categories is not None else [None] * len(questions)
+        with self._lock:
+            current = self._snapshot
+            wanted = {question: (answer, category) for question, answer, category in
+                      zip(questions, answers, categories)}
+            rows = [i for i, question in enumerate(current.questions) if question in wanted]
+            if not rows or current.question_vectors is None:
+                return
+            new_answers = list(current.answers)
+            new_categories = list(current.categories)
+            for i in rows:
+                answer, category = wanted[current.questions[i]]
+                if answer is not None:
+                    new_answers[i] = answer
+                if category is not None:
+                    new_categories[i] = category
+            edited = ([current.questions[i] for i in rows], [new_answers[i] for i in rows],
+                      [new_categories[i] for i in rows])
+            vectorizer = self._with_documents(current.vectorizer, added=edited, removed=(
+                edited[0], [current.answers[i] for i in rows], [current.categories[i] for i in rows]))
+            new_vectors = self._vectorize(vectorizer, *edited)
+            # Edited rows are appended, then moved into the slots of the rows they replace
+            order = np.arange(len(current.questions))
+            order[rows] = len(current.questions) + np.arange(len(rows))
+            vectors = self._append_rows(current.question_vectors, new_vectors)[order]
+            # Question texts are unchanged, and the n-gram index only covers those
+            self._publish(current.questions, current.doc_types, tuple(new_answers), tuple(new_categories),
+                          vectorizer, vectors, incremental=True, fallback=current.fallback)
+            self._changes += len(rows)
+            self._orphans += self._count_orphans(new_vectors)
+        self._share_later()
+        self._maybe_compact()
+
+    def remove_questions(self, indices: Iterable[int]) -> None:
+        """Drop questions by index; later indices shift down like a list delete"""
+        drop = set(indices)
+        with self._lock:
+            current = self._snapshot
+            drop = {i for i in drop if 0 <= i < len(current.questions)}
+            if not drop:
+                return
+            keep = [i for i in range(len(current.questions)) if i not in drop]
+            questions = tuple(current.questions[i] for i in keep)
+            doc_types = tuple(current.doc_types[i] for i in keep)
+            answers = tuple(current.answers[i] for i in keep)
+            categories = tuple(current.categories[i] for i in keep)
+            vectors = current.question_vectors[keep] if keep else None
+            dropped = sorted(drop)
+            vectorizer = self._with_documents(current.vectorizer, removed=(
+                [current.questions[i] for i in dropped], [current.answers[i] for i in dropped],
+                [current.categories[i] for i in dropped]))
+            fallback = current.fallback.subset(keep) if current.fallback is not None else None
+            self._publish(questions, doc_types, answers, categories, vectorizer, vectors, incremental=True,
+                          fallback=fallback)
+            self._changes += len(drop)
+        self._share_later()
+        self._maybe_compact()
+
+    def drift(self) -> float:
+        """Share of the index changed since vocabulary and IDF were last fitted"""
+        return self._changes / max(self._fitted_count, 1)
+
+    def _maybe_compact(self) -> None:
+        """Start a background refit once drift passes the threshold"""
+        if self.drift() < self.drift_threshold and self._orphans == 0:
+            return
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = threading.Thread(target=self._compact, daemon=True)
+            self._compaction.start()
+
+    def _compact(self) -> None:
+        """Refit vocabulary and IDF off the request path, then swap it in"""
+        while True:
+            current = self._snapshot
+            vectorizer = self._new_vectorizer()
+            vectors = self._vectorize(vectorizer, current.questions, current.answers, current.categories,
+                                      fit=True) if current.questions else None
+            with self._lock:
+                # Writes that landed during the fit would be lost; fit again
+                if self._snapshot is not current:
+                    continue
+                self._publish(current.questions, current.doc_types, current.answers, current.categories,
+                              vectorizer, vectors)
+                snapshot = self._snapshot
+                self._fitted_count = len(current.questions)
+                self._changes = 0
+                self._orphans = 0
+            self._save_cached(snapshot)
+            return
+
+    def retrain(self, questions: List[str], doc_types: Optional[List[str]] = None,
+                answers: Optional[List[str]] = None, categories: Optional[List[str]] = None) -> None:
         """Retrain search engine with new questions"""
-        self.questions = questions
-        self.vectorizer = TfidfVectorizer(lowercase=True, stop_words='english', ngram_range=(1, 2))
-        self.question_vectors = self.vectorizer.fit_transform(questions)
-    
+        questions = list(questions)
+        blank = [""] * len(questions)
+        self._fit(questions, list(doc_types) if doc_types is not None else [FAQ_DOC] * len(questions),
+                  list(answers) if answers is not None else blank,
+                  list(categories) if categories is not None else blank)
+
     def get_confidence_color(self, confidence: float) -> tuple:
-        """Get color and emoji based on confidence level"""
-        if confidence >= 0.7:
+        """Get color and emoji based on calibrated confidence"""
+        if confidence >= CONFIDENCE_HIGH:
             return "#28a745", "✅"  # Green - high confidence
-        elif confidence >= 0.5:
+        elif confidence >= CONFIDENCE_MEDIUM:
             return "#ffc107", "⚠️"  # Yellow - medium confidence
         else:
             return "#dc3545", "❌"  # Red - low confidence
-    
+
     def get_confidence_label(self, confidence: float) -> str:
-        """Get label based on confidence level"""
-        if confidence >= 0.7:
+        """Get label based on calibrated confidence"""
+        if confidence >= CONFIDENCE_HIGH:
             return "High Confidence Match"
-        elif confidence >= 0.5:
+        elif confidence >= CONFIDENCE_MEDIUM:
             return "Moderate Confidence Match"
         else:
             return "Low Confidence Match"
@@ -0,0 +1,241 @@
+# SHARED INDEX - Read-only index generations memory-mapped by every worker process
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Sequence as SequenceType, Tuple
+
+import numpy as np
+
+from calibration import ScoreCalibrator
+from char_index import CharNgramIndex
+from index_store import (CALIBRATION_FILE, HEADER_FILE, MappedDict, StringTable, _load,
+                         _load_postings, _save, _save_postings, _write_atomic, load_calibration)
+from search_engine import SCORING_MODELS, IndexSnapshot, SemanticSearch
+from spelling import SpellCorrector
+
+# Bump whenever the generation layout changes
+LAYOUT_VERSION = 2
+
+# Name of the newest complete generation; replaced atomically after it is written
+CURRENT_FILE = "CURRENT"
+GENERATION_PREFIX = "gen-"
+TEXT_COLUMNS = ("questions", "doc_types", "answers", "categories")
+
+
+def current_generation(root: str) -> Optional[str]:
+    """Name of the generation CURRENT points at, or None before the first publish"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def read_header(path: str) -> Dict:
+    """Header of a complete generation; ValueError for another layout version"""
+    with open(os.path.join(path, HEADER_FILE), "r") as f:
+        header = json.load(f)
+    if header.get("layout_version") != LAYOUT_VERSION:
+        raise ValueError(f"generation {path!r} has another layout version")
+    return header
+
+
+def publish_index(root: str, engine: SemanticSearch) -> Optional[str]:
+    """Write the engine's current snapshot as a new generation and point CURRENT at it
+
+    Nothing is written when the current generation already holds the same
+    corpus. Files go into a fresh directory with the header last, and only a
+    complete generation is ever named in CURRENT, so attached workers never
+    see a partial one. Generations older than the one replaced are removed;
+    workers still mapping them keep their pages until they move on.
+    Returns the new generation's name, or None.
+    """
+    if engine.scoring not in SCORING_MODELS:
+        raise ValueError(f"only {SCORING_MODELS} indexes can be shared, not {engine.scoring!r}")
+    snapshot = engine.snapshot()
+    if snapshot.question_vectors is None:
+        return None
+    digest = engine._corpus_hash(snapshot.questions, snapshot.doc_types, snapshot.answers, snapshot.categories)
+    previous = current_generation(root)
+    try:
+        if previous is not None and read_header(os.path.join(root, previous)).get("corpus_hash") == digest:
+            return None
+    except (OSError, ValueError):
+        pass
+
+    name = f"{GENERATION_PREFIX}{time.time_ns():020d}-{os.getpid()}"
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    for column in TEXT_COLUMNS:
+        StringTable.write(path, column, getattr(snapshot, column))
+
+    vectorizer = snapshot.vectorizer
+    _save(path, "idf", vectorizer.idf_)
+    if engine.hash_features:
+        params = {"n_docs": vectorizer.n_docs_}
+    else:
+        MappedDict.write(path, "vocabulary", vectorizer.vocabulary_)
+        params = {"avgdl": vectorizer.avgdl_} if engine.scoring == "bm25" else {}
+    _save_postings(path, "", snapshot.question_vectors, snapshot.postings)
+
+    spelling = snapshot.corrector.write(path) if snapshot.corrector is not None else None
+    fallback_shape = snapshot.fallback.write(path) if snapshot.fallback is not None else None
+
+    header = {
+        "layout_version": LAYOUT_VERSION,
+        "corpus_hash": digest,
+        "scoring": engine.scoring,
+        "hash_features": engine.hash_features,
+        "fields": list(engine.fields),
+        "n_docs": len(snapshot.questions),
+        "shape": list(snapshot.question_vectors.shape),
+        "params": params,
+        "corrector": spelling,
+        "fallback_shape": fallback_shape,
+    }
+    with open(os.path.join(path, HEADER_FILE), "w") as f:
+        json.dump(header, f, indent=4)
+    _write_atomic(os.path.join(root, CURRENT_FILE), lambda f: f.write(name.encode("utf-8")))
+
+    # Names sort by publish time; the one just replaced may still be mid-attach somewhere
+    for entry in os.listdir(root):
+        if entry.startswith(GENERATION_PREFIX) and previous is not None and entry < previous:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return name
+
+
+class SharedSemanticSearch(SemanticSearch):
+    """Read-only SemanticSearch over the generation published in a shared directory
+
+    Document vectors, posting lists, IDF, vocabulary, typo index, n-gram
+    fallback and the question/answer/category text are all memory-mapped
+    from the generation's files, so N workers share one copy in the page
+    cache and each holds only bounded caches of its own. search() checks
+    CURRENT at most every check_interval seconds and attaches to a newer
+    generation (or calibration) once a writer has published it; the swap is
+    the same snapshot exchange a retrain makes. The writer is a SemanticSearch
+    created with shared_dir; adding, removing, retraining and calibrating
+    go through it and raise here.
+    """
+
+    # Seconds between checks for a newer generation or calibration
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, root: str, check_interval: float = CHECK_INTERVAL, **options):
+        """Attach to the current generation in root
+
+        options are as for SemanticSearch (result_cache_size, field_weights,
+        early_termination, fallback_threshold); scoring, hashing and fields
+        come from the published index.
+        """
+        name = current_generation(root)
+        if name is None:
+            raise FileNotFoundError(f"no index has been published in {root!r}")
+        header = read_header(os.path.join(root, name))
+        fields = header["fields"]
+        self.root = root
+        self.check_interval = check_interval
+        self._current = None
+        self._calibration_stamp = None
+        self._next_check = 0.0
+        self._refresh_lock = threading.Lock()
+        super().__init__([], scoring=header["scoring"], hash_features=header["hash_features"],
+                         answers=[] if "answer" in fields else None,
+                         categories=[] if "category" in fields else None, **options)
+        self._attach(name, header)
+        self._load_calibration()
+
+    def _attach(self, name: str, header: Dict) -> None:
+        """Map a generation's files and publish them as the next snapshot"""
+        path = os.path.join(self.root, name)
+        self.scoring = header["scoring"]
+        self.hash_features = header["hash_features"]
+        self.fields = tuple(header["fields"])
+        questions, doc_types, answers, categories = (StringTable.attach(path, column) for column in TEXT_COLUMNS)
+
+        vectorizer = self._new_vectorizer()
+        params = header["params"]
+        if self.hash_features:
+            vectorizer.n_docs_ = params["n_docs"]
+        else:
+            vectorizer.vocabulary_ = MappedDict.attach(path, "vocabulary")
+        vectorizer.idf_ = _load(path, "idf")
+        if self.scoring == "bm25":
+            vectorizer.avgdl_ = params["avgdl"]
+        vectors, postings = _load_postings(path, "", tuple(header["shape"]))
+
+        corrector = SpellCorrector.attach(path, **header["corrector"]) if header["corrector"] is not None else None
+        fallback = None
+        if header["fallback_shape"] is not None:
+            fallback = CharNgramIndex.attach(path, header["fallback_shape"])
+
+        analyzer = self._new_analyzer(vectorizer)
+        with self._lock:
+            self._snapshot = IndexSnapshot(questions, doc_types, answers, categories, vectorizer, vectors, postings,
+                                           analyzer, corrector, fallback, self._snapshot.generation + 1)
+            self._fitted_count = len(questions)
+            self._changes = 0
+            self._orphans = 0
+        self._current = name
+
+    def _load_calibration(self) -> None:
+        calibration_path = os.path.join(self.root, CALIBRATION_FILE)
+        self._calibration_stamp = _stamp(calibration_path)
+        saved = load_calibration(self.root, self.scoring)
+        calibrator = ScoreCalibrator.from_dict(saved) if saved is not None else ScoreCalibrator()
+        with self._cache_lock:
+            self.calibrator = calibrator
+            self._calibration_version += 1
+            self._result_cache.clear()
+
+    @property
+    def current(self) -> Optional[str]:
+        """Name of the attached generation"""
+        return self._current
+
+    def refresh(self) -> bool:
+        """Attach to a newer generation or calibration if one was published; True when one was"""
+        now = time.monotonic()
+        if now < self._next_check or not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_check = now + self.check_interval
+            changed = False
+            name = current_generation(self.root)
+            if name is not None and name != self._current:
+                self._attach(name, read_header(os.path.join(self.root, name)))
+                changed = True
+            if _stamp(os.path.join(self.root, CALIBRATION_FILE)) != self._calibration_stamp:
+                self._load_calibration()
+                changed = True
+            return changed
+        except (OSError, ValueError, KeyError):
+            # Removed or unreadable mid-attach: keep serving the current generation, retry next check
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def search(self, query: str, top_k: int = 3, field_weights: Optional[Dict[str, float]] = None) -> List[Dict]:
+        self.refresh()
+        return super().search(query, top_k, field_weights)
+
+    def search_batch(self, queries: SequenceType[str], top_k: int = 3,
+                     field_weights: Optional[Dict[str, float]] = None, with_fallback: bool = False) -> tuple:
+        self.refresh()
+        return super().search_batch(queries, top_k, field_weights, with_fallback)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("a shared index is read-only: update the SemanticSearch that publishes it")
+
+    add_questions = update_questions = remove_questions = retrain = calibrate = _read_only
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    """Identity of a file version: atomic replaces give a new inode"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
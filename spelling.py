@@ -0,0 +1,204 @@
+# SPELLING - Typo correction for query tokens with a symmetric-delete (SymSpell) index
+import heapq
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from index_store import MappedDict, MappedListDict
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent swaps count 1); limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # A shared prefix and suffix cost nothing; a typo leaves only a few letters between them
+    start, end = 0, 0
+    shortest = min(len(a), len(b))
+    while start < shortest and a[start] == b[start]:
+        start += 1
+    while end < shortest - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return min(max(len(a), len(b)), limit + 1)
+
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class SpellCorrector:
+    """Maps unknown query tokens to the closest indexed word
+
+    Every word's prefix is stored under each string reachable by deleting up
+    to max_distance characters from it. A typo reaches the same keys by
+    deleting its own characters, so candidates come from a few dict lookups
+    and only those are checked with a bounded edit distance, never the whole
+    vocabulary.
+
+    A real word the index happens not to contain ("park", "visa") is often
+    a couple of edits from some indexed word, so a correction must be close
+    for the token's length (one edit up to SHORT_WORD_LENGTH letters) and
+    clearly the best: a rival at the same distance must be found in fewer
+    than 1 / TIE_RATIO as many documents, or the token is left alone.
+
+    Memory is about 4 KB per correction target (up to 29 deletion keys for
+    a 7-letter prefix), so max_targets keeps only that many of the most
+    frequent words as targets; the rest stay known words, never corrected
+    to and never changed, at one table entry each.
+    """
+
+    MAX_DISTANCE = 2
+    # Tokens up to this long get one edit: two edits in a short word reach other real words
+    SHORT_WORD_LENGTH = 7
+    # Document-count lead the best candidate needs over one at the same distance
+    TIE_RATIO = 2
+    # Deletes are generated from this many leading characters (SymSpell's prefix trick)
+    PREFIX_LENGTH = 7
+    # Shorter tokens are too ambiguous to correct (and stop words are gone already)
+    MIN_WORD_LENGTH = 4
+    # Distinct tokens whose correction is remembered
+    CACHE_SIZE = 65536
+
+    def __init__(self, word_counts: Dict[str, int], max_distance: int = MAX_DISTANCE,
+                 prefix_length: int = PREFIX_LENGTH, max_targets: Optional[int] = None):
+        self.word_counts = dict(word_counts)
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        targets = self.word_counts
+        if max_targets is not None and len(targets) > max_targets:
+            targets = heapq.nlargest(max_targets, targets, key=targets.get)
+        self._deletes: Dict[str, List[str]] = {}
+        for word in targets:
+            if len(word) >= self.MIN_WORD_LENGTH - max_distance:
+                for key in self._delete_variants(word[:prefix_length]):
+                    self._deletes.setdefault(key, []).append(word)
+        self._correct_token = lru_cache(maxsize=self.CACHE_SIZE)(self._lookup)
+
+    @classmethod
+    def from_tables(cls, word_counts: Mapping[str, int], deletes: Mapping[str, List[str]],
+                    max_distance: int = MAX_DISTANCE, prefix_length: int = PREFIX_LENGTH) -> "SpellCorrector":
+        """Corrector over an existing deletion index (see deletes), used as is rather than copied
+
+        Both mappings only need get, [] and in, so they can be memory-mapped
+        tables shared between processes (shared_index.py).
+        """
+        corrector = cls.__new__(cls)
+        corrector.word_counts = word_counts
+        corrector.max_distance = max_distance
+        corrector.prefix_length = prefix_length
+        corrector._deletes = deletes
+        corrector._correct_token = lru_cache(maxsize=cls.CACHE_SIZE)(corrector._lookup)
+        return corrector
+
+    def write(self, path: str) -> Dict:
+        """Save word counts and the deletion index as memory-mappable tables; the settings attach() needs"""
+        MappedDict.write(path, "words", self.word_counts)
+        MappedListDict.write(path, "deletes", self.deletes, sorted(self.word_counts))
+        return {"max_distance": self.max_distance, "prefix_length": self.prefix_length}
+
+    @classmethod
+    def attach(cls, path: str, max_distance: int = MAX_DISTANCE,
+               prefix_length: int = PREFIX_LENGTH) -> "SpellCorrector":
+        """Corrector over tables saved by write(), memory-mapped rather than rebuilt"""
+        words = MappedDict.attach(path, "words")
+        # The lists hold words, stored in the same sorted order as the word table's keys
+        return cls.from_tables(words, MappedListDict.attach(path, "deletes", words._keys), max_distance,
+                               prefix_length)
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], tokenize, **options) -> "SpellCorrector":
+        """Corrector over the words of texts, counted once per text"""
+        counts = Counter()
+        for text in texts:
+            counts.update(set(tokenize(text)))
+        return cls(counts, **options)
+
+    def _delete_levels(self, text: str) -> List[List[str]]:
+        """Strings reachable from text by 0, 1, ... max_distance deletes, one list per count"""
+        levels = [[text]]
+        seen = {text}
+        for _ in range(self.max_distance):
+            level = []
+            for item in levels[-1]:
+                if len(item) <= 1:
+                    continue
+                for i in range(len(item)):
+                    variant = item[:i] + item[i + 1:]
+                    if variant not in seen:
+                        seen.add(variant)
+                        level.append(variant)
+            levels.append(level)
+        return levels
+
+    def _delete_variants(self, text: str) -> List[str]:
+        return [variant for level in self._delete_levels(text) for variant in level]
+
+    def max_edits(self, token: str) -> int:
+        """Edits a correction of token may make"""
+        return min(self.max_distance, 1 if len(token) <= self.SHORT_WORD_LENGTH else 2)
+
+    def _lookup(self, token: str) -> str:
+        limit = self.max_edits(token)
+        best, best_distance, best_count = token, limit + 1, 0
+        # Most documents of any other word at best_distance
+        rival_count = 0
+        seen = set()
+        for deletes, keys in enumerate(self._delete_levels(token[:self.prefix_length])):
+            # Words reached only through more deletes are (practically) farther than the best
+            if deletes > min(best_distance, limit):
+                break
+            for key in keys:
+                for word in self._deletes.get(key, ()):
+                    if word in seen or abs(len(word) - len(token)) > min(best_distance, limit):
+                        continue
+                    seen.add(word)
+                    distance = edit_distance(token, word, min(best_distance, limit))
+                    if distance > limit or distance > best_distance:
+                        continue
+                    count = self.word_counts[word]
+                    if distance < best_distance:
+                        best, best_distance, best_count, rival_count = word, distance, count, 0
+                    elif count > best_count or (count == best_count and word < best):
+                        best, best_count, rival_count = word, count, best_count
+                    else:
+                        rival_count = max(rival_count, count)
+        if best_distance > limit or best_count < self.TIE_RATIO * rival_count:
+            return token
+        return best
+
+    def correct(self, token: str) -> str:
+        """Closest known word within max_edits(token), if it is clearly the best; else token itself"""
+        if token in self.word_counts or len(token) < self.MIN_WORD_LENGTH or not token.isalpha():
+            return token
+        return self._correct_token(token)
+
+    def correct_tokens(self, tokens: List[str]) -> List[str]:
+        return [self.correct(token) for token in tokens]
+
+    def __len__(self) -> int:
+        return len(self.word_counts)
+
+    @property
+    def deletes(self) -> Mapping[str, List[str]]:
+        """Deletion index: each key -> the words it was generated from"""
+        return self._deletes
+
+    @property
+    def n_deletes(self) -> int:
+        """Keys in the deletion index, a measure of its memory"""
+        return len(self._deletes)
+
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database_manager import FAQDatabase  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def faq_questions():
+    """Questions of the built-in FAQ set"""
+    return [question for pairs in FAQDatabase._initialize_faqs().values() for question in pairs]
@@ -0,0 +1,37 @@
+import numpy as np
+
+from calibration import ScoreCalibrator
+from hybrid_search import HybridSearch
+from search_engine import SemanticSearch
+
+
+def rrf_samples(count=200):
+    """Fused RRF scores (about 0.016-0.033) where higher scores are more often helpful"""
+    rng = np.random.default_rng(0)
+    scores = rng.uniform(1 / 62, 2 / 61, count)
+    labels = (rng.random(count) < (scores - scores.min()) / (scores.max() - scores.min())).astype(float)
+    return list(zip(scores.tolist(), labels.tolist()))
+
+
+def test_grid_covers_the_observed_score_range():
+    calibrator = ScoreCalibrator.fit(rrf_samples())
+    assert calibrator.scores[0] >= 1 / 62 and calibrator.scores[-1] <= 2 / 61
+    low, high = calibrator([0.017, 0.032])
+    assert high - low > 0.5
+
+
+def test_a_single_observed_score_is_not_a_calibration():
+    assert not ScoreCalibrator.fit([(0.5, 1.0), (0.5, 0.0)] * 20).fitted
+
+
+def test_hybrid_calibration_is_saved_with_the_index(faq_questions, tmp_path):
+    def hybrid():
+        return HybridSearch(SemanticSearch(faq_questions, scoring="tfidf"),
+                            SemanticSearch(faq_questions, scoring="bm25"), cache_dir=str(tmp_path))
+
+    fitted = hybrid().calibrate(rrf_samples())
+    loaded = hybrid().calibrator
+    assert loaded.fitted and np.allclose(loaded([0.02, 0.03]), fitted([0.02, 0.03]))
+    linear = HybridSearch(SemanticSearch(faq_questions, scoring="tfidf"),
+                          SemanticSearch(faq_questions, scoring="bm25"), fusion="linear", cache_dir=str(tmp_path))
+    assert not linear.calibrator.fitted
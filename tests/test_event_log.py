@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+
+import pytest
+
+from event_log import EventLog
+
+
+def initial_state():
+    return {"total": 0, "events": 0}
+
+
+def apply(state, event):
+    state["total"] += event["n"]
+    state["events"] += 1
+
+
+@pytest.fixture
+def make_log(tmp_path):
+    logs = []
+
+    def make(**options):
+        log = EventLog(str(tmp_path / "state.json"), str(tmp_path / "events.jsonl"), initial_state, apply,
+                       **options)
+        logs.append(log)
+        return log
+
+    yield make
+    for log in logs:
+        log.close()
+
+
+def test_compaction_folds_the_log_into_the_snapshot(make_log, tmp_path):
+    log = make_log(compact_every=3)
+    for n in range(1, 6):
+        log.append({"n": n})
+    log.flush()
+    assert json.loads((tmp_path / "state.json").read_text()) == {"total": 15, "events": 5}
+    assert (tmp_path / "events.jsonl").read_text() == ""
+
+    log.append({"n": 10})
+    log.flush()
+    assert make_log().load() == {"total": 25, "events": 6}
+
+
+def test_a_torn_last_line_is_skipped_and_later_events_survive(make_log, tmp_path):
+    (tmp_path / "events.jsonl").write_text('{"n": 1}\n{"n": 2}\n{"n": 4')
+    log = make_log()
+    assert log.load() == {"total": 3, "events": 2}
+    log.append({"n": 8})
+    log.flush()
+    assert make_log().load() == {"total": 11, "events": 3}
+
+
+def test_a_corrupt_snapshot_is_set_aside_and_the_writer_keeps_going(make_log, tmp_path):
+    (tmp_path / "state.json").write_text('{"total": 7, "ev')
+    log = make_log(compact_every=2)
+    assert log.load() == {"total": 0, "events": 0}
+    for n in (1, 2, 3):
+        log.append({"n": n})
+        log.flush()
+    assert log.dropped == 0
+    assert (tmp_path / "state.json.corrupt").read_text() == '{"total": 7, "ev'
+    assert make_log().load() == {"total": 6, "events": 3}
+
+
+def test_drop_policy_discards_events_once_the_queue_is_full(make_log):
+    # The writer sleeps for a minute between drains, so nothing leaves the queue
+    log = make_log(queue_size=2, flush_interval=60)
+    for n in range(5):
+        log.append({"n": n})
+    assert log.dropped == 3
+    log.flush()
+    assert log.load() == {"total": 1, "events": 2}
+
+
+def test_block_policy_waits_for_room_before_dropping(make_log):
+    log = make_log(queue_size=1, flush_interval=60, overflow="block", block_timeout=0.1)
+    log.append({"n": 1})
+    start = time.perf_counter()
+    log.append({"n": 2})
+    assert time.perf_counter() - start >= 0.1
+    assert log.dropped == 1
+
+    # Room made while it waits: the event goes in
+    threading.Timer(0.05, log.flush, kwargs={"wait": False}).start()
+    log.block_timeout = 5
+    log.append({"n": 4})
+    log.flush()
+    assert log.dropped == 1
+    assert log.load() == {"total": 5, "events": 2}
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_flush_returns_after_the_writer_dies(make_log):
+    log = make_log(flush_interval=60)
+
+    def die():
+        raise RuntimeError("writer crashed")
+
+    log._run = die
+    log.append({"n": 3})
+    log._writer.join()
+    flusher = threading.Thread(target=log.flush)
+    flusher.start()
+    flusher.join(timeout=5)
+    assert not flusher.is_alive()
+    assert log.load() == {"total": 3, "events": 1}
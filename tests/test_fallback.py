@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from calibration import feedback_samples
+from search_engine import SemanticSearch
+
+
+@pytest.fixture(scope="module")
+def engine(faq_questions):
+    return SemanticSearch(faq_questions, result_cache_size=0, correct_spelling=False)
+
+
+@pytest.mark.parametrize("query, expected", [("hostle", "Is hostel available?"),
+                                             ("scholarshp", "Are scholarships available?"),
+                                             ("libary", "What are library timings?")])
+def test_typos_fall_back_to_ngram_matches(engine, query, expected):
+    top = engine.search(query, top_k=1)[0]
+    assert top["fallback"] and top["question"] == expected
+
+
+@pytest.mark.parametrize("query", ["is there a gym", "how do I get a loan", "can I bring a pet",
+                                   "who is the dean"])
+def test_stop_words_alone_do_not_make_a_fallback_match(engine, query):
+    top = engine.search(query, top_k=1)[0]
+    assert not top["fallback"] and top["score"] == 0
+
+
+def test_fallback_scores_bypass_the_calibrator(faq_questions):
+    engine = SemanticSearch(faq_questions, result_cache_size=0, correct_spelling=False)
+    engine.calibrator = lambda scores: np.zeros_like(scores)
+    top = engine.search("hostle", top_k=1)[0]
+    assert top["fallback"] and top["confidence"] == pytest.approx(top["score"])
+    indices, scores, fallback = engine.search_batch(["hostle", "hostel"], top_k=1, with_fallback=True)
+    assert fallback.tolist() == [True, False]
+    confidences = engine.batch_confidences(scores, fallback)
+    assert confidences[0, 0] == pytest.approx(scores[0, 0]) and confidences[1, 0] == 0
+
+
+def test_fallback_feedback_is_not_a_calibration_sample():
+    feedback = [{"rating": "helpful", "score": 0.4, "scoring": "tfidf"},
+                {"rating": "helpful", "score": 0.4, "scoring": "tfidf", "fallback": True}]
+    assert feedback_samples(feedback, "tfidf") == [(0.4, 1.0)]
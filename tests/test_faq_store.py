@@ -0,0 +1,35 @@
+import pytest
+
+from faq_store import ConnectionPool, PoolExhausted, SQLiteFAQStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteFAQStore(str(tmp_path / "faqs.db"), pool_size=1)
+    store.FETCH_SIZE = 3
+    store.seed([(f"Question {i}?", f"Answer {i}", "Hostel" if i % 2 else "General") for i in range(10)])
+    return store
+
+
+def test_streams_return_every_row_in_order_across_chunks(store):
+    assert [question for question, _ in store.iter_pairs()] == [f"Question {i}?" for i in range(10)]
+    assert [question for question, _ in store.iter_pairs(category="Hostel")] == \
+           [f"Question {i}?" for i in range(1, 10, 2)]
+    assert list(store.iter_entries())[-1] == ("Question 9?", "Answer 9", "Hostel")
+
+
+def test_an_abandoned_stream_holds_no_connection(store):
+    rows = store.iter_pairs()
+    next(rows)
+    # The pool has a single connection; the half-read stream must not own it
+    assert store.count() == 10
+    store.upsert("Question 0?", "Changed")
+    assert store.answer("Question 0?") == "Changed"
+
+
+def test_an_exhausted_pool_raises_instead_of_hanging(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "faqs.db"), size=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(PoolExhausted):
+            with pool.connection():
+                pass
@@ -0,0 +1,25 @@
+import numpy as np
+from scipy.sparse import csr_matrix, random as sparse_random, vstack
+
+from inverted_index import InvertedIndex
+
+
+def test_appended_rows_score_like_a_fresh_build():
+    rng = np.random.default_rng(0)
+    base = sparse_random(200, 500, density=0.02, format="csr", random_state=rng)
+    added = [sparse_random(3, 500, density=0.02, format="csr", random_state=rng) for _ in range(5)]
+    # A row with no terms at all, like a question that shares no word with the vocabulary
+    added.append(csr_matrix((1, 500)))
+    index = InvertedIndex(base)
+    for rows in added:
+        index = index.appended(rows)
+    fresh = InvertedIndex(vstack([base] + added, format="csr"))
+    assert index.n_docs == fresh.n_docs == 216
+
+    queries = sparse_random(20, 500, density=0.01, format="csr", random_state=rng)
+    for query in queries:
+        found, scores = index.score(query.indices, query.data, 5)
+        expected, expected_scores = fresh.score(query.indices, query.data, 5)
+        assert np.allclose(scores, expected_scores)
+        assert found.tolist() == expected.tolist()
+    assert np.allclose(index.dot(queries).toarray(), fresh.dot(queries).toarray())
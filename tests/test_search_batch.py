@@ -0,0 +1,30 @@
+import pytest
+
+from hybrid_search import HybridSearch
+from search_engine import SemanticSearch
+
+
+@pytest.fixture(scope="module", params=["tfidf", "bm25", "hybrid"])
+def engine(request, faq_questions):
+    if request.param == "hybrid":
+        return HybridSearch(SemanticSearch(faq_questions, scoring="tfidf"),
+                            SemanticSearch(faq_questions, scoring="bm25"))
+    return SemanticSearch(faq_questions, scoring=request.param)
+
+
+@pytest.mark.parametrize("top_k", [0, -1])
+def test_non_positive_top_k_gives_empty_rows(engine, top_k):
+    indices, scores = engine.search_batch(["hostel fees", "library timings"], top_k=top_k)
+    assert indices.shape == scores.shape == (2, 0)
+
+
+def test_no_queries_gives_no_rows(engine):
+    indices, scores = engine.search_batch([], top_k=3)
+    assert indices.shape == scores.shape == (0, 3)
+
+
+def test_rows_follow_the_queries(engine):
+    indices, scores = engine.search_batch(["library timings", "is hostel available"], top_k=2)
+    assert indices.shape == (2, 2)
+    assert engine.questions[indices[0, 0]] == "What are library timings?"
+    assert engine.questions[indices[1, 0]] == "Is hostel available?"
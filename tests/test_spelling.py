@@ -0,0 +1,49 @@
+import pytest
+
+from search_engine import SemanticSearch
+from spelling import SpellCorrector
+
+
+@pytest.fixture(scope="module")
+def corrector(faq_questions):
+    return SemanticSearch(faq_questions, result_cache_size=0).snapshot().corrector
+
+
+@pytest.mark.parametrize("word", ["park", "sleep", "parking", "loan", "visa", "pool", "swimming"])
+def test_real_words_outside_the_index_are_kept(corrector, word):
+    assert corrector.correct(word) == word
+
+
+@pytest.mark.parametrize("typo, expected", [("scholarshp", "scholarships"), ("libary", "library"),
+                                            ("hostle", "hostel"), ("placment", "placement")])
+def test_typos_are_corrected(corrector, typo, expected):
+    assert corrector.correct(typo) == expected
+
+
+def test_short_tokens_get_one_edit():
+    corrector = SpellCorrector({"card": 1, "speed": 1, "library": 1})
+    assert corrector.correct("park") == "park"
+    assert corrector.correct("sleep") == "sleep"
+    assert corrector.correct("librry") == "library"
+
+
+def test_ambiguous_corrections_are_left_alone():
+    assert SpellCorrector({"hostel": 1, "hostes": 1}).correct("hostek") == "hostek"
+    # A clear lead in document count still decides
+    assert SpellCorrector({"hostel": 4, "hostes": 1}).correct("hostek") == "hostel"
+
+
+def test_max_targets_keeps_rare_words_known_but_never_corrects_to_them():
+    corrector = SpellCorrector({"library": 9, "literary": 1}, max_targets=1)
+    assert corrector.correct("literary") == "literary"
+    assert corrector.correct("librry") == "library"
+    assert corrector.correct("literery") == "literery"
+
+
+def test_hashed_mode_corrects_only_when_asked(faq_questions):
+    assert SemanticSearch(faq_questions, hash_features=1 << 12).snapshot().corrector is None
+    engine = SemanticSearch(faq_questions, hash_features=1 << 12, correct_spelling=True)
+    engine.HASHED_SPELLING_WORDS = 5
+    corrector = engine._new_corrector(engine.snapshot().analyzer, faq_questions, [""] * len(faq_questions),
+                                      [""] * len(faq_questions))
+    assert len(corrector) > 5 and len({word for words in corrector.deletes.values() for word in words}) == 5
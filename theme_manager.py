@@ -1,6 +1,88 @@
 # THEME MANAGER - Custom styling and UI components
+import re
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, Sequence, Tuple
+
 import streamlit as st
 
+
+_STYLE_BLOCK = re.compile(r"(<style>)(.*?)(</style>)", re.S)
+_CSS_SPACE = re.compile(r"\s*([{};:,>])\s*")
+_CSS_HEX = re.compile(r"#([0-9a-fA-F])\1([0-9a-fA-F])\2([0-9a-fA-F])\3\b")
+
+
+def minify_css(css: str) -> str:
+    """Drop the whitespace, last semicolons and long hex colours a browser does not need"""
+    css = _CSS_SPACE.sub(r"\1", re.sub(r"\s+", " ", css).strip())
+    css = _CSS_HEX.sub(r"#\1\2\3", css.replace(" !important", "!important"))
+    return css.replace(";}", "}")
+
+
+def compact_html(html: str) -> str:
+    """Drop indentation and blank lines, and minify <style> blocks
+
+    st.markdown ships the whole body to the browser on every rerun. Line
+    breaks in the HTML stay, and no blank line is left to end an HTML block
+    early.
+    """
+    html = "\n".join(line.strip() for line in html.splitlines() if line.strip())
+    return _STYLE_BLOCK.sub(lambda match: match.group(1) + minify_css(match.group(2)) + match.group(3), html)
+
+
+class FragmentCache:
+    """Static HTML rendered once per process and served by (page, theme)
+
+    Streamlit reruns the whole script on every interaction, rebuilding the
+    same CSS and facility boxes each time. A page's render function returns
+    its static blocks (one per st.markdown call); they are compacted on the
+    first request for that page and theme, and every later rerun in any
+    session gets the cached strings.
+    """
+
+    def __init__(self):
+        self._fragments: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, page: str, theme: str, render: Callable[[str], Sequence[str]]) -> Tuple[str, ...]:
+        """Blocks of page for theme, calling render(theme) only the first time
+
+        Page names share one namespace across every module using FRAGMENTS,
+        so each caller needs its own.
+        """
+        key = (page, theme)
+        fragments = self._fragments.get(key)
+        if fragments is not None:
+            self.hits += 1
+            return fragments
+        with self._lock:
+            fragments = self._fragments.get(key)
+            if fragments is None:
+                fragments = tuple(compact_html(block) for block in render(theme))
+                self._fragments[key] = fragments
+                self.misses += 1
+        return fragments
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+    def stats(self) -> Dict:
+        """Cached fragments, their total size in bytes, and hit/miss counts"""
+        fragments = list(self._fragments.values())
+        return {
+            "fragments": sum(len(blocks) for blocks in fragments),
+            "bytes": sum(len(block.encode("utf-8")) for blocks in fragments for block in blocks),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# One cache per process: modules are imported once, while the app script reruns
+FRAGMENTS = FragmentCache()
+
 class ThemeManager:
     """Manages light and dark theme CSS for the application"""
     
@@ -22,8 +104,18 @@ class ThemeManager:
         "border": "#404040"
     }
     
+    @staticmethod
+    def theme_name(is_light_mode: bool) -> str:
+        return "light" if is_light_mode else "dark"
+
     @staticmethod
     def get_css(is_light_mode: bool) -> str:
+        """Custom CSS for the theme, rendered once per process"""
+        return FRAGMENTS.get("theme_manager_css", ThemeManager.theme_name(is_light_mode),
+                             lambda theme: [ThemeManager._render_css(is_light_mode)])[0]
+
+    @staticmethod
+    def _render_css(is_light_mode: bool) -> str:
         """Generate custom CSS based on theme"""
         colors = ThemeManager.LIGHT_COLORS if is_light_mode else ThemeManager.DARK_COLORS
         
@@ -114,22 +206,28 @@ class ThemeManager:
         st.markdown(ThemeManager.get_css(is_light_mode), unsafe_allow_html=True)
 
 
+# Distinct boxes and cards kept rendered; static ones are a handful, live values churn through
+RENDER_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
 def render_facility_box(content: str, title: str = "", emoji: str = ""):
     """Render a custom facility box"""
-    return f"""
+    return compact_html(f"""
     <div class="facility-box">
     {f'<h3 style="margin-top: 0; color: #0066cc;">{emoji} {title}</h3>' if title else ''}
     {content}
     </div>
-    """
+    """)
 
 
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
 def render_metric_card(label: str, value: str, emoji: str = ""):
     """Render a metric card"""
-    return f"""
+    return compact_html(f"""
     <div class="facility-box" style="text-align: center; padding: 2em;">
     <div style="font-size: 2.5em; margin-bottom: 10px;">{emoji}</div>
     <h3 style="font-size: 1.5em; margin: 10px 0; color: #0066cc;">{label}</h3>
     <div style="font-size: 2.2em; font-weight: bold; color: #0066cc; margin: 15px 0;">{value}</div>
     </div>
-    """
+    """)